@@ -0,0 +1,201 @@
+# Batch runner: compile and run many .mr scripts across a process pool.
+#
+#   python batch.py DIR_OR_MANIFEST_OR_FILE... [-j N] [--timeout SEC]
+#                   [--max-instructions N] [-O LEVEL] [--cache-dir DIR]
+#                   [--output-dir DIR] [--json REPORT]
+#
+# A directory contributes every .mr file below it; a manifest is a text
+# file listing one script per line (relative to the manifest, '#' starts a
+# comment). Worker processes import the compiler once and are reused for
+# every script they are handed, so the per-script cost is just compiling
+# and running. Each script's लिहा output is captured separately.
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from optimizer import optimize, RECYCLE_TEMPS_LEVEL
+from vm import link, execute_limited, ExecutionLimitExceeded
+from cache import CompileCache
+from run import OutputWriter, compile_cached, compile_whole_file
+
+# result statuses
+OK = 'ok'
+COMPILE_ERROR = 'compile_error'
+RUNTIME_ERROR = 'runtime_error'
+LIMIT_EXCEEDED = 'limit_exceeded'
+STATUSES = (OK, COMPILE_ERROR, RUNTIME_ERROR, LIMIT_EXCEEDED)
+
+
+class ScriptResult:
+    def __init__(self, path, status, output='', error='', seconds=0.0, instructions=0):
+        self.path = path
+        self.status = status
+        self.output = output
+        self.error = error
+        self.seconds = seconds            # compile + run, inside the worker
+        self.instructions = instructions  # VM instructions executed
+
+    def as_dict(self):
+        return dict(path=self.path, status=self.status, output=self.output, error=self.error,
+                    seconds=self.seconds, instructions=self.instructions)
+
+
+def compile_script(path, opt, cache_dir=None):
+    # -> (program, errors)
+    if cache_dir is not None:
+        program, errors, _ = compile_cached(path, opt, CompileCache(cache_dir))
+        return program, errors
+    ir, errors = compile_whole_file(path)
+    if errors:
+        return None, errors
+    ir, _ = optimize(ir, opt)
+    return link(ir, recycle_temps=opt >= RECYCLE_TEMPS_LEVEL), []
+
+
+def run_script(path, opt=1, max_steps=None, timeout=None, cache_dir=None):
+    # runs in a worker process; never raises for problems in the script
+    t0 = time.perf_counter()
+    stream = io.StringIO()
+    out = OutputWriter(stream)
+    status = OK
+    error = ''
+    steps = 0
+    try:
+        program, errors = compile_script(path, opt, cache_dir)
+        if errors:
+            status = COMPILE_ERROR
+            error = '; '.join(errors)
+        else:
+            _, steps = execute_limited(program, out.write, max_steps, timeout)
+    except SyntaxError as e:
+        status, error = COMPILE_ERROR, str(e)
+    except ExecutionLimitExceeded as e:
+        status, error = LIMIT_EXCEEDED, str(e)
+    except RecursionError as e:
+        status, error = COMPILE_ERROR, f'nesting too deep: {e}'
+    except Exception as e:
+        status, error = RUNTIME_ERROR, f'{type(e).__name__}: {e}'
+    out.flush()
+    return ScriptResult(path, status, stream.getvalue(), error,
+                        time.perf_counter() - t0, steps)
+
+
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    scripts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                scripts.append(os.path.join(base, line))
+    return scripts
+
+
+def collect_scripts(targets):
+    scripts = []
+    for target in targets:
+        if os.path.isdir(target):
+            found = []
+            for root, dirs, files in os.walk(target):
+                dirs[:] = [d for d in dirs if not d.startswith(('.', '__'))]
+                found.extend(os.path.join(root, f) for f in files if f.endswith('.mr'))
+            scripts.extend(sorted(found))
+        elif target.endswith('.mr'):
+            scripts.append(target)
+        else:
+            scripts.extend(read_manifest(target))
+    return scripts
+
+
+def run_batch(scripts, jobs=None, **options):
+    # yields ScriptResults in input order
+    worker = partial(run_script, **options)
+    if jobs == 1:
+        yield from map(worker, scripts)
+        return
+    jobs = jobs or os.cpu_count() or 1
+    # hand out scripts in chunks to keep the inter-process traffic down
+    chunksize = max(1, min(64, len(scripts) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(worker, scripts, chunksize=chunksize)
+
+
+def output_path(output_dir, root, script):
+    rel = os.path.relpath(os.path.abspath(script), root)
+    return os.path.join(output_dir, os.path.splitext(rel)[0] + '.out')
+
+
+def print_summary(results, wall, file=sys.stdout):
+    counts = {status: 0 for status in STATUSES}
+    for r in results:
+        counts[r.status] += 1
+        if r.status != OK:
+            print(f'{r.status:15} {r.path}: {r.error}', file=file)
+    total = len(results)
+    script_time = sum(r.seconds for r in results)
+    steps = sum(r.instructions for r in results)
+    print('--- BATCH SUMMARY ---', file=file)
+    for status in STATUSES:
+        print(f'{status:15} {counts[status]:8d}', file=file)
+    print(f'{"scripts":15} {total:8d}', file=file)
+    print(f'{"instructions":15} {steps:8d}', file=file)
+    print(f'{"script time":15} {script_time:8.2f} s', file=file)
+    print(f'{"wall time":15} {wall:8.2f} s', file=file)
+    if results:
+        slowest = max(results, key=lambda r: r.seconds)
+        print(f'{"slowest":15} {slowest.seconds:8.3f} s  {slowest.path}', file=file)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Compile and run many Marathi scripts in parallel.')
+    ap.add_argument('targets', nargs='+', metavar='TARGET',
+                    help='a directory (every .mr file below it), a .mr file, or a manifest listing one script per line')
+    ap.add_argument('-j', '--jobs', type=int, default=None,
+                    help='worker processes (default: one per CPU; 1 runs everything in this process)')
+    ap.add_argument('-O', dest='opt', type=int, choices=(0, 1, 2, 3), default=1,
+                    help='IR optimization level (default 1)')
+    ap.add_argument('--timeout', type=float, default=None, metavar='SEC',
+                    help='per-script execution time limit')
+    ap.add_argument('--max-instructions', type=int, default=None, metavar='N',
+                    help='per-script limit on executed VM instructions')
+    ap.add_argument('--cache-dir', metavar='DIR',
+                    help='share a compilation cache between workers and runs')
+    ap.add_argument('--output-dir', metavar='DIR',
+                    help='write each script\'s output to DIR/<script>.out')
+    ap.add_argument('--json', metavar='REPORT',
+                    help='write every result (including output) to REPORT as JSON')
+    args = ap.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        ap.error('--jobs must be at least 1')
+
+    scripts = collect_scripts(args.targets)
+    if not scripts:
+        ap.error('no .mr scripts found')
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(s)) for s in scripts])
+
+    t0 = time.perf_counter()
+    results = []
+    for r in run_batch(scripts, args.jobs, opt=args.opt, max_steps=args.max_instructions,
+                       timeout=args.timeout, cache_dir=args.cache_dir):
+        results.append(r)
+        if args.output_dir:
+            dest = output_path(args.output_dir, root, r.path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, 'w', encoding='utf-8') as f:
+                f.write(r.output)
+    wall = time.perf_counter() - t0
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([r.as_dict() for r in results], f, ensure_ascii=False, indent=1)
+    print_summary(results, wall)
+    return 0 if all(r.status == OK for r in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# Typed array benchmark: int arrays vs. lists of int objects.
+#
+#   python -m bench.arrays [N] [REPEAT]
+#
+# Compiles int_table (an N-element [0] * n array, filled and summed) at
+# -O1 twice: as analyzed, where the program's lists are array('q')
+# (vm.IntArrays), and with its const_array instructions turned back into
+# const_list. Reports the peak memory of one run (tracemalloc) and the
+# best execute() time of both.
+
+import sys
+import time
+import tracemalloc
+
+from parser import parse_code
+from semantic import SemanticAnalyzer
+from irgen import IRGen
+from optimizer import optimize
+from vm import link, execute
+from bench.workloads import int_table
+
+
+def compile_ir(source):
+    ast = parse_code(source)
+    sem = SemanticAnalyzer()
+    sem.analyze(ast)
+    sem.annotate_types(ast)
+    ir, _ = optimize(IRGen().gen(ast), 1)
+    return ir
+
+
+def as_lists(ir):
+    return [('const_list',) + ins[1:] if ins[0] == 'const_array' else ins for ins in ir]
+
+
+def peak_memory(program):
+    tracemalloc.start()
+    execute(program, write=lambda v: None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def best_of(program, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        execute(program, write=lambda v: None)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 1000000
+    repeat = int(argv[2]) if len(argv) > 2 else 3
+    ir = compile_ir(int_table(n))
+    arrays = link(ir)
+    lists = link(as_lists(ir))
+    out_arrays = []
+    out_lists = []
+    execute(arrays, out_arrays.append)
+    execute(lists, out_lists.append)
+    if out_arrays != out_lists:
+        raise SystemExit('int arrays and lists disagree')
+    print(f'int_table, n={n}, best of {repeat}')
+    print(f'  {"storage":8} {"peak MB":>9} {"bytes/elem":>11} {"ms":>9}')
+    for name, program in (('list', lists), ('array', arrays)):
+        peak = peak_memory(program)
+        t = best_of(program, repeat)
+        print(f'  {name:8} {peak / 1e6:9.1f} {peak / n:11.1f} {t * 1000:9.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
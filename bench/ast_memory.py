@@ -0,0 +1,78 @@
+# AST memory benchmark: slotted nodes vs. the old __dict__-backed nodes.
+#
+#   python -m bench.ast_memory [LINES]
+#
+# Parses an expression-heavy generated program, then rebuilds the same
+# tree out of plain classes (one per node type, attributes in __dict__,
+# as parser.py used to define them) and compares bytes per node.
+
+import sys
+import tracemalloc
+
+import parser
+from parser import parse_code, walk, ASTNode
+
+
+def generated_source(lines):
+    out = ['बदलवा a = 1', 'बदलवा b = 2', 'बदलवा arr = [1, 2, 3, 4]']
+    for i in range(lines):
+        out.append(f'a = (a + {i}) * (b - arr[{i % 4}]) % 7 + (a ^ 2 - b * 3) / (b + 1)')
+        if i % 10 == 0:
+            out.append(f'जर a > {i} आणि b < a तर')
+            out.append('    लिहा a - b')
+            out.append('संपले')
+    return '\n'.join(out) + '\n'
+
+
+def dict_classes():
+    # one unslotted class per node type with the same attributes
+    classes = {}
+    for name in dir(parser):
+        cls = getattr(parser, name)
+        if isinstance(cls, type) and issubclass(cls, ASTNode) and cls is not ASTNode:
+            def __init__(self, values, _slots=cls.__slots__):
+                for slot, value in zip(_slots, values):
+                    setattr(self, slot, value)
+            classes[cls] = type(name + 'Dict', (), {'__init__': __init__})
+    return classes
+
+
+def to_dict_nodes(root, classes):
+    # copy the tree bottom-up without recursion
+    order = list(walk(root))
+    copies = {}
+    def conv(v):
+        if isinstance(v, list):
+            return [copies[id(c)] if isinstance(c, ASTNode) else c for c in v]
+        return copies[id(v)] if isinstance(v, ASTNode) else v
+    for node in reversed(order):
+        values = [conv(getattr(node, slot)) for slot in node.__slots__]
+        copies[id(node)] = classes[type(node)](values)
+    return copies[id(root)]
+
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 20000
+    code = generated_source(lines)
+    classes = dict_classes()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    ast = parse_code(code)
+    slotted = tracemalloc.get_traced_memory()[0] - base
+    nodes = sum(1 for _ in walk(ast))
+
+    base = tracemalloc.get_traced_memory()[0]
+    old = to_dict_nodes(ast, classes)
+    dicts = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print(f'{nodes} AST nodes')
+    print(f'  __dict__ nodes: {dicts / 1e6:8.1f} MB  ({dicts / nodes:6.1f} B/node)')
+    print(f'  slotted nodes : {slotted / 1e6:8.1f} MB  ({slotted / nodes:6.1f} B/node)')
+    print(f'  saving        : {1 - slotted / dicts:8.1%}')
+    del old
+
+
+if __name__ == '__main__':
+    main(sys.argv)
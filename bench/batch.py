@@ -0,0 +1,64 @@
+# Batch runner benchmark: one `python run.py` process per script vs.
+# batch.py's worker pool.
+#
+#   python -m bench.batch [SCRIPTS] [JOBS]
+#
+# Generates SCRIPTS small programs in a temporary directory and runs them
+# both ways (JOBS workers for the pool, default one per CPU).
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import batch
+
+RUN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run.py')
+
+
+def small_source(i):
+    return '\n'.join([
+        f'बदलवा n = {10 + i % 20}',
+        'बदलवा s = 0',
+        'साठी k = 0 ते n तर',
+        '    s = s + k * k',
+        'संपले',
+        'जर s % 2 == 0 तर',
+        '    लिहा "सम"',
+        'नाहीतर',
+        '    लिहा "विषम"',
+        'संपले',
+        'लिहा s',
+    ]) + '\n'
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 200
+    jobs = int(argv[2]) if len(argv) > 2 else None
+    with tempfile.TemporaryDirectory() as tmp:
+        scripts = []
+        for i in range(count):
+            path = os.path.join(tmp, f's{i}.mr')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(small_source(i))
+            scripts.append(path)
+
+        t0 = time.perf_counter()
+        expected = [subprocess.run([sys.executable, RUN, s], capture_output=True,
+                                   text=True, check=True).stdout for s in scripts]
+        per_process = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        results = list(batch.run_batch(scripts, jobs))
+        pooled = time.perf_counter() - t0
+        assert [r.output for r in results] == expected
+
+    print(f'{count} scripts')
+    print(f'  process per script : {per_process * 1000:9.1f} ms')
+    print(f'  batch worker pool  : {pooled * 1000:9.1f} ms')
+    print(f'  speedup            : {per_process / pooled:9.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,72 @@
+# Bytecode file benchmark: mmap-loaded bytecode vs. a pickled Program.
+#
+#   python -m bench.bytecode [STATEMENTS]
+#
+# Compiles a generated program with STATEMENTS top-level statements, writes
+# it both ways and reports file size, load time, and load + decode time
+# (i.e. ready to run). The program ends with a folded float constant, and
+# the bytecode file must give back the same constant pool.
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import bytecode
+from run import compile_file
+from optimizer import optimize
+from vm import link, decode
+from bench.semantic import wide_source
+
+
+def best_of(fn, repeat=7):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def main(argv):
+    statements = int(argv[1]) if len(argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'prog.mr')
+        with open(src, 'w', encoding='utf-8') as f:
+            f.write(wide_source(statements) + 'बदलवा half = 2 ^ (0 - 1)\n')
+        ir, _ = compile_file(src)
+        program = link(optimize(ir, 1)[0])
+        pkl = os.path.join(tmp, 'prog.pickle')
+        mrb = os.path.join(tmp, 'prog.mrb')
+        with open(pkl, 'wb') as f:
+            pickle.dump(program, f, protocol=pickle.HIGHEST_PROTOCOL)
+        bytecode.save(program, mrb)
+        if list(bytecode.load(mrb).consts) != list(program.consts):
+            raise SystemExit('bytecode changed the constant pool')
+
+        write = lambda value: None
+        rows = [
+            ('pickle', os.path.getsize(pkl),
+             best_of(lambda: load_pickle(pkl)),
+             best_of(lambda: decode(load_pickle(pkl), write))),
+            ('bytecode', os.path.getsize(mrb),
+             best_of(lambda: bytecode.load(mrb)),
+             best_of(lambda: decode(bytecode.load(mrb), write))),
+        ]
+
+    print(f'{statements} top-level statements: {len(program.code)} instructions, '
+          f'{len(program.names)} slots, {len(program.consts)} consts')
+    print(f'  {"format":9} {"bytes":>9} {"load":>10} {"load+decode":>13}')
+    for name, size, load_t, ready_t in rows:
+        print(f'  {name:9} {size:9d} {load_t * 1000:7.2f} ms {ready_t * 1000:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
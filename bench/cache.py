@@ -0,0 +1,62 @@
+# Compilation cache benchmark: cold vs. warm startup.
+#
+#   python -m bench.cache [STATEMENTS]
+#
+# Writes a generated program with STATEMENTS top-level statements to a
+# temporary directory and times compile_cached from source to a runnable
+# program: cold (empty cache, full front end, link, and writing the
+# bytecode file with bytecode.save) and warm (hash the source, then
+# bytecode.load: mmap the file, check its header and decode the constant
+# pool; instructions are only read from the mapping when the program runs,
+# which isn't timed).
+
+import os
+import sys
+import tempfile
+import time
+
+from cache import CompileCache
+from run import compile_cached
+from bench.semantic import wide_source
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    statements = int(argv[1]) if len(argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'prog.mr')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(wide_source(statements))
+        source_size = os.path.getsize(path)
+        cache = CompileCache(os.path.join(tmp, '__mrcache__'))
+
+        def cold():
+            cache.clear()
+            program, errors, hit = compile_cached(path, 1, cache)
+            assert not errors and not hit
+
+        def warm():
+            program, errors, hit = compile_cached(path, 1, cache)
+            assert hit
+
+        cold_t = best_of(cold)
+        warm_t = best_of(warm)
+        size = sum(s for _, s, _ in cache.entries())
+
+    print(f'{statements} top-level statements, source {source_size} bytes, cache entry {size} bytes')
+    print(f'  cold : {cold_t * 1000:9.2f} ms')
+    print(f'  warm : {warm_t * 1000:9.2f} ms')
+    print(f'  speedup : {cold_t / warm_t:6.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,140 @@
+# Dispatch benchmark: handler-closure VM vs. the if/elif opcode loop.
+#
+#   python -m bench.dispatch [N] [REPEAT] [STATEMENTS]
+#
+# Runs a bubble sort of N elements (reverse sorted, so every comparison
+# swaps) through both dispatch strategies on the same linked program.
+# Then times decode() alone on a straight-line program of STATEMENTS
+# statements, where building one handler per instruction dominates, with
+# and without the cyclic collector running meanwhile.
+
+import sys
+import time
+
+from parser import parse_code
+from irgen import IRGen
+from vm import link, execute, decode, builds_arrays, IntArrays, DECODERS, BINOP, LOAD_CONST, MOVE, JUMP_IF_FALSE, JUMP, \
+    INDEX_GET, INDEX_SET, BUILD_LIST, PRINT
+from bench.workloads import bubble_sort as bubble_sort_source, straight_line
+
+
+def switch_execute(program, write=print):
+    # the if/elif loop execute() used before handler dispatch, kept as the baseline
+    regs = [None] * len(program.names)
+    consts = program.consts
+    code = program.code
+    n = len(code)
+    ip = 0
+    while ip < n:
+        ins = code[ip]
+        op = ins[0]
+        if op == BINOP:
+            _, t, bop, a, b = ins
+            av = regs[a]
+            bv = regs[b]
+            if bop == 'plus':
+                regs[t] = av + bv
+            elif bop == 'minus':
+                regs[t] = av - bv
+            elif bop == 'mul':
+                regs[t] = av * bv
+            elif bop == 'div':
+                regs[t] = av // bv
+            elif bop == 'eq':
+                regs[t] = 1 if av == bv else 0
+            elif bop == 'ne':
+                regs[t] = 1 if av != bv else 0
+            elif bop == 'lt':
+                regs[t] = 1 if av < bv else 0
+            elif bop == 'gt':
+                regs[t] = 1 if av > bv else 0
+            elif bop == 'le':
+                regs[t] = 1 if av <= bv else 0
+            elif bop == 'ge':
+                regs[t] = 1 if av >= bv else 0
+            elif bop == 'mod':
+                regs[t] = av % bv
+            elif bop == 'pow':
+                regs[t] = av ** bv
+            elif bop == 'and':
+                regs[t] = 1 if av and bv else 0
+            elif bop == 'or':
+                regs[t] = 1 if av or bv else 0
+            else:
+                raise RuntimeError('Unknown binop ' + bop)
+        elif op == LOAD_CONST:
+            regs[ins[1]] = consts[ins[2]]
+        elif op == MOVE:
+            regs[ins[1]] = regs[ins[2]]
+        elif op == JUMP_IF_FALSE:
+            if not regs[ins[1]]:
+                ip = ins[2]
+                continue
+        elif op == JUMP:
+            ip = ins[1]
+            continue
+        elif op == INDEX_GET:
+            _, t, arr, idx = ins
+            regs[t] = regs[arr][regs[idx]]
+        elif op == INDEX_SET:
+            _, arr, idx, src = ins
+            arrv = regs[arr]
+            if isinstance(arrv, list):
+                arrv[regs[idx]] = regs[src]
+            else:
+                raise RuntimeError('Indexing into non-list')
+        elif op == BUILD_LIST:
+            regs[ins[1]] = [regs[s] for s in ins[2]]
+        elif op == PRINT:
+            write(regs[ins[1]])
+        ip += 1
+    return regs
+
+
+def collected_decode(program, write=print):
+    # decode() before it paused the collector, kept as the baseline
+    regs = [None] * program.n_slots
+    consts = program.consts
+    code = list(program.instructions())
+    decoders = IntArrays(regs).decoders() if builds_arrays(code) else DECODERS
+    handlers = [decoders[ins[0]](ins, ip + 1, regs, consts, write)
+                for ip, ins in enumerate(code)]
+    return handlers, regs
+
+
+def best_of(fn, program, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(program, write=lambda v: None)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 200
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    program = link(IRGen().gen(parse_code(bubble_sort_source(n))))
+    if switch_execute(program, write=lambda v: None) != execute(program, write=lambda v: None):
+        raise SystemExit('dispatch strategies disagree')
+
+    switch = best_of(switch_execute, program, repeat)
+    handlers = best_of(execute, program, repeat)
+    print(f'bubble sort, n={n}, best of {repeat}')
+    print(f'  if/elif loop     : {switch * 1000:9.2f} ms')
+    print(f'  handler dispatch : {handlers * 1000:9.2f} ms')
+    print(f'  speedup          : {switch / handlers:9.2f}x')
+
+    statements = int(argv[3]) if len(argv) > 3 else 50000
+    program = link(IRGen().gen(parse_code(straight_line(statements))))
+    collected = best_of(collected_decode, program, repeat)
+    paused = best_of(decode, program, repeat)
+    print(f'decode, straight line of {statements} statements ({len(program.code)} instructions), best of {repeat}')
+    print(f'  collector running : {collected * 1000:9.2f} ms')
+    print(f'  collector paused  : {paused * 1000:9.2f} ms')
+    print(f'  speedup           : {collected / paused:9.2f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,61 @@
+# Tracing JIT benchmark: interpreter vs. compiled hot loops.
+#
+#   python -m bench.jit [SCALE] [REPEAT]
+#
+# Compiles each workload once (analyzed, -O1, linked) and times vm.execute
+# against jit.execute_jit on the same Program. The JIT time includes
+# counting, recording and compiling the traces.
+
+import sys
+import time
+
+from parser import parse_code
+from semantic import SemanticAnalyzer
+from irgen import IRGen
+from optimizer import optimize
+from vm import link, execute
+from jit import execute_jit
+from bench.workloads import bubble_sort, for_loop
+
+
+def build(source):
+    ast = parse_code(source)
+    sem = SemanticAnalyzer()
+    sem.analyze(ast)
+    sem.annotate_types(ast)
+    ir, _ = optimize(IRGen().gen(ast), 1)
+    return link(ir)
+
+
+def best_of(run, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    cases = [('bubble_sort', bubble_sort(max(2, int(200 * scale)))),
+             ('for_loop', for_loop(max(1, int(200000 * scale))))]
+    print(f'{"workload":12} {"interp ms":>10} {"jit ms":>8} {"speedup":>8} {"traces":>7} {"entries":>8}')
+    for name, source in cases:
+        program = build(source)
+        out_interp = []
+        out_jit = []
+        regs = execute(program, out_interp.append)
+        jit_regs, traces = execute_jit(program, out_jit.append)
+        if out_interp != out_jit or regs != jit_regs:
+            raise SystemExit(f'{name}: JIT and interpreter disagree')
+        t_interp = best_of(lambda: execute(program, lambda v: None), repeat)
+        t_jit = best_of(lambda: execute_jit(program, lambda v: None), repeat)
+        print(f'{name:12} {t_interp * 1000:10.2f} {t_jit * 1000:8.2f} {t_interp / t_jit:7.2f}x '
+              f'{len(traces):7d} {sum(t.entries for t in traces):8d}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,60 @@
+# Loop optimization benchmark: -O3 with and without optimize_loops.
+#
+#   python -m bench.loops [SCALE] [REPEAT]
+#
+# Compiles each workload with the -O3 passes, once without optimize_loops
+# (loop-invariant code motion and the list-check rewrite), and reports the
+# IR length, the instructions executed per element the loops visit, and
+# the best execute() time of both versions.
+
+import sys
+import time
+
+from optimizer import LEVELS
+from ssa import optimize_loops
+from vm import execute
+from bench.pairs import compile_program, count_pairs
+from bench.workloads import array_scan, bubble_sort, for_loop
+
+
+def best_of(program, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        execute(program, write=lambda v: None)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    n = max(2, int(100 * scale))
+    passes = 50
+    # (name, source, elements visited)
+    cases = [('array_scan', array_scan(n * 10, passes), n * 10 * passes),
+             ('bubble_sort', bubble_sort(n), n * (n - 1) // 2),
+             ('for_loop', for_loop(n * 1000), n * 1000)]
+    without = [p for p in LEVELS[3] if p is not optimize_loops]
+    print(f'{"workload":12} {"instrs":>13} {"per element":>15} {"without ms":>11} {"with ms":>8}')
+    for name, source, elements in cases:
+        plain = compile_program(source, without)
+        looped = compile_program(source, LEVELS[3])
+        out_plain = []
+        out_looped = []
+        execute(plain, out_plain.append)
+        execute(looped, out_looped.append)
+        if out_plain != out_looped:
+            raise SystemExit(f'{name}: optimize_loops changed the output')
+        _, n_plain = count_pairs(plain)
+        _, n_looped = count_pairs(looped)
+        t_plain = best_of(plain, repeat)
+        t_looped = best_of(looped, repeat)
+        print(f'{name:12} {len(plain.code):6d} -> {len(looped.code):4d} '
+              f'{n_plain / elements:6.2f} -> {n_looped / elements:5.2f} '
+              f'{t_plain * 1000:11.2f} {t_looped * 1000:8.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
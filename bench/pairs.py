@@ -0,0 +1,119 @@
+# Opcode-pair frequencies: what to fuse, and what fusion saved.
+#
+#   python -m bench.pairs [FILE ...] [--top N]
+#
+# Runs a corpus (sample.mr, the bench.workloads programs at small sizes,
+# and any FILEs given) through the VM with a counting run loop, and
+# reports the most frequently executed pairs of consecutive instructions,
+# first with -O1 minus fuse_instructions and then with it. Each executed
+# instruction is one handler dispatch, so the totals are dispatch counts.
+
+import argparse
+import sys
+import time
+from collections import Counter
+
+from parser import parse_code
+from semantic import SemanticAnalyzer
+from irgen import IRGen
+from optimizer import LEVELS, PassManager, fuse_instructions
+from vm import link, decode, OPNAMES, BINOP, INT_BINOP, BINOP_CONST, CMP_JUMP, CMP_CONST_JUMP
+from run import DEFAULT_SOURCE
+from bench.workloads import straight_line, bubble_sort, deep_expression, for_loop
+
+
+def corpus(paths):
+    with open(DEFAULT_SOURCE, 'r', encoding='utf-8') as f:
+        programs = [('sample.mr', f.read())]
+    programs += [('straight_line', straight_line(300)),
+                 ('bubble_sort', bubble_sort(40)),
+                 ('deep_expression', deep_expression(40)),
+                 ('for_loop', for_loop(5000))]
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            programs.append((path, f.read()))
+    return programs
+
+
+def opname(ins):
+    op = ins[0]
+    if op in (BINOP, INT_BINOP, BINOP_CONST):
+        return f'{OPNAMES[op]}:{ins[2]}'
+    if op in (CMP_JUMP, CMP_CONST_JUMP):
+        return f'{OPNAMES[op]}:{ins[1]}'
+    return OPNAMES[op]
+
+
+def count_pairs(program):
+    # -> (Counter of (name, next name), instructions executed)
+    handlers, regs = decode(program, lambda v: None)
+    n = len(handlers)
+    transitions = Counter()
+    ip = 0
+    while ip < n:
+        nxt = handlers[ip]()
+        transitions[ip, nxt] += 1
+        ip = nxt
+    names = [opname(ins) for ins in program.instructions()]
+    pairs = Counter()
+    executed = 0
+    for (ip, nxt), count in transitions.items():
+        executed += count
+        if nxt < n:
+            pairs[names[ip], names[nxt]] += count
+    return pairs, executed
+
+
+def compile_program(source, passes):
+    ast = parse_code(source)
+    sem = SemanticAnalyzer()
+    sem.analyze(ast)
+    if sem.errors:
+        raise ValueError('; '.join(sem.errors))
+    sem.annotate_types(ast)
+    ir, _ = PassManager(passes).run(IRGen().gen(ast))
+    return link(ir)
+
+
+def measure(programs, passes):
+    total_pairs = Counter()
+    rows = []
+    for name, source in programs:
+        program = compile_program(source, passes)
+        pairs, executed = count_pairs(program)
+        total_pairs.update(pairs)
+        t0 = time.perf_counter()
+        handlers, regs = decode(program, lambda v: None)
+        ip = 0
+        while ip < len(handlers):
+            ip = handlers[ip]()
+        rows.append((name, executed, time.perf_counter() - t0))
+    return total_pairs, rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m bench.pairs',
+                                 description='Count executed opcode pairs with and without fusion.')
+    ap.add_argument('files', nargs='*', help='extra Marathi programs for the corpus')
+    ap.add_argument('--top', type=int, default=12, help='pairs to list (default 12)')
+    args = ap.parse_args(argv)
+
+    programs = corpus(args.files)
+    unfused = [p for p in LEVELS[1] if p is not fuse_instructions]
+    before_pairs, before = measure(programs, unfused)
+    after_pairs, after = measure(programs, LEVELS[1])
+
+    for title, pairs in (('without fusion', before_pairs), ('with fusion', after_pairs)):
+        total = sum(pairs.values()) or 1
+        print(f'--- top pairs, -O1 {title} ---')
+        for (a, b), count in pairs.most_common(args.top):
+            print(f'{count:12d} {100 * count / total:5.1f}%  {a} -> {b}')
+    print('--- dispatches ---')
+    print(f'{"program":20} {"unfused":>12} {"fused":>12} {"saved":>7} {"unfused ms":>11} {"fused ms":>9}')
+    for (name, n0, t0), (_, n1, t1) in zip(before, after):
+        print(f'{name[-20:]:20} {n0:12d} {n1:12d} {100 * (n0 - n1) / (n0 or 1):6.1f}% {t0 * 1000:11.2f} {t1 * 1000:9.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# Expression parsing benchmark: precedence climbing vs. recursive descent.
+#
+#   python -m bench.parse [LINES] [DEPTH]
+#
+# Times Parser (table-driven precedence climbing) against RecursiveParser,
+# a copy of the recursive-descent expression methods the parser used
+# before, on a generated expression-heavy program. Also checks how deep a
+# parenthesised expression each one can take.
+
+import sys
+import time
+
+from lexer import *
+from parser import Parser, BinOp, Num, Str, Var, Index, ArrayLiteral
+from bench.ast_memory import generated_source
+
+
+class RecursiveParser(Parser):
+    # one method per precedence level, eight calls per literal
+    def expr(self):
+        return self.parse_or()
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek()[0] == T_OR:
+            self.next()
+            right = self.parse_and()
+            node = BinOp(node, 'OR', right)
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek()[0] == T_AND:
+            self.next()
+            right = self.parse_not()
+            node = BinOp(node, 'AND', right)
+        return node
+
+    def parse_not(self):
+        if self.peek()[0] == T_NOT:
+            self.next()
+            operand = self.parse_comparison()
+            return BinOp(Num(0), 'EQ', operand)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_addsub()
+        while self.peek()[0] in (T_EQ, T_NE, T_LT, T_GT, T_LE, T_GE):
+            op = TOKEN_KINDS[self.next()[0]]
+            right = self.parse_addsub()
+            node = BinOp(node, op, right)
+        return node
+
+    def parse_addsub(self):
+        node = self.parse_muldivmod()
+        while self.peek()[0] in (T_PLUS, T_MINUS):
+            op = TOKEN_KINDS[self.next()[0]]
+            right = self.parse_muldivmod()
+            node = BinOp(node, op, right)
+        return node
+
+    def parse_muldivmod(self):
+        node = self.parse_power()
+        while self.peek()[0] in (T_MUL, T_DIV, T_MOD):
+            op = TOKEN_KINDS[self.next()[0]]
+            right = self.parse_power()
+            node = BinOp(node, op, right)
+        return node
+
+    def parse_power(self):
+        node = self.factor()
+        while self.peek()[0] == T_POW:
+            op = TOKEN_KINDS[self.next()[0]]
+            right = self.factor()
+            node = BinOp(node, op, right)
+        return node
+
+    def factor(self):
+        tok = self.peek()
+        if tok[0] == T_NUMBER:
+            self.next()
+            return Num(tok[1])
+        if tok[0] == T_STRING:
+            self.next()
+            return Str(tok[1])
+        if tok[0] == T_ID:
+            name = self.next()[1]
+            node = Var(name)
+            if self.peek()[0] == T_LBRACK:
+                self.next()
+                idx = self.expr()
+                self.expect(T_RBRACK)
+                node = Index(node, idx)
+            return node
+        if tok[0] == T_LPAREN:
+            self.next()
+            node = self.expr()
+            self.expect(T_RPAREN)
+            return node
+        if tok[0] == T_LBRACK:
+            self.next()
+            elems = []
+            if self.peek()[0] != T_RBRACK:
+                elems.append(self.expr())
+                while self.peek()[0] == T_COMMA:
+                    self.next()
+                    elems.append(self.expr())
+            self.expect(T_RBRACK)
+            return ArrayLiteral(elems)
+        raise SyntaxError(f'Unexpected token in factor: {TOKEN_KINDS[tok[0]]} at {tok[2]}:{tok[3]}')
+
+
+def parse_time(cls, toks, repeat=3):
+    # parse only: the token list is built up front
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cls(toks).parse()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def max_depth(cls, limit):
+    # deepest '((...1...))' that parses, up to limit
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        try:
+            cls(tokenize('लिहा ' + '(' * mid + '1' + ')' * mid)).parse()
+            lo = mid
+        except RecursionError:
+            hi = mid - 1
+    return lo
+
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 5000
+    depth = int(argv[2]) if len(argv) > 2 else 100000
+    code = generated_source(lines)
+    if repr(Parser(tokenize(code)).parse()) != repr(RecursiveParser(tokenize(code)).parse()):
+        raise SystemExit('parsers disagree')
+    toks = list(tokenize(code))
+    ntok = len(toks)
+
+    recursive = parse_time(RecursiveParser, toks)
+    climbing = parse_time(Parser, toks)
+    print(f'{lines} generated lines, {ntok} tokens, best of 3')
+    print(f'  recursive descent   : {ntok / recursive / 1e3:8.1f} ktok/s')
+    print(f'  precedence climbing : {ntok / climbing / 1e3:8.1f} ktok/s')
+    print(f'  speedup             : {recursive / climbing:8.2f}x')
+    print(f'  max paren depth     : recursive {max_depth(RecursiveParser, depth)}, '
+          f'climbing {max_depth(Parser, depth)} (tested up to {depth})')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
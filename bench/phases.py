@@ -0,0 +1,217 @@
+# Phase-level benchmark and regression tracker for the compiler pipeline.
+#
+#   python -m bench.phases run [--workloads a,b] [--scale F] [--repeat N]
+#                              [--out results.json] [--baseline old.json]
+#   python -m bench.phases compare BASELINE CURRENT [--threshold 0.15]
+#
+# `run` generates every workload from bench.workloads at each of its sizes
+# and times the pipeline one phase at a time (best of N), then runs each
+# phase once more under tracemalloc for its peak memory:
+#
+#   tokenize   list(tokenize(code))
+#   parse      Parser over the token list (lexing excluded)
+#   analyze    SemanticAnalyzer.analyze, then annotate_types
+#   irgen      IRGen.gen
+#   optimize   optimizer.optimize at -O1
+#   interpret  interpret_ir: link + execute
+#
+# A phase that raises (e.g. RecursionError on a deep workload) is recorded
+# with its error and the later phases of that workload are skipped.
+# `compare` (or `run --baseline`) reports every phase whose time or peak
+# memory grew by more than the threshold and exits with status 1 if any did.
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from lexer import tokenize
+from parser import Parser
+from semantic import SemanticAnalyzer
+from irgen import IRGen
+from optimizer import optimize
+from run import interpret_ir
+from bench.workloads import WORKLOADS
+
+PHASES = ('tokenize', 'parse', 'analyze', 'irgen', 'optimize', 'interpret')
+
+# differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.002
+MIN_BYTES = 64 * 1024
+
+
+def analyze(ast):
+    sem = SemanticAnalyzer()
+    sem.analyze(ast)
+    if sem.errors:
+        raise ValueError('; '.join(sem.errors))
+    sem.annotate_types(ast)
+    return sem
+
+
+def phase_steps(code):
+    # (phase, fn(previous results) -> result)
+    discard = lambda value: None
+    return [
+        ('tokenize', lambda r: list(tokenize(code))),
+        ('parse', lambda r: Parser(r['tokenize']).parse()),
+        ('analyze', lambda r: analyze(r['parse'])),
+        ('irgen', lambda r: IRGen().gen(r['parse'])),
+        ('optimize', lambda r: optimize(r['irgen'], 1)[0]),
+        ('interpret', lambda r: interpret_ir(r['optimize'], discard)),
+    ]
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def measure(code, repeat):
+    records = []
+    results = {}
+    for phase, fn in phase_steps(code):
+        best = None
+        try:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                result = fn(results)
+                dt = time.perf_counter() - t0
+                best = dt if best is None else min(best, dt)
+            peak = peak_bytes(lambda: fn(results))
+        except Exception as e:
+            records.append({'phase': phase, 'error': f'{type(e).__name__}: {e}'[:200]})
+            break
+        results[phase] = result
+        records.append({'phase': phase, 'seconds': best, 'peak_bytes': peak})
+    return records
+
+
+def run_suite(names, scale, repeat, log=sys.stderr):
+    records = []
+    for name in names:
+        generate, sizes = WORKLOADS[name]
+        for size in sizes:
+            size = max(1, int(size * scale))
+            print(f'  {name} {size} ...', file=log, flush=True)
+            for rec in measure(generate(size), repeat):
+                records.append(dict(workload=name, size=size, **rec))
+    return records
+
+
+def print_results(records, file=sys.stdout):
+    rows = {}
+    for rec in records:
+        rows.setdefault((rec['workload'], rec['size']), {})[rec['phase']] = rec
+    print(f'{"workload":16} {"size":>8} ' + ' '.join(f'{p:>10}' for p in PHASES)
+          + f' {"peak MB":>8}  slowest', file=file)
+    for (name, size), phases in rows.items():
+        cells = []
+        for p in PHASES:
+            rec = phases.get(p)
+            if rec is None:
+                cells.append(f'{"-":>10}')
+            elif 'error' in rec:
+                cells.append(f'{rec["error"].split(":")[0][:10]:>10}')
+            else:
+                cells.append(f'{rec["seconds"] * 1000:10.2f}')
+        timed = [r for r in phases.values() if 'seconds' in r]
+        peak = max((r['peak_bytes'] for r in timed), default=0)
+        total = sum(r['seconds'] for r in timed) or 1.0
+        slowest = max(timed, key=lambda r: r['seconds'], default=None)
+        share = f'{slowest["phase"]} ({100 * slowest["seconds"] / total:.0f}%)' if slowest else '-'
+        print(f'{name:16} {size:8d} ' + ' '.join(cells) + f' {peak / 2**20:8.1f}  {share}', file=file)
+    print('(times in ms, best of the repeats; peak MB is the largest single-phase peak)', file=file)
+
+
+def compare(baseline, current, threshold, file=sys.stdout):
+    # -> number of regressions
+    def keyed(records):
+        return {(r['workload'], r['size'], r['phase']): r for r in records}
+    old = keyed(baseline['results'])
+    new = keyed(current['results'])
+    regressions = 0
+    print(f'{"workload":16} {"size":>8} {"phase":10} {"old ms":>10} {"new ms":>10} {"time":>7} {"memory":>7}', file=file)
+    for key, cur in new.items():
+        base = old.get(key)
+        if base is None:
+            continue
+        name, size, phase = key
+        if 'error' in cur or 'error' in base:
+            if 'error' in cur and 'error' not in base:
+                regressions += 1
+                print(f'{name:16} {size:8d} {phase:10} now fails: {cur["error"]}  REGRESSION', file=file)
+            continue
+        t_ratio = cur['seconds'] / base['seconds'] if base['seconds'] else 1.0
+        m_ratio = cur['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        slower = t_ratio > 1 + threshold and cur['seconds'] - base['seconds'] > MIN_SECONDS
+        bigger = m_ratio > 1 + threshold and cur['peak_bytes'] - base['peak_bytes'] > MIN_BYTES
+        flag = ''
+        if slower or bigger:
+            regressions += 1
+            flag = '  REGRESSION (' + ', '.join(w for w, f in (('time', slower), ('memory', bigger)) if f) + ')'
+        print(f'{name:16} {size:8d} {phase:10} {base["seconds"] * 1000:10.2f} {cur["seconds"] * 1000:10.2f} '
+              f'{t_ratio:6.2f}x {m_ratio:6.2f}x{flag}', file=file)
+    print(f'{regressions} regression(s) at a {threshold:.0%} threshold', file=file)
+    return regressions
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m bench.phases',
+                                 description='Time each compiler phase on generated workloads.')
+    sub = ap.add_subparsers(dest='command', required=True)
+    r = sub.add_parser('run', help='run the benchmark suite')
+    r.add_argument('--workloads', default=','.join(WORKLOADS),
+                   help=f'comma-separated subset of {",".join(WORKLOADS)}')
+    r.add_argument('--scale', type=float, default=1.0, help='multiply every workload size by this')
+    r.add_argument('--repeat', type=int, default=3, help='timing runs per phase (best is kept)')
+    r.add_argument('--out', metavar='FILE', help='write the results to FILE as JSON')
+    r.add_argument('--baseline', metavar='FILE', help='compare against a stored result file')
+    r.add_argument('--threshold', type=float, default=0.15, help='relative growth counted as a regression')
+    c = sub.add_parser('compare', help='compare two result files')
+    c.add_argument('baseline')
+    c.add_argument('current')
+    c.add_argument('--threshold', type=float, default=0.15, help='relative growth counted as a regression')
+    args = ap.parse_args(argv)
+
+    if args.command == 'compare':
+        return 1 if compare(load(args.baseline), load(args.current), args.threshold) else 0
+
+    names = [n.strip() for n in args.workloads.split(',') if n.strip()]
+    unknown = [n for n in names if n not in WORKLOADS]
+    if unknown:
+        ap.error(f'unknown workload {", ".join(unknown)}')
+    current = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'repeat': args.repeat,
+        },
+        'results': run_suite(names, args.scale, args.repeat),
+    }
+    print_results(current['results'])
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=1)
+    if args.baseline:
+        return 1 if compare(load(args.baseline), current, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
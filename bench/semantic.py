@@ -0,0 +1,214 @@
+# Semantic analysis benchmark: table-dispatched work-stack analyzer vs.
+# the previous recursive analyzer.
+#
+#   python -m bench.semantic [STATEMENTS] [DEPTH]
+#
+# Runs both on machine-generated programs: a wide one with STATEMENTS
+# top-level statements, and a deep one with blocks nested DEPTH levels.
+
+import sys
+import time
+
+from parser import *
+from semantic import SemanticAnalyzer
+
+
+class RecursiveAnalyzer:
+    # SemanticAnalyzer before the work-stack rewrite: string-built method
+    # names, recursion, and analyze_ForLoop accidentally nested in
+    # analyze_While (so for-loops take the generic traversal)
+    def __init__(self):
+        self.symbols = {}  # name -> type ('int' or 'str' or 'list')
+        self.errors = []
+
+    def analyze(self, node):
+        method = 'analyze_' + node.__class__.__name__
+        if hasattr(self, method):
+            return getattr(self, method)(node)
+        else:
+            # generic traversal
+            for child in iter_child_nodes(node):
+                self.analyze(child)
+
+    def analyze_Program(self, node):
+        for s in node.statements:
+            self.analyze(s)
+
+    def analyze_Let(self, node):
+        t = self.evaluate_type(node.expr)
+        
+        self.symbols[node.name] = t or 'int'
+
+    def analyze_Print(self, node):
+        _ = self.evaluate_type(node.expr)
+
+    def analyze_Assign(self, node):
+        # target can be Var or Index
+        t = self.evaluate_type(node.expr)
+        if isinstance(node.target, Var):
+            name = node.target.name
+            if name not in self.symbols:
+                self.errors.append(f'Use of undeclared variable {name}')
+            else:
+                if t is None:
+                    self.errors.append(f'Cannot determine type of expression assigned to {name}')
+                else:
+                    self.symbols[name] = t
+        elif isinstance(node.target, Index):
+            # ensure array exists and is list
+            arr_t = self.evaluate_type(node.target.array)
+            if arr_t != 'list':
+                self.errors.append('Indexing non-list value')
+            # index must be int
+            idx_t = self.evaluate_type(node.target.index)
+            if idx_t != 'int':
+                self.errors.append('List index must be integer')
+
+    def analyze_If(self, node):
+        cond_t = self.evaluate_type(node.cond)
+        if cond_t != 'int':
+            self.errors.append('Condition in IF must be numeric (int)')
+        for s in node.then_block:
+            self.analyze(s)
+        if node.else_block:
+            for s in node.else_block:
+                self.analyze(s)
+
+    def analyze_While(self, node):
+        cond_t = self.evaluate_type(node.cond)
+        if cond_t != 'int':
+            self.errors.append('Condition in WHILE must be numeric (0=false, non-zero=true)')
+        for s in node.body:
+            self.analyze(s)
+    
+        def analyze_ForLoop(self, node):
+            # ensure loop variable exists
+            if node.var not in self.symbols:
+                self.symbols[node.var] = 'int'
+            start_t = self.evaluate_type(node.start)
+            end_t = self.evaluate_type(node.end)
+            if start_t != 'int' or end_t != 'int':
+                self.errors.append('For-loop range must be integers')
+            for s in node.body:
+                self.analyze(s)
+
+
+    def evaluate_type(self, expr):
+        if isinstance(expr, Num):
+            return 'int'
+        if isinstance(expr, Str):
+            return 'str'
+        if isinstance(expr, Var):
+            if expr.name not in self.symbols:
+                self.errors.append(f'Use of undeclared variable {expr.name}')
+                return None
+            return self.symbols[expr.name]
+        if isinstance(expr, ArrayLiteral):
+            # ensure all elements have type and are same (we'll allow ints/strs, prefer int->list)
+            elem_types = []
+            for e in expr.elements:
+                et = self.evaluate_type(e)
+                elem_types.append(et)
+            # if any None, return None
+            if any(t is None for t in elem_types):
+                return None
+            # simple policy: if all int -> list of int, else list
+            if all(t == 'int' for t in elem_types):
+                return 'list'
+            else:
+                return 'list'
+        if isinstance(expr, Index):
+            arr_t = self.evaluate_type(expr.array)
+            idx_t = self.evaluate_type(expr.index)
+            if arr_t != 'list':
+                self.errors.append('Indexing non-list value')
+                return None
+            if idx_t != 'int':
+                self.errors.append('List index must be integer')
+                return None
+            # element type unknown => return int or str? we assume int for arithmetic
+            # return 'int' to allow arithmetic on elements that are ints
+            return 'int'
+        if isinstance(expr, BinOp):
+            lt = self.evaluate_type(expr.left)
+            rt = self.evaluate_type(expr.right)
+            if lt is None or rt is None:
+                return None
+            if expr.op in ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE'):
+                return 'int'
+            if lt == 'int' and rt == 'int':
+                return 'int'
+            if lt == 'str' or rt == 'str':
+                self.errors.append('Type error: arithmetic on strings')
+                return None
+        return None
+
+def wide_source(statements):
+    out = ['बदलवा x = 0', 'बदलवा arr = [1, 2, 3, 4]']
+    for i in range(statements):
+        k = i % 4
+        if k == 0:
+            out.append(f'x = x + arr[{i % 4}] * {i} - (x % 3)')
+        elif k == 1:
+            out.append(f'जर x > {i} आणि x < {i * 2} तर')
+            out.append('    लिहा x')
+            out.append('नाहीतर')
+            out.append(f'    arr[{i % 4}] = x - {i}')
+            out.append('संपले')
+        elif k == 2:
+            out.append(f'साठी i = 0 ते {i % 7} तर')
+            out.append('    x = x + i')
+            out.append('संपले')
+        else:
+            out.append(f'बदलवा y{i} = x ^ 2')
+    return '\n'.join(out) + '\n'
+
+
+def deep_source(depth):
+    out = ['बदलवा x = 0']
+    for d in range(depth):
+        ind = '    ' * d
+        out.append(ind + (f'जर x < {d} तर' if d % 2 else f'जोपर्यंत x > {d} तर'))
+        out.append(ind + f'    x = x + {d}')
+    for d in reversed(range(depth)):
+        out.append('    ' * d + 'संपले')
+    return '\n'.join(out) + '\n'
+
+
+def best_of(cls, ast, repeat=5):
+    best = None
+    for _ in range(repeat):
+        sem = cls()
+        t0 = time.perf_counter()
+        try:
+            sem.analyze(ast)
+        except RecursionError:
+            return None
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def report(label, ast):
+    old = best_of(RecursiveAnalyzer, ast)
+    new = best_of(SemanticAnalyzer, ast)
+    old_s = f'{old * 1000:9.2f} ms' if old is not None else '  RecursionError'
+    print(f'{label}')
+    print(f'  recursive  : {old_s}')
+    print(f'  work stack : {new * 1000:9.2f} ms')
+    if old is not None:
+        print(f'  speedup    : {old / new:9.2f}x')
+
+
+def main(argv):
+    statements = int(argv[1]) if len(argv) > 1 else 5000
+    depth = int(argv[2]) if len(argv) > 2 else 400
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * depth))  # for the parser
+    report(f'wide: {statements} top-level statements', parse_code(wide_source(statements)))
+    report(f'deep: blocks nested {depth} levels', parse_code(deep_source(depth)))
+    sys.setrecursionlimit(1000)
+    report(f'deep: blocks nested {depth} levels, default recursion limit', parse_code(deep_source(depth)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,57 @@
+# SSA middle-end benchmark: -O2 vs. -O3.
+#
+#   python -m bench.ssa [SCALE] [REPEAT]
+#
+# Compiles each workload at -O2 and at -O3 (which adds SSA-based global
+# constant propagation and dead-code removal) and reports the IR length,
+# the instructions executed, the compile time and the best execute() time
+# of both.
+
+import sys
+import time
+
+from optimizer import LEVELS
+from vm import execute
+from bench.pairs import compile_program, count_pairs
+from bench.workloads import bubble_sort, configured_loop, for_loop, straight_line
+
+
+def best_of(run, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    cases = [('configured_loop', configured_loop(max(1, int(100000 * scale)))),
+             ('straight_line', straight_line(max(1, int(2000 * scale)))),
+             ('bubble_sort', bubble_sort(max(2, int(100 * scale)))),
+             ('for_loop', for_loop(max(1, int(100000 * scale))))]
+    print(f'{"workload":16} {"instrs":>13} {"executed":>21} {"compile ms":>17} {"O2 ms":>8} {"O3 ms":>8}')
+    for name, source in cases:
+        o2 = compile_program(source, LEVELS[2])
+        o3 = compile_program(source, LEVELS[3])
+        out2 = []
+        out3 = []
+        execute(o2, out2.append)
+        execute(o3, out3.append)
+        if out2 != out3:
+            raise SystemExit(f'{name}: -O2 and -O3 disagree')
+        _, n2 = count_pairs(o2)
+        _, n3 = count_pairs(o3)
+        c2 = best_of(lambda: compile_program(source, LEVELS[2]), repeat)
+        c3 = best_of(lambda: compile_program(source, LEVELS[3]), repeat)
+        t2 = best_of(lambda: execute(o2, lambda v: None), repeat)
+        t3 = best_of(lambda: execute(o3, lambda v: None), repeat)
+        print(f'{name:16} {len(o2.code):6d} -> {len(o3.code):4d} {n2:10d} -> {n3:8d} '
+              f'{c2 * 1000:8.2f} -> {c3 * 1000:6.2f} {t2 * 1000:8.2f} {t3 * 1000:8.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,79 @@
+# Token representation benchmark: tuple stream vs. columnar buffers.
+#
+#   python -m bench.tokens [LINES]
+#
+# Generates a program of LINES statements (a few MB of source), then
+# compares memory held by list(tokenize(code)) against a TokenColumns
+# buffer, and tokenize / tokenize+parse throughput for both (best of 3).
+
+import sys
+import time
+import tracemalloc
+
+from lexer import tokenize, tokenize_columnar
+from parser import Parser, parse_columns
+
+
+def generated_source(lines):
+    out = ['बदलवा a = 1', 'बदलवा arr = [1, 2, 3, 4]']
+    for i in range(lines):
+        if i % 3 == 0:
+            out.append(f'a = a + {i} * (arr[{i % 4}] - 2) % 7')
+        elif i % 3 == 1:
+            out.append(f'जर a > {i} आणि नाही a == 3 तर')
+            out.append(f'    लिहा "ओळ {i}"')
+            out.append('संपले')
+        else:
+            out.append(f'arr[{i % 4}] = a ^ 2 - {i}')
+    return '\n'.join(out) + '\n'
+
+
+def held(build):
+    # bytes still allocated by build()'s result, plus the time it took
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = build()
+    dt = time.perf_counter() - t0
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, dt
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 100000
+    code = generated_source(lines)
+    mb = len(code.encode('utf-8')) / 1e6
+
+    tuples, tuple_bytes, _ = held(lambda: list(tokenize(code)))
+    columns, column_bytes, _ = held(lambda: tokenize_columnar(code))
+    assert len(tuples) == len(columns)
+    ntok = len(columns)
+    del tuples, columns
+
+    # timings without tracemalloc overhead
+    t_tuples = timed(lambda: list(tokenize(code)))
+    t_columns = timed(lambda: tokenize_columnar(code))
+    p_tuples = timed(lambda: Parser(tokenize(code)).parse())
+    p_columns = timed(lambda: parse_columns(tokenize_columnar(code)))
+
+    print(f'{mb:.1f} MB source, {ntok} tokens')
+    print(f'  memory   tuples : {tuple_bytes / 1e6:8.1f} MB  ({tuple_bytes / ntok:5.1f} B/token)')
+    print(f'           columns: {column_bytes / 1e6:8.1f} MB  ({column_bytes / ntok:5.1f} B/token)')
+    print(f'  tokenize tuples : {ntok / t_tuples / 1e6:8.2f} Mtok/s')
+    print(f'           columns: {ntok / t_columns / 1e6:8.2f} Mtok/s')
+    print(f'  + parse  tuples : {ntok / p_tuples / 1e6:8.2f} Mtok/s')
+    print(f'           columns: {ntok / p_columns / 1e6:8.2f} Mtok/s')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,67 @@
+# Typed-instruction benchmark: generic vs. type-specialized IR.
+#
+#   python -m bench.typed [SCALE] [REPEAT]
+#
+# Compiles each workload twice from the same source: once straight from
+# the parser (no type annotations, so IRGen emits generic binop /
+# if_false_goto / index ops) and once after SemanticAnalyzer has annotated
+# the AST (int_binop, int_cmp_goto, list_get / list_set). Both go through
+# -O1 and link, and only execute() is timed.
+
+import sys
+import time
+
+from parser import parse_code
+from semantic import SemanticAnalyzer
+from irgen import IRGen
+from optimizer import optimize
+from vm import link, execute
+from bench.workloads import bubble_sort, for_loop
+
+TYPED_OPS = ('int_binop', 'int_cmp_goto', 'list_get', 'list_set')
+
+
+def build(source, typed):
+    ast = parse_code(source)
+    if typed:
+        sem = SemanticAnalyzer()
+        sem.analyze(ast)
+        sem.annotate_types(ast)
+    ir, _ = optimize(IRGen().gen(ast), 1)
+    return ir, link(ir)
+
+
+def best_of(program, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        execute(program, write=lambda v: None)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    cases = [('bubble_sort', bubble_sort(max(2, int(200 * scale)))),
+             ('for_loop', for_loop(max(1, int(200000 * scale))))]
+    print(f'{"workload":12} {"generic ms":>11} {"typed ms":>9} {"speedup":>8} {"typed ops":>10} {"instrs":>7}')
+    for name, source in cases:
+        generic_ir, generic = build(source, False)
+        typed_ir, typed = build(source, True)
+        out_generic = []
+        out_typed = []
+        execute(generic, out_generic.append)
+        execute(typed, out_typed.append)
+        if out_generic != out_typed:
+            raise SystemExit(f'{name}: typed and generic programs disagree')
+        t_generic = best_of(generic, repeat)
+        t_typed = best_of(typed, repeat)
+        n_typed = sum(1 for ins in typed_ir if ins[0] in TYPED_OPS)
+        print(f'{name:12} {t_generic * 1000:11.2f} {t_typed * 1000:9.2f} {t_generic / t_typed:7.2f}x '
+              f'{n_typed:10d} {len(typed.code):7d}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,63 @@
+# Local value numbering benchmark: -O1 with and without number_values.
+#
+#   python -m bench.values [SCALE] [REPEAT]
+#
+# Compiles each workload with the -O1 passes, once without number_values,
+# and reports the IR length, the instructions executed (one handler
+# dispatch each) and the best execute() time of both versions. Both must
+# print what the unoptimized (-O0) program prints; list_updates is there
+# to catch reusing a list compare across a store, list_repeats to catch
+# sharing one list between two equal `z * 2`.
+
+import sys
+import time
+
+from optimizer import LEVELS, number_values
+from vm import execute
+from bench.pairs import compile_program, count_pairs
+from bench.workloads import bubble_sort, for_loop, list_repeats, list_updates, repeated_subexpressions, \
+    straight_line
+
+
+def best_of(program, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        execute(program, write=lambda v: None)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(argv):
+    scale = float(argv[1]) if len(argv) > 1 else 1.0
+    repeat = int(argv[2]) if len(argv) > 2 else 5
+    cases = [('repeated_subexpr', repeated_subexpressions(max(1, int(100000 * scale)))),
+             ('straight_line', straight_line(max(1, int(2000 * scale)))),
+             ('bubble_sort', bubble_sort(max(2, int(100 * scale)))),
+             ('for_loop', for_loop(max(1, int(100000 * scale)))),
+             ('list_updates', list_updates(max(1, int(10000 * scale)))),
+             ('list_repeats', list_repeats(max(1, int(10000 * scale))))]
+    without = [p for p in LEVELS[1] if p is not number_values]
+    print(f'{"workload":18} {"instrs":>13} {"executed":>21} {"without ms":>11} {"with ms":>8}')
+    for name, source in cases:
+        plain = compile_program(source, without)
+        numbered = compile_program(source, LEVELS[1])
+        out_ref = []
+        out_plain = []
+        out_numbered = []
+        execute(compile_program(source, LEVELS[0]), out_ref.append)
+        execute(plain, out_plain.append)
+        execute(numbered, out_numbered.append)
+        if out_plain != out_ref or out_numbered != out_ref:
+            raise SystemExit(f'{name}: -O1 changed the output')
+        _, n_plain = count_pairs(plain)
+        _, n_numbered = count_pairs(numbered)
+        t_plain = best_of(plain, repeat)
+        t_numbered = best_of(numbered, repeat)
+        print(f'{name:18} {len(plain.code):6d} -> {len(numbered.code):4d} {n_plain:10d} -> {n_numbered:8d} '
+              f'{t_plain * 1000:11.2f} {t_numbered * 1000:8.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,176 @@
+# Scalable Marathi workloads for the benchmarks. Each generator takes a
+# size and returns source text; WORKLOADS lists them with the sizes the
+# phase benchmark uses by default.
+
+
+def straight_line(statements):
+    # long straight-line arithmetic: front-end bound
+    out = ['बदलवा a = 3', 'बदलवा b = 5', 'बदलवा x = 0']
+    for i in range(statements):
+        k = i % 3
+        if k == 0:
+            out.append(f'x = (x + a * {i}) % 1000 - b')
+        elif k == 1:
+            out.append(f'बदलवा y{i % 100} = x * {i % 17 + 1} + (a - b) ^ 2')
+        else:
+            out.append(f'b = b + x % {i % 5 + 2} - {i % 3}')
+    out.append('लिहा x')
+    return '\n'.join(out) + '\n'
+
+
+def bubble_sort(n):
+    # nested जोपर्यंत loops sorting a reversed n-element array: every
+    # comparison swaps, so execution is O(n^2)
+    elems = ', '.join(str(v) for v in range(n, 0, -1))
+    return f'''बदलवा arr = [{elems}]
+बदलवा n = {n}
+बदलवा i = 0
+जोपर्यंत i < n तर
+    बदलवा j = 0
+    जोपर्यंत j < n - i - 1 तर
+        जर arr[j] > arr[j+1] तर
+            बदलवा temp = arr[j]
+            arr[j] = arr[j+1]
+            arr[j+1] = temp
+        संपले
+        j = j + 1
+    संपले
+    i = i + 1
+संपले
+लिहा arr[0]
+'''
+
+
+def deep_expression(depth):
+    # one parenthesised expression nested depth levels deep
+    ops = ('+', '*', '-', '%')
+    expr = 'x'
+    for d in range(depth):
+        expr = f'({expr} {ops[d % 4]} {d % 9 + 2})'
+    return f'बदलवा x = 7\nलिहा {expr}\n'
+
+
+def for_loop(iterations):
+    # one big साठी loop: execution bound
+    return f'''बदलवा s = 0
+बदलवा arr = [1, 2, 3, 4, 5, 6, 7, 8]
+साठी i = 0 ते {iterations} तर
+    s = (s + arr[i % 8] * i) % 100000
+संपले
+लिहा s
+'''
+
+
+def repeated_subexpressions(iterations):
+    # a loop body that spells out the same products several times, as
+    # code without temporaries does
+    return f'''बदलवा s = 0
+बदलवा arr = [3, 1, 4, 1, 5, 9, 2, 6]
+साठी i = 0 ते {iterations} तर
+    बदलवा v = arr[i % 8]
+    s = (s + (v * i - 3) * (v * i - 3) + (v * i) % 7 + arr[i % 8]) % 100000
+संपले
+लिहा s
+'''
+
+
+def configured_loop(iterations):
+    # settings held in variables, and a debug branch that is never taken:
+    # constants only a whole-program analysis sees
+    return f'''बदलवा debug = 0
+बदलवा scale = 3
+बदलवा limit = 100000
+बदलवा s = 0
+साठी i = 0 ते {iterations} तर
+    जर debug == 1 तर
+        लिहा i
+    संपले
+    s = (s + i * scale) % limit
+संपले
+लिहा s
+'''
+
+
+def array_scan(n, passes):
+    # count the elements of an n-element array inside a window that moves
+    # each pass; the window bounds only change between passes
+    elems = ', '.join(str(i * 37 % 100) for i in range(n))
+    return f'''बदलवा data = [{elems}]
+बदलवा n = {n}
+बदलवा low = 25
+बदलवा width = 50
+बदलवा hits = 0
+बदलवा p = 0
+जोपर्यंत p < {passes} तर
+    बदलवा i = 0
+    जोपर्यंत i < n तर
+        बदलवा v = data[i]
+        जर v >= low + p आणि v < low + width + p तर
+            hits = hits + 1
+        संपले
+        i = i + 1
+    संपले
+    p = p + 1
+संपले
+लिहा hits
+'''
+
+
+def list_updates(iterations):
+    # compares a list before and after a store into it through an alias:
+    # both compares read the same operands, but not the same values
+    return f'''बदलवा a = [0, 0, 0]
+बदलवा b = a
+बदलवा zero = [0, 0, 0]
+बदलवा changed = 0
+साठी i = 0 ते {iterations} तर
+    बदलवा before = a == zero
+    b[i % 3] = i % 2
+    बदलवा after = a == zero
+    जर before != after तर
+        changed = changed + 1
+    संपले
+संपले
+लिहा changed
+'''
+
+
+def list_repeats(iterations):
+    # builds the same [x] * n twice and stores into one of them: both
+    # expressions are equal, but each must give a list of its own
+    return f'''बदलवा z = [1, 2]
+बदलवा shared = 0
+साठी i = 0 ते {iterations} तर
+    बदलवा a = z * 2
+    बदलवा b = z * 2
+    a[0] = i + 5
+    जर b[0] != 1 तर
+        shared = shared + 1
+    संपले
+संपले
+लिहा shared
+'''
+
+
+def int_table(n):
+    # allocate an n-element array with [0] * n, fill it, then sum it
+    return f'''बदलवा n = {n}
+बदलवा table = [0] * n
+साठी i = 0 ते n तर
+    table[i] = (i * 7919) % 1000003
+संपले
+बदलवा s = 0
+साठी i = 0 ते n तर
+    s = s + table[i]
+संपले
+लिहा s
+'''
+
+
+# name -> (generator, default sizes)
+WORKLOADS = {
+    'straight_line': (straight_line, (2000, 10000, 50000)),
+    'bubble_sort': (bubble_sort, (50, 100, 200)),
+    'deep_expression': (deep_expression, (50, 150, 300)),
+    'for_loop': (for_loop, (10000, 100000, 500000)),
+}
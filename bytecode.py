@@ -0,0 +1,238 @@
+# Binary bytecode files for linked programs.
+#
+# Layout (little-endian):
+#
+#   header   magic 'MRBC', u16 version, u16 reserved, u32 code count,
+#            u32 extra words, u32 const count, u32 name count
+#   code     one 16-byte record per instruction: u32 opcode | binop << 8,
+#            then three u32 operands (slots, const indexes, targets)
+#   extra    u32 words for variable-length operands (BUILD_LIST and
+#            BUILD_ARRAY elements)
+#            and the last two operands of four-operand instructions
+#   lines    u32 source line per instruction
+#   consts   tagged entries: int64, big int, UTF-8 string or float64
+#   names    u32 byte length, then the UTF-8 slot names joined by newlines
+#
+# load() maps the file and decodes instructions straight out of the buffer:
+# nothing like Program.code is ever built, most records go to the vm
+# decoders as they are, and the slot names (only needed for memory dumps)
+# are decoded on first use.
+
+import mmap
+import struct
+import sys
+
+from vm import *
+
+MAGIC = b'MRBC'
+VERSION = 5
+
+HEADER = struct.Struct('<4sHHIIII')
+RECORD_WORDS = 4
+
+# record layouts besides the plain (op, up to three operands) one
+BOP_RECORDS = (BINOP, INT_BINOP, BINOP_CONST)       # (op, dst, bop, a, b)
+BOP_JUMP_RECORDS = (CMP_JUMP, CMP_CONST_JUMP)       # (op, bop, a, b, target)
+WIDE_RECORDS = (INDEX_GET_OFFSET, LIST_SET_OFFSET)  # four operands, no bop
+LIST_RECORDS = (BUILD_LIST, BUILD_ARRAY)            # (op, dst, (src, ...))
+PLAIN_RECORDS = frozenset(range(len(OPNAMES))).difference(
+    BOP_RECORDS + BOP_JUMP_RECORDS + WIDE_RECORDS + LIST_RECORDS)
+
+# binop names by sub-opcode
+BOPS = list(ARITH_OPS) + list(TRUTH_OPS)
+BOP_CODES = {name: i for i, name in enumerate(BOPS)}
+
+CONST_INT = 0
+CONST_BIGINT = 1
+CONST_STR = 2
+CONST_FLOAT = 3  # ^ with a negative exponent folds to one
+
+_int64 = struct.Struct('<q')
+_float64 = struct.Struct('<d')
+_u32 = struct.Struct('<I')
+
+
+def _pack_const(value, out):
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        out.append(bytes([CONST_STR]) + _u32.pack(len(data)) + data)
+    elif type(value) is int:
+        if -(1 << 63) <= value < (1 << 63):
+            out.append(bytes([CONST_INT]) + _int64.pack(value))
+        else:
+            data = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+            out.append(bytes([CONST_BIGINT]) + _u32.pack(len(data)) + data)
+    elif type(value) is float:
+        out.append(bytes([CONST_FLOAT]) + _float64.pack(value))
+    else:
+        raise ValueError(f'Cannot serialize constant {value!r}')
+
+
+def dumps(program):
+    words = []
+    extra = []
+    for ins in program.code:
+        op = ins[0]
+        if op in BOP_RECORDS:
+            _, t, bop, a, b = ins
+            words += (op | BOP_CODES[bop] << 8, t, a, b)
+        elif op in BOP_JUMP_RECORDS:
+            _, bop, a, b, target = ins
+            words += (op | BOP_CODES[bop] << 8, a, b, target)
+        elif op in WIDE_RECORDS:
+            words += (op, ins[1], ins[2], len(extra))
+            extra += (ins[3], ins[4])
+        elif op in LIST_RECORDS:
+            _, t, elems = ins
+            words += (op, t, len(extra), len(elems))
+            extra.extend(elems)
+        else:
+            # every other instruction has at most three integer operands
+            words.append(op)
+            words.extend(ins[1:])
+            words.extend([0] * (RECORD_WORDS - len(ins)))
+    parts = [HEADER.pack(MAGIC, VERSION, 0, len(program.code), len(extra),
+                         len(program.consts), len(program.names)),
+             struct.pack(f'<{len(words)}I', *words),
+             struct.pack(f'<{len(extra)}I', *extra),
+             struct.pack(f'<{len(program.lines)}I', *program.lines)]
+    for value in program.consts:
+        _pack_const(value, parts)
+    names = '\n'.join(program.names).encode('utf-8')
+    parts.append(_u32.pack(len(names)) + names)
+    return b''.join(parts)
+
+
+def save(program, path):
+    with open(path, 'wb') as f:
+        f.write(dumps(program))
+
+
+def _unpack_consts(buf, pos, count):
+    values = []
+    for _ in range(count):
+        tag = buf[pos]
+        pos += 1
+        if tag == CONST_INT:
+            values.append(_int64.unpack_from(buf, pos)[0])
+            pos += 8
+            continue
+        if tag == CONST_FLOAT:
+            values.append(_float64.unpack_from(buf, pos)[0])
+            pos += 8
+            continue
+        (size,) = _u32.unpack_from(buf, pos)
+        pos += 4
+        data = bytes(buf[pos:pos + size])
+        pos += size
+        if tag == CONST_STR:
+            values.append(data.decode('utf-8'))
+        elif tag == CONST_BIGINT:
+            values.append(int.from_bytes(data, 'little', signed=True))
+        else:
+            raise ValueError(f'Bad constant tag {tag}')
+    return values, pos
+
+
+def _words(buf, start, count):
+    view = memoryview(buf)[start:start + 4 * count]
+    if sys.byteorder == 'little':
+        return view.cast('I')
+    from array import array
+    words = array('I', view)
+    words.byteswap()
+    return words
+
+
+class MappedProgram:
+    # A Program backed by a bytecode buffer (usually an mmap). Constants and
+    # names are decoded on load; instructions are read from the buffer only
+    # when vm.decode asks for them.
+    def __init__(self, buf, mapping=None):
+        magic, version, _, n_code, n_extra, n_consts, n_names = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a Marathi bytecode file')
+        if version != VERSION:
+            raise ValueError(f'Unsupported bytecode version {version}')
+        self._buf = buf
+        self._mapping = mapping
+        self.n_code = n_code
+        self.n_slots = n_names
+        pos = HEADER.size
+        self.words = _words(buf, pos, n_code * RECORD_WORDS)
+        pos += 4 * n_code * RECORD_WORDS
+        self.extra = _words(buf, pos, n_extra)
+        pos += 4 * n_extra
+        self.lines = _words(buf, pos, n_code)
+        pos += 4 * n_code
+        self.consts, self._names_pos = _unpack_consts(buf, pos, n_consts)
+        self._names = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            pos = self._names_pos
+            (size,) = _u32.unpack_from(self._buf, pos)
+            data = bytes(self._buf[pos + 4:pos + 4 + size]).decode('utf-8')
+            self._names = data.split('\n') if self.n_slots else []
+        return self._names
+
+    def instructions(self):
+        # 4-word records; only the list builds, the instructions with a binop
+        # sub-opcode and the four-operand ones need rewriting into Program
+        # form, everything else is already what the decoders expect
+        it = iter(self.words)
+        extra = self.extra
+        for rec in zip(it, it, it, it):
+            op = rec[0]
+            code = op & 0xff
+            if code in PLAIN_RECORDS:
+                yield rec
+            elif code in BOP_RECORDS:
+                yield (code, rec[1], BOPS[op >> 8], rec[2], rec[3])
+            elif code in BOP_JUMP_RECORDS:
+                yield (code, BOPS[op >> 8], rec[1], rec[2], rec[3])
+            elif code in LIST_RECORDS:
+                start = rec[2]
+                yield (op, rec[1], tuple(extra[start:start + rec[3]]))
+            else:
+                start = rec[3]
+                yield (op, rec[1], rec[2], extra[start], extra[start + 1])
+
+    def memory(self, regs):
+        return {name: as_list(regs[i]) for i, name in enumerate(self.names) if regs[i] is not None}
+
+    def close(self):
+        # handlers already decoded keep working: they hold no buffer references
+        lines = self.lines
+        self.lines = list(lines)
+        for words in (self.words, self.extra, lines):
+            if isinstance(words, memoryview):
+                words.release()
+        self._names = self.names
+        self._buf = None
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __repr__(self):
+        return f'MappedProgram({self.n_code} instructions, {len(self.names)} slots, {len(self.consts)} consts)'
+
+
+def loads(data):
+    return MappedProgram(data)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return MappedProgram(mapping, mapping)
+
+
+if __name__ == '__main__':
+    from parser import parse_code
+    from irgen import IRGen
+    program = link(IRGen().gen(parse_code('बदलवा a = [1, 2, 3]\nलिहा "नमस्कार"\nलिहा a[1] + 2 ^ 70\n')))
+    data = dumps(program)
+    print(len(data), 'bytes')
+    execute(loads(data))
@@ -0,0 +1,110 @@
+import glob
+import hashlib
+import os
+
+import bytecode
+
+# On-disk cache of linked programs (as bytecode files), so a warm run can skip the whole front
+# end (lexing, parsing, semantic analysis, IR generation and optimization).
+#
+# Entries are keyed by the source bytes, the optimization level and the
+# compiler version (a hash of the compiler's own .py files), so editing the
+# program or the compiler simply stops matching old entries. Hits refresh
+# an entry's mtime; when the directory grows past max_bytes the least
+# recently used entries are evicted.
+
+CACHE_DIR_NAME = '__mrcache__'
+SUFFIX = '.mrb'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_compiler_version = None
+
+def compiler_version():
+    global _compiler_version
+    if _compiler_version is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(here, '*.py'))):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        _compiler_version = h.hexdigest()[:16]
+    return _compiler_version
+
+def default_cache_dir(source_path):
+    # next to the source, like __pycache__
+    return os.path.join(os.path.dirname(os.path.abspath(source_path)), CACHE_DIR_NAME)
+
+
+class CompileCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key_for_file(self, path, opt):
+        h = hashlib.sha256()
+        h.update(f'{compiler_version()}:O{opt}:'.encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, key):
+        path = self.entry_path(key)
+        try:
+            program = bytecode.load(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or from an incompatible build: drop it
+            self.discard(key)
+            return None
+        os.utime(path)  # mark as recently used
+        return program
+
+    def store(self, key, program):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.entry_path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        bytecode.save(program, tmp)
+        os.replace(tmp, path)
+        self.evict()
+
+    def discard(self, key):
+        try:
+            os.remove(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        # (mtime, size, path), oldest first
+        found = []
+        for path in glob.glob(os.path.join(self.directory, '*' + SUFFIX)):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, st.st_size, path))
+        found.sort()
+        return found
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
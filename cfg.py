@@ -0,0 +1,122 @@
+from irgen import DEF_POS, USE_POS, LIST_BUILDS, is_temp
+
+# Control-flow graph over IRGen's instruction list. A block covers
+# ir[start:end]: it begins at the first label of a run of labels (or right
+# after a jump) and ends with a jump or just before the next label that
+# follows a real instruction. 'line' markers stay inside whichever block
+# they fall in.
+
+# jump instructions: op -> operand position of the target label
+JUMP_TARGET = {'goto': 1, 'if_false_goto': 2, 'int_cmp_goto': 4, 'cmp_goto': 4, 'cmp_const_goto': 4,
+               'for_range': 3, 'for_next': 3}
+
+
+class BasicBlock:
+    __slots__ = ('index', 'start', 'end', 'succs', 'preds', 'live_in', 'live_out')
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.succs = []
+        self.preds = []
+        self.live_in = set()
+        self.live_out = set()
+
+    def __repr__(self):
+        return f'BasicBlock({self.index}, ir[{self.start}:{self.end}], succs={[b.index for b in self.succs]})'
+
+
+def build_cfg(ir):
+    spans = []
+    label_block = {}
+    start = None   # start of the open block
+    real = False   # has it got anything but labels / line markers?
+    for i, ins in enumerate(ir):
+        op = ins[0]
+        if op == 'label':
+            if real:
+                spans.append((start, i))
+                start, real = i, False
+            elif start is None:
+                start = i
+            label_block[ins[1]] = len(spans)
+            continue
+        if start is None:
+            start = i
+        if op != 'line':
+            real = True
+        if op in JUMP_TARGET:
+            spans.append((start, i + 1))
+            start, real = None, False
+    if start is not None:
+        spans.append((start, len(ir)))
+
+    blocks = [BasicBlock(k, s, e) for k, (s, e) in enumerate(spans)]
+    for b in blocks:
+        last = None
+        for ins in reversed(ir[b.start:b.end]):
+            if ins[0] != 'label' and ins[0] != 'line':
+                last = ins
+                break
+        succs = []
+        pos = JUMP_TARGET.get(last[0]) if last is not None else None
+        if pos is not None:
+            succs.append(blocks[label_block[last[pos]]])
+        if (pos is None or last[0] != 'goto') and b.index + 1 < len(blocks):
+            succs.append(blocks[b.index + 1])
+        for s in succs:
+            if s not in b.succs:
+                b.succs.append(s)
+                s.preds.append(b)
+    return blocks
+
+
+def def_use(ir, track=is_temp):
+    # per instruction: (name written or None, [names read]), keeping only
+    # the names track() accepts
+    refs = []
+    for ins in ir:
+        op = ins[0]
+        pos = DEF_POS.get(op)
+        d = ins[pos] if pos is not None and track(ins[pos]) else None
+        uses = []
+        for pos in USE_POS.get(op, ()):
+            v = ins[pos]
+            if op in LIST_BUILDS:
+                uses.extend(u for u in v if track(u))
+            elif track(v):
+                uses.append(v)
+        refs.append((d, uses))
+    return refs
+
+
+def liveness(blocks, refs):
+    # fills in live_in / live_out of every block; refs is def_use(ir, ...)
+    gen = []
+    kill = []
+    for b in blocks:
+        use = set()
+        defs = set()
+        for d, uses in refs[b.start:b.end]:
+            for u in uses:
+                if u not in defs:
+                    use.add(u)
+            if d is not None:
+                defs.add(d)
+        gen.append(use)
+        kill.append(defs)
+        b.live_in = set(use)
+        b.live_out = set()
+    changed = True
+    while changed:
+        changed = False
+        for b in reversed(blocks):
+            out = set()
+            for s in b.succs:
+                out |= s.live_in
+            if out != b.live_out:
+                b.live_out = out
+                b.live_in = gen[b.index] | (out - kill[b.index])
+                changed = True
+    return blocks
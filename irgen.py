@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from parser import *
 
 class IRGen:
@@ -16,6 +18,12 @@ class IRGen:
         self.label_id += 1
         return lab
 
+    def line(self, node):
+        # ('line', n) is a pseudo-instruction: everything after it, up to
+        # the next one, was generated from source line n
+        if node.lineno:
+            self.code.append(('line', node.lineno))
+
     def gen(self, node):
         method = 'gen_' + node.__class__.__name__
         if hasattr(self, method):
@@ -29,10 +37,12 @@ class IRGen:
         return self.code
 
     def gen_Print(self, node):
+        self.line(node)
         src = self.gen(node.expr)
         self.code.append(('print', src))
 
     def gen_Assign(self, node):
+        self.line(node)
         rhs = self.gen(node.expr)
         # target may be Var or Index
         if isinstance(node.target, Var):
@@ -41,11 +51,13 @@ class IRGen:
             # generate index and emit index_set
             arr = self.gen(node.target.array)
             idx = self.gen(node.target.index)
-            self.code.append(('index_set', arr, idx, rhs))
+            op = 'list_set' if is_list_index(node.target) else 'index_set'
+            self.code.append((op, arr, idx, rhs))
         else:
             raise NotImplementedError('Unknown assign target')
 
     def gen_Let(self, node):
+        self.line(node)
         rhs = self.gen(node.expr)
         self.code.append(('assign', node.name, rhs))
 
@@ -60,13 +72,15 @@ class IRGen:
         return t
 
     def gen_ArrayLiteral(self, node):
-        # generate each element and produce a const_list
+        # generate each element and produce a const_list (const_array when
+        # every list element is proven an int)
         elem_temps = []
         for e in node.elements:
             et = self.gen(e)
             elem_temps.append(et)
         t = self.new_temp()
-        self.code.append(('const_list', t, elem_temps))
+        op = 'const_array' if node.element_type == 'int' else 'const_list'
+        self.code.append((op, t, elem_temps))
         return t
 
     def gen_Var(self, node):
@@ -76,7 +90,8 @@ class IRGen:
         arr = self.gen(node.array)
         idx = self.gen(node.index)
         t = self.new_temp()
-        self.code.append(('index_get', t, arr, idx))
+        op = 'list_get' if is_list_index(node) else 'index_get'
+        self.code.append((op, t, arr, idx))
         return t
 
     def gen_BinOp(self, node):
@@ -86,15 +101,26 @@ class IRGen:
         op = node.op.lower()
 
         # map logical and arithmetic ops
-        self.code.append(('binop', t, op, l, r))
+        kind = 'int_binop' if is_int_binop(node) else 'binop'
+        self.code.append((kind, t, op, l, r))
         return t
 
+    def gen_branch_if_false(self, cond, label):
+        # jump to label unless cond holds; an int comparison becomes one
+        # compare-and-branch instead of a binop into a temp plus a test
+        if cond.__class__ is BinOp and cond.op in CMP_OPS and is_int_binop(cond):
+            l = self.gen(cond.left)
+            r = self.gen(cond.right)
+            self.code.append(('int_cmp_goto', cond.op.lower(), l, r, label))
+        else:
+            self.code.append(('if_false_goto', self.gen(cond), label))
+
 
     def gen_If(self, node):
-        cond = self.gen(node.cond)
+        self.line(node)
         label_else = self.new_label()
         label_end = self.new_label()
-        self.code.append(('if_false_goto', cond, label_else))
+        self.gen_branch_if_false(node.cond, label_else)
         for s in node.then_block:
             self.gen(s)
         self.code.append(('goto', label_end))
@@ -108,40 +134,128 @@ class IRGen:
         start = self.new_label()
         end = self.new_label()
         self.code.append(('label', start))
-        cond = self.gen(node.cond)
-        self.code.append(('if_false_goto', cond, end))
+        self.line(node)
+        self.gen_branch_if_false(node.cond, end)
         for s in node.body:
             self.gen(s)
+        self.line(node)  # the back edge belongs to the loop's own line
         self.code.append(('goto', start))
         self.code.append(('label', end))
 
     def gen_ForLoop(self, node):
         # साठी i = start ते end तर ... संपले
+        #
+        #   assign i, start
+        #   for_range i, end, Lend     ; enter only if i < end
+        # Lbody:
+        #   ...body...
+        #   for_next i, end, Lbody     ; i = i + 1, loop back while i < end
+        # Lend:
+        self.line(node)
         start_val = self.gen(node.start)
         end_val = self.gen(node.end)
+        if not is_temp(end_val) and end_val in assigned_names(node.body):
+            # the bound is evaluated once; snapshot a plain variable the
+            # body writes to so it can't move the bound
+            snap = self.new_temp()
+            self.code.append(('assign', snap, end_val))
+            end_val = snap
         self.code.append(('assign', node.var, start_val))
 
-        loop_label = self.new_label()
+        body_label = self.new_label()
         end_label = self.new_label()
 
-        self.code.append(('label', loop_label))
-
-        cond_temp = self.new_temp()
-            # Check i < end
-        self.code.append(('binop', cond_temp, 'lt', node.var, end_val))
-        self.code.append(('if_false_goto', cond_temp, end_label))
-
-            # loop body
+        self.code.append(('for_range', node.var, end_val, end_label))
+        self.code.append(('label', body_label))
         for s in node.body:
             self.gen(s)
+        self.line(node)
+        self.code.append(('for_next', node.var, end_val, body_label))
+        self.code.append(('label', end_label))
 
-            # increment i = i + 1
-        one_temp = self.new_temp()
-        self.code.append(('const', one_temp, 1))
-        add_temp = self.new_temp()
-        self.code.append(('binop', add_temp, 'plus', node.var, one_temp))
-        self.code.append(('assign', node.var, add_temp))
+# comparisons int_cmp_goto can branch on
+CMP_OPS = ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE')
 
-        self.code.append(('goto', loop_label))
-        self.code.append(('label', end_label))
+def is_int_binop(node):
+    # both operands proven int by SemanticAnalyzer.annotate_types
+    return node.left.type == 'int' and node.right.type == 'int'
+
+def is_list_index(node):
+    return node.array.type == 'list' and node.index.type == 'int'
+
+# Typed instructions, emitted where the operand types are proven:
+#   ('int_binop', t, op, a, b)         binop on two ints
+#   ('int_cmp_goto', op, a, b, label)  jump to label unless a op b (ints)
+#   ('list_get', t, arr, idx)          index_get on a list with an int index
+#   ('list_set', arr, idx, src)        index_set on a list with an int index
+#   ('const_array', t, [elems])        const_list in a program that allocates
+#                                      with [x] * n and whose list elements
+#                                      are all ints (vm.IntArrays)
+#
+# Superinstructions, made by optimizer.fuse_instructions (k is a constant):
+#   ('cmp_goto', op, a, b, label)             binop compare + if_false_goto
+#   ('cmp_const_goto', op, a, k, label)       the same against a constant
+#   ('binop_const', t, op, a, k)              const + binop; with t == a an increment
+#   ('index_get_offset', t, arr, i, k)        t = arr[i + k]
+#   ('list_set_offset', arr, i, k, src)       arr[i + k] = src (list, int i)
+#
+# Operand layout of each IR instruction, used by the passes that work on
+# IRGen output: which position (if any) an instruction writes, and which
+# positions it reads. const_list and const_array (LIST_BUILDS) read a list
+# of temps. 'line' markers (like labels) neither read nor write anything;
+# passes keep them in place.
+LIST_BUILDS = ('const_list', 'const_array')
+DEF_POS = {'const': 1, 'const_str': 1, 'const_list': 1, 'const_array': 1, 'binop': 1,
+           'int_binop': 1, 'assign': 1, 'index_get': 1, 'list_get': 1, 'for_next': 1, 'binop_const': 1, 'index_get_offset': 1}
+USE_POS = {
+    'const_list': (2,),
+    'const_array': (2,),
+    'binop': (3, 4),
+    'int_binop': (3, 4),
+    'assign': (2,),
+    'index_get': (2, 3),
+    'list_get': (2, 3),
+    'index_set': (1, 2, 3),
+    'list_set': (1, 2, 3),
+    'print': (1,),
+    'if_false_goto': (1,),
+    'int_cmp_goto': (2, 3),
+    'cmp_goto': (2, 3),
+    'cmp_const_goto': (2,),
+    'binop_const': (3,),
+    'index_get_offset': (2, 3),
+    'list_set_offset': (1, 2, 4),
+    'for_range': (1, 2),
+    'for_next': (1, 2),
+}
+
+# instructions with no effect besides writing their destination (or
+# raising), for value numbering and loop hoisting
+PURE_OPS = ('const', 'const_str', 'const_list', 'const_array', 'binop', 'int_binop', 'index_get',
+            'list_get', 'binop_const', 'index_get_offset')
+# pure instructions that can't raise either, so dead ones may be deleted:
+# an unread list read or `[1] + 2` must still fail at run time. An
+# int_binop can only raise if it divides (cannot_raise()).
+NON_RAISING_OPS = ('const', 'const_str', 'const_list', 'const_array')
+
+def cannot_raise(ins):
+    op = ins[0]
+    return op in NON_RAISING_OPS or (op == 'int_binop' and ins[2] != 'div' and ins[2] != 'mod')
+
+def instr_def(ins):
+    pos = DEF_POS.get(ins[0])
+    return ins[pos] if pos is not None else None
+
+def instr_uses(ins):
+    uses = []
+    for pos in USE_POS.get(ins[0], ()):
+        if ins[0] in LIST_BUILDS:
+            uses.extend(ins[pos])
+        else:
+            uses.append(ins[pos])
+    return uses
 
+@lru_cache(maxsize=None)
+def is_temp(name):
+    # temps are the names handed out by IRGen.new_temp
+    return name[:1] == 't' and name[1:].isdigit() and name.isascii()
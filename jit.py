@@ -0,0 +1,300 @@
+# Tracing JIT for hot loops.
+#
+# execute_jit() is vm.execute() with a counter on every backward jump.
+# When a loop header has been jumped back to HOT_LOOP times, the next
+# iteration is run one instruction at a time and its path recorded; that
+# straight-line trace is then compiled to a Python function that runs the
+# loop on local variables, with no per-instruction dispatch, and installed
+# as the header's handler. Only the innermost loops get traces: a recording
+# that leaves the loop, revisits an instruction (an inner loop) or grows
+# past MAX_TRACE is dropped and the loop stays interpreted.
+#
+# The compiled loop checks a guard wherever the recorded iteration made a
+# choice. A branch that goes the other way is a side exit: the trace writes
+# its registers back and returns the ip the branch leads to, and the
+# interpreter carries on from there (the next back edge re-enters the
+# trace). On entry the trace also checks that the registers it reads still
+# hold the types seen while recording; if not, it returns -1 without
+# running anything and that iteration is interpreted. In a program with
+# int arrays (vm.IntArrays), a store that overflows one returns -2 - ip
+# after the write-back, and the interpreter redoes the store at ip.
+
+from vm import *
+from lineprof import TARGET_POS
+
+HOT_LOOP = 50     # back-edge executions before a loop is traced
+MAX_TRACE = 1000  # longest recorded iteration, in instructions
+MAX_GUARD_FAILURES = 100  # failed entries before a trace is dropped
+
+ARITH_SRC = {'plus': '+', 'minus': '-', 'mul': '*', 'div': '//', 'mod': '%', 'pow': '**'}
+CMP_SRC = {'eq': '==', 'ne': '!=', 'lt': '<', 'gt': '>', 'le': '<=', 'ge': '>='}
+GUARDED_TYPES = (int, str, list)
+
+
+class Trace:
+    def __init__(self, header, path, source, fn):
+        self.header = header  # ip of the loop header
+        self.path = path      # recorded ips, header first
+        self.source = source  # generated Python
+        self.fn = fn
+        self.entries = 0
+        self.guard_failures = 0
+
+    def __repr__(self):
+        return f'Trace(header={self.header}, {len(self.path)} instructions, {self.entries} entries)'
+
+
+class TraceCompiler:
+    # turns a recorded path into the source of `def trace(r, c, w)`:
+    # r the registers, c the constant pool, w the write function
+    def __init__(self, code, consts, path, types, arrays=False):
+        self.code = code
+        self.consts = consts
+        self.path = path
+        self.types = types    # register -> type when recording started
+        self.arrays = arrays  # does the program build int arrays?
+        self.read = set()     # registers used
+        self.written = set()  # registers assigned
+        self.live_in = []     # registers read before the trace assigns them
+        self.body = []
+
+    def reg(self, s):
+        if s not in self.read and s not in self.written:
+            self.live_in.append(s)
+        self.read.add(s)
+        return f'v{s}'
+
+    def dst(self, s):
+        self.written.add(s)
+        return f'v{s}'
+
+    def const(self, k):
+        value = self.consts[k]
+        if type(value) is int or type(value) is str:
+            return repr(value)
+        return f'c[{k}]'
+
+    def binop(self, bop, a, b):
+        if bop in ARITH_SRC:
+            return f'{a} {ARITH_SRC[bop]} {b}'
+        if bop in CMP_SRC:
+            return f'1 if {a} {CMP_SRC[bop]} {b} else 0'
+        return f'1 if ({a} {bop} {b}) else 0'  # and / or
+
+    def exit(self, cond, ip):
+        # side exit: leave the loop at ip when cond holds
+        self.body.append(('exit', cond, ip))
+
+    def emit(self, line):
+        self.body.append(line)
+
+    def store(self, line, ip):
+        self.body.append(('store', line, ip) if self.arrays else line)
+
+    def compile_instruction(self, ip, nxt):
+        # nxt: where the recorded iteration went after ip
+        ins = self.code[ip]
+        op = ins[0]
+        if op == LOAD_CONST:
+            self.emit(f'{self.dst(ins[1])} = {self.const(ins[2])}')
+        elif op == BUILD_LIST:
+            elems = ', '.join(self.reg(s) for s in ins[2])
+            self.emit(f'{self.dst(ins[1])} = [{elems}]')
+        elif op == BINOP or op == INT_BINOP:
+            expr = self.binop(ins[2], self.reg(ins[3]), self.reg(ins[4]))
+            self.emit(f'{self.dst(ins[1])} = {expr}')
+        elif op == BINOP_CONST:
+            expr = self.binop(ins[2], self.reg(ins[3]), self.const(ins[4]))
+            self.emit(f'{self.dst(ins[1])} = {expr}')
+        elif op == MOVE:
+            src = self.reg(ins[2])
+            self.emit(f'{self.dst(ins[1])} = {src}')
+        elif op == INDEX_GET:
+            expr = f'{self.reg(ins[2])}[{self.reg(ins[3])}]'
+            self.emit(f'{self.dst(ins[1])} = {expr}')
+        elif op == INDEX_GET_OFFSET:
+            expr = f'{self.reg(ins[2])}[{self.reg(ins[3])} + {self.const(ins[4])}]'
+            self.emit(f'{self.dst(ins[1])} = {expr}')
+        elif op == INDEX_SET or op == LIST_SET:
+            arr = self.reg(ins[1])
+            if op == INDEX_SET:
+                # dropped in source() if the entry guard already covers it
+                self.body.append(('check_list', ins[1]))
+            self.store(f'{arr}[{self.reg(ins[2])}] = {self.reg(ins[3])}', ip)
+        elif op == LIST_SET_OFFSET:
+            self.store(f'{self.reg(ins[1])}[{self.reg(ins[2])} + {self.const(ins[3])}] = {self.reg(ins[4])}', ip)
+        elif op == PRINT:
+            if self.arrays:
+                self.emit(f'w(as_list({self.reg(ins[1])}))')
+            else:
+                self.emit(f'w({self.reg(ins[1])})')
+        elif op == JUMP:
+            pass
+        elif op == JUMP_IF_FALSE:
+            self.branch(f'{self.reg(ins[1])}', nxt, ip + 1, ins[2])
+        elif op == CMP_JUMP:
+            self.branch(f'{self.reg(ins[2])} {CMP_SRC[ins[1]]} {self.reg(ins[3])}', nxt, ip + 1, ins[4])
+        elif op == CMP_CONST_JUMP:
+            self.branch(f'{self.reg(ins[2])} {CMP_SRC[ins[1]]} {self.const(ins[3])}', nxt, ip + 1, ins[4])
+        elif op == FOR_RANGE:
+            self.branch(f'{self.reg(ins[1])} < {self.reg(ins[2])}', nxt, ip + 1, ins[3])
+        elif op == FOR_NEXT:
+            var = self.reg(ins[1])
+            self.emit(f'{self.dst(ins[1])} = {var} + 1')
+            # for_next jumps back while the condition holds
+            self.branch(f'{var} < {self.reg(ins[2])}', nxt, ins[3], ip + 1)
+        else:
+            raise NotImplementedError(f'Cannot trace {OPNAMES[op]}')
+
+    def branch(self, cond, nxt, if_true, if_false):
+        # guard that cond goes the way it did while recording
+        if nxt == if_true and if_true != if_false:
+            self.exit(f'not ({cond})', if_false)
+        elif nxt == if_false and if_true != if_false:
+            self.exit(cond, if_true)
+
+    def source(self):
+        path = self.path
+        for i, ip in enumerate(path):
+            nxt = path[i + 1] if i + 1 < len(path) else path[0]
+            self.compile_instruction(ip, nxt)
+        registers = sorted(self.read | self.written)
+        writeback = [f'r[{s}] = v{s}' for s in sorted(self.written)]
+        guards = [f'type(v{s}) is {self.types[s].__name__}' for s in self.live_in
+                  if self.types[s] in GUARDED_TYPES]
+        out = ['def trace(r, c, w):']
+        out += [f'    v{s} = r[{s}]' for s in registers]
+        if guards:
+            out.append(f'    if not ({" and ".join(guards)}):')
+            out.append('        return -1')
+        # registers live in locals until the trace returns; an error in the
+        # program still leaves them in r, as the interpreter would
+        out.append('    try:')
+        out.append('        while True:')
+        for line in self.body:
+            if line.__class__ is str:
+                out.append(f'            {line}')
+            elif line[0] == 'exit':
+                out.append(f'            if {line[1]}:')
+                out += [f'                {wb}' for wb in writeback]
+                out.append(f'                return {line[2]}')
+            elif line[0] == 'store':
+                out.append('            try:')
+                out.append(f'                {line[1]}')
+                out.append('            except OverflowError:')
+                out += [f'                {wb}' for wb in writeback]
+                out.append(f'                return {-2 - line[2]}')
+            elif line[1] in self.written or self.types[line[1]] is not list:
+                # a live-in list register that the trace never reassigns is
+                # known to be a list from the entry guard
+                lists = '(list, array)' if self.arrays else 'list'
+                out.append(f'            if not isinstance(v{line[1]}, {lists}): '
+                           f'raise RuntimeError("Indexing into non-list")')
+        if out[-1] == '        while True:':
+            out.append('            pass')
+        out.append('    except BaseException:')
+        out += [f'        {wb}' for wb in writeback]
+        out.append('        raise')
+        return '\n'.join(out) + '\n'
+
+
+class TraceJIT:
+    def __init__(self, program, write=print, hot=HOT_LOOP):
+        self.handlers, self.regs = decode(program, write)
+        self.base = list(self.handlers)   # the plain interpreter handlers
+        self.code = list(program.instructions())
+        self.arrays = builds_arrays(self.code)
+        self.consts = program.consts
+        self.write = write
+        self.hot = hot
+        self.traces = []
+        self.counts = {}
+        for ip, ins in enumerate(self.code):
+            pos = TARGET_POS.get(ins[0])
+            if pos is not None and ins[pos] <= ip:
+                self.handlers[ip] = self.back_edge(ip, ins[pos])
+
+    def back_edge(self, ip, header):
+        handler = self.base[ip]
+        counts = self.counts
+        counts[header] = 0
+
+        def counted():
+            nxt = handler()
+            if nxt == header:
+                counts[header] += 1
+                if counts[header] >= self.hot:
+                    # one attempt per back edge: stop counting either way
+                    self.handlers[ip] = handler
+                    return self.record(header)
+            return nxt
+        return counted
+
+    def record(self, header):
+        # run one iteration from header through the plain handlers, keeping
+        # the path; returns the ip to continue at
+        types = [type(v) for v in self.regs]
+        handlers = self.base
+        n = len(handlers)
+        path = []
+        seen = set()
+        ip = header
+        while True:
+            path.append(ip)
+            seen.add(ip)
+            nxt = handlers[ip]()
+            if nxt == header:
+                break
+            if nxt >= n or nxt in seen or len(path) >= MAX_TRACE:
+                return nxt
+            ip = nxt
+        if self.handlers[header] is not handlers[header]:
+            return header  # already has a trace (loop with two back edges)
+        try:
+            source = TraceCompiler(self.code, self.consts, path, types, self.arrays).source()
+        except NotImplementedError:
+            return header
+        namespace = {'array': array, 'as_list': as_list}
+        exec(compile(source, f'<trace {header}>', 'exec'), namespace)
+        trace = Trace(header, path, source, namespace['trace'])
+        self.traces.append(trace)
+        self.handlers[header] = self.entry(trace)
+        return header
+
+    def entry(self, trace):
+        fn = trace.fn
+        regs = self.regs
+        consts = self.consts
+        write = self.write
+        base = self.base[trace.header]
+        handlers = self.base
+
+        def run_trace():
+            trace.entries += 1
+            nxt = fn(regs, consts, write)
+            if nxt < -1:
+                # a store overflowed an int array
+                return handlers[-2 - nxt]()
+            if nxt < 0:
+                # a register changed type: interpret this iteration
+                trace.guard_failures += 1
+                if trace.guard_failures >= MAX_GUARD_FAILURES:
+                    self.handlers[trace.header] = base
+                return base()
+            return nxt
+        return run_trace
+
+    def run(self):
+        handlers = self.handlers
+        n = len(handlers)
+        ip = 0
+        while ip < n:
+            ip = handlers[ip]()
+        return self.regs
+
+
+def execute_jit(program, write=print, hot=HOT_LOOP):
+    # -> (regs, [Trace])
+    jit = TraceJIT(program, write, hot)
+    regs = jit.run()
+    return regs, jit.traces
@@ -1,4 +1,5 @@
 import re
+from array import array
 
 # Token specification (order matters: longer first)
 TOKEN_SPEC = [
@@ -46,11 +47,28 @@ KEYWORDS = {
     'ते': 'TO',
 }
 
+# Integer token kinds, for consumers that want to avoid string compares
+# (the parser, and the columnar token buffers below)
+TOKEN_KINDS = (
+    'EOF', 'NEWLINE', 'NUMBER', 'STRING', 'ID',
+    'EQ', 'NE', 'LE', 'GE', 'LT', 'GT', 'ASSIGN',
+    'PLUS', 'MINUS', 'MUL', 'DIV', 'MOD', 'POW',
+    'LBRACK', 'RBRACK', 'COMMA', 'LPAREN', 'RPAREN',
+    'IF', 'THEN', 'ELSE', 'WHILE', 'FOR', 'PRINT', 'LET',
+    'AND', 'OR', 'NOT', 'END', 'TO',
+)
+(T_EOF, T_NEWLINE, T_NUMBER, T_STRING, T_ID,
+ T_EQ, T_NE, T_LE, T_GE, T_LT, T_GT, T_ASSIGN,
+ T_PLUS, T_MINUS, T_MUL, T_DIV, T_MOD, T_POW,
+ T_LBRACK, T_RBRACK, T_COMMA, T_LPAREN, T_RPAREN,
+ T_IF, T_THEN, T_ELSE, T_WHILE, T_FOR, T_PRINT, T_LET,
+ T_AND, T_OR, T_NOT, T_END, T_TO) = range(len(TOKEN_KINDS))
+KIND = {name: i for i, name in enumerate(TOKEN_KINDS)}
+
 master_pat = re.compile('|'.join('(?P<%s>%s)' % pair for pair in TOKEN_SPEC))
 
-def tokenize(code):
+def tokenize(code, lineno=1):
     """Yield tokens as tuples: (type, value, lineno, col)"""
-    lineno = 1
     line_start = 0
     for mo in master_pat.finditer(code):
         kind = mo.lastgroup
@@ -76,6 +94,114 @@ def tokenize(code):
         else:
             yield (kind, value, lineno, column)
 
+def tokenize_lines(lines):
+    """Like tokenize(), but pulls the source one line at a time.
+
+    Tokens never span lines, so only the current line is held in memory.
+    """
+    for lineno, line in enumerate(lines, 1):
+        yield from tokenize(line, lineno)
+
+def tokenize_file(path):
+    """Stream tokens from a source file (read in buffered chunks)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from tokenize_lines(f)
+
+class TokenColumns:
+    """Columnar token stream: parallel arrays instead of one tuple per token.
+
+    kinds holds integer token kinds (see TOKEN_KINDS), lines/cols the
+    positions, and values an offset into pool, where every distinct token
+    value is stored once.
+    """
+    def __init__(self):
+        self.kinds = array('B')
+        self.lines = array('I')
+        self.cols = array('I')
+        self.values = array('I')
+        self.pool = []
+        self.pool_index = {}
+
+    def intern(self, value):
+        # values are only ints and strs, so 1 and '1' never collide
+        off = self.pool_index.get(value)
+        if off is None:
+            off = self.pool_index[value] = len(self.pool)
+            self.pool.append(value)
+        return off
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        # the same (type, value, lineno, col) tuples tokenize() yields
+        pool = self.pool
+        for k, v, l, c in zip(self.kinds, self.values, self.lines, self.cols):
+            yield (TOKEN_KINDS[k], pool[v], l, c)
+
+    def kind_tokens(self):
+        # (kind, value, lineno, col) with integer kinds, NEWLINEs dropped
+        pool = self.pool
+        for k, v, l, c in zip(self.kinds, self.values, self.lines, self.cols):
+            if k != T_NEWLINE:
+                yield (k, pool[v], l, c)
+
+def tokenize_columnar(code):
+    """Tokenize straight into a TokenColumns buffer"""
+    cols = TokenColumns()
+    # appending to lists is cheaper than to arrays, so tokens are staged in
+    # small lists and flushed into the arrays every few thousand tokens
+    kinds, lines, columns, values = [], [], [], []
+    add_kind = kinds.append
+    add_line = lines.append
+    add_col = columns.append
+    add_value = values.append
+    pool = cols.pool
+    pool_index = cols.pool_index
+    kind_of = KIND
+    keywords = KEYWORDS
+    lineno = 1
+    line_start = 0
+
+    def flush():
+        cols.kinds.fromlist(kinds)
+        cols.lines.fromlist(lines)
+        cols.cols.fromlist(columns)
+        cols.values.fromlist(values)
+        del kinds[:], lines[:], columns[:], values[:]
+
+    for mo in master_pat.finditer(code):
+        kind = mo.lastgroup
+        if kind == 'SKIP':
+            continue
+        value = mo.group()
+        if kind == 'ID':
+            kind = keywords.get(value, 'ID')
+        elif kind == 'NUMBER':
+            value = int(value)
+        elif kind == 'STRING':
+            value = value[1:-1]
+        elif kind == 'COMMENT':
+            continue
+        elif kind == 'MISMATCH':
+            column = mo.start() - line_start + 1
+            raise SyntaxError(f'Unexpected character {value!r} at line {lineno} col {column}')
+        add_kind(kind_of[kind])
+        add_line(lineno)
+        add_col(mo.start() - line_start + 1)
+        off = pool_index.get(value)
+        if off is None:
+            off = pool_index[value] = len(pool)
+            pool.append(value)
+        add_value(off)
+        if kind == 'NEWLINE':
+            lineno += 1
+            line_start = mo.end()
+            if len(kinds) >= 4096:
+                flush()
+    flush()
+    return cols
+
 if __name__ == '__main__':
     sample = 'बदलवा a = 5\nलिहा "नमस्कार"\n'
     for t in tokenize(sample):
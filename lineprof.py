@@ -0,0 +1,136 @@
+# Source-line and loop profiler for linked programs.
+#
+# execute_profiled() is vm.execute()'s run loop plus a counter and a clock
+# reading per instruction. It is a separate loop, so programs run without
+# --profile pay nothing for it. LineProfile folds the per-instruction
+# numbers into per-line and per-loop totals using the program's line table,
+# and renders them as a table, as JSON, or as folded stacks (the input
+# format of flamegraph.pl, inferno and speedscope).
+
+import json
+import time
+
+from vm import decode, JUMP, JUMP_IF_FALSE, FOR_RANGE, FOR_NEXT, CMP_JUMP, CMP_CONST_JUMP
+
+# operand position of the jump target, for instructions that have one
+TARGET_POS = {JUMP: 1, JUMP_IF_FALSE: 2, FOR_RANGE: 3, FOR_NEXT: 3, CMP_JUMP: 4, CMP_CONST_JUMP: 4}
+
+
+def execute_profiled(program, write=print):
+    # -> (regs, LineProfile)
+    handlers, regs = decode(program, write)
+    n = len(handlers)
+    counts = [0] * n
+    times = [0.0] * n
+    clock = time.perf_counter
+    ip = 0
+    last = clock()
+    while ip < n:
+        nxt = handlers[ip]()
+        now = clock()
+        counts[ip] += 1
+        times[ip] += now - last
+        last = now
+        ip = nxt
+    return regs, LineProfile(program, counts, times)
+
+
+def find_loops(program):
+    # every backward jump closes a loop: (first ip, back-edge ip), outermost first
+    loops = []
+    for ip, ins in enumerate(program.instructions()):
+        pos = TARGET_POS.get(ins[0])
+        if pos is not None and ins[pos] <= ip:
+            loops.append((ins[pos], ip))
+    loops.sort(key=lambda loop: (loop[0], -loop[1]))
+    return loops
+
+
+class LineProfile:
+    def __init__(self, program, counts, times):
+        self.lines = list(program.lines)  # ip -> source line
+        self.counts = counts              # ip -> executions
+        self.times = times                # ip -> seconds
+        self.loops = find_loops(program)
+
+    def line_stats(self):
+        # [(line, instructions, seconds)], hottest first
+        stats = {}
+        for ip, count in enumerate(self.counts):
+            if count:
+                s = stats.setdefault(self.lines[ip], [0, 0.0])
+                s[0] += count
+                s[1] += self.times[ip]
+        rows = [(line, c, t) for line, (c, t) in stats.items()]
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return rows
+
+    def loop_stats(self):
+        # [(header line, first line, last line, iterations, instructions, seconds)],
+        # hottest first; a loop's totals include its nested loops
+        rows = []
+        for start, end in self.loops:
+            body_lines = [line for line in self.lines[start:end + 1] if line]
+            rows.append((self.lines[end],
+                         min(body_lines, default=0), max(body_lines, default=0),
+                         self.counts[end],
+                         sum(self.counts[start:end + 1]),
+                         sum(self.times[start:end + 1])))
+        rows.sort(key=lambda row: (-row[5], row[0]))
+        return rows
+
+    def total(self):
+        return sum(self.counts), sum(self.times)
+
+    def format_table(self, source_lines=None, limit=None):
+        total_count, total_time = self.total()
+        total_time = total_time or 1.0
+        out = ['--- PROFILE: LINES ---',
+               f'{"line":>6} {"instructions":>13} {"time ms":>10} {"time %":>7}  source']
+        for line, count, t in self.line_stats()[:limit]:
+            text = ''
+            if source_lines and 0 < line <= len(source_lines):
+                text = source_lines[line - 1].strip()
+            out.append(f'{line:6d} {count:13d} {t * 1000:10.3f} {100 * t / total_time:6.1f}%  {text}')
+        loops = self.loop_stats()
+        if loops:
+            out.append('--- PROFILE: LOOPS ---')
+            out.append(f'{"line":>6} {"lines":>11} {"iterations":>11} {"instructions":>13} {"time ms":>10} {"time %":>7}')
+            for line, first, last, iters, count, t in loops[:limit]:
+                span = f'{first}-{last}'
+                out.append(f'{line:6d} {span:>11} {iters:11d} {count:13d} {t * 1000:10.3f} {100 * t / total_time:6.1f}%')
+        out.append(f'total: {total_count} instructions, {self.total()[1] * 1000:.3f} ms')
+        return '\n'.join(out)
+
+    def to_json(self):
+        total_count, total_time = self.total()
+        return {
+            'instructions': total_count,
+            'seconds': total_time,
+            'lines': [{'line': line, 'instructions': c, 'seconds': t}
+                      for line, c, t in self.line_stats()],
+            'loops': [{'line': line, 'first_line': first, 'last_line': last,
+                       'iterations': iters, 'instructions': c, 'seconds': t}
+                      for line, first, last, iters, c, t in self.loop_stats()],
+        }
+
+    def folded(self, root='main'):
+        # one "root;loop:L;...;line:N microseconds" row per distinct stack
+        stacks = {}
+        for ip, count in enumerate(self.counts):
+            if not count:
+                continue
+            frames = [root]
+            frames.extend(f'loop:{self.lines[end]}' for start, end in self.loops if start <= ip <= end)
+            frames.append(f'line:{self.lines[ip]}')
+            key = ';'.join(frames)
+            stacks[key] = stacks.get(key, 0.0) + self.times[ip]
+        return ''.join(f'{key} {max(1, round(t * 1e6))}\n' for key, t in sorted(stacks.items()))
+
+    def save_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, indent=1)
+
+    def save_folded(self, path, root='main'):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded(root))
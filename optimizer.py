@@ -0,0 +1,338 @@
+from itertools import count
+from irgen import instr_def, instr_uses, is_temp, cannot_raise, DEF_POS, USE_POS, LIST_BUILDS
+from cfg import build_cfg
+from ssa import fold_binop, propagate_constants_globally, eliminate_dead_code_globally, optimize_loops
+
+# IR optimization passes. Each pass takes the instruction list produced by
+# IRGen.gen and returns a new one; the PassManager runs them in order and
+# records how many instructions each removed.
+#
+# The passes rely on IRGen's temps being written exactly once (a temp is
+# read inside the statement that computed it, or after number_values by
+# later statements of the same block), so they must run before anything
+# that starts reusing temp names.
+
+
+# name -> times written / read; names never written / read are missing.
+# _ref_counts() gives both in one scan.
+
+def _def_counts(ir):
+    defs = {}
+    count = defs.get
+    for ins in ir:
+        pos = DEF_POS.get(ins[0])
+        if pos is not None:
+            d = ins[pos]
+            defs[d] = count(d, 0) + 1
+    return defs
+
+def _use_counts(ir):
+    uses = {}
+    count = uses.get
+    for ins in ir:
+        op = ins[0]
+        for pos in USE_POS.get(op, ()):
+            if op in LIST_BUILDS:
+                for u in ins[pos]:
+                    uses[u] = count(u, 0) + 1
+            else:
+                u = ins[pos]
+                uses[u] = count(u, 0) + 1
+    return uses
+
+def _ref_counts(ir):
+    defs = {}
+    uses = {}
+    def_count = defs.get
+    use_count = uses.get
+    for ins in ir:
+        op = ins[0]
+        pos = DEF_POS.get(op)
+        if pos is not None:
+            d = ins[pos]
+            defs[d] = def_count(d, 0) + 1
+        for pos in USE_POS.get(op, ()):
+            if op in LIST_BUILDS:
+                for u in ins[pos]:
+                    uses[u] = use_count(u, 0) + 1
+            else:
+                u = ins[pos]
+                uses[u] = use_count(u, 0) + 1
+    return defs, uses
+
+
+def fold_constants(ir):
+    defs = _def_counts(ir)
+    known = {}    # temp -> constant value
+    out = []
+    for ins in ir:
+        op = ins[0]
+        if op in ('const', 'const_str') and is_temp(ins[1]) and defs[ins[1]] == 1:
+            known[ins[1]] = ins[2]
+        elif (op == 'binop' or op == 'int_binop') and ins[3] in known and ins[4] in known:
+            _, t, bop, a, b = ins
+            val = fold_binop(bop, known[a], known[b])
+            if val is not None:
+                ins = ('const_str' if isinstance(val, str) else 'const', t, val)
+                if is_temp(t) and defs[t] == 1:
+                    known[t] = val
+        elif op == 'if_false_goto' and ins[1] in known:
+            if known[ins[1]]:
+                continue  # never taken
+            ins = ('goto', ins[2])
+        elif op == 'int_cmp_goto' and ins[2] in known and ins[3] in known:
+            val = fold_binop(ins[1], known[ins[2]], known[ins[3]])
+            if val is not None:
+                if val:
+                    continue  # never taken
+                ins = ('goto', ins[4])
+        out.append(ins)
+    return out
+
+
+# int operators whose operands can be swapped
+COMMUTATIVE = ('plus', 'mul', 'eq', 'ne')
+# untyped operators that return a new list when given one
+LIST_BOPS = ('plus', 'mul')
+
+def _rename_uses(ins, rename):
+    op = ins[0]
+    positions = USE_POS.get(op, ())
+    if not positions:
+        return ins
+    ins = list(ins)
+    for pos in positions:
+        if op in LIST_BUILDS:
+            ins[pos] = tuple(rename.get(u, u) for u in ins[pos])
+        else:
+            ins[pos] = rename.get(ins[pos], ins[pos])
+    return tuple(ins)
+
+
+def number_values(ir):
+    # Local value numbering: within each basic block (cfg.build_cfg), a
+    # binop or list read that computes a value some temp of the block
+    # already holds is dropped, and its temp renamed to that one. Operands
+    # are compared by value number, not by name, so an assign gives the
+    # variable the number of its source and expressions over its old value
+    # stop matching; an index_set / list_set forgets every list read (any
+    # two lists may be the same one), untyped binops included: `a + b` or
+    # `a == b` on lists reads them too. An untyped `plus` / `mul` is only
+    # numbered when neither operand can be a list: `z + z` or `z * 2` on a
+    # list builds a new list every time, and sharing it would alias the two.
+    # Constants are numbered by value but kept, and so is `x + k`: fuse_instructions folds those into the
+    # instruction that uses them, which sharing one temp would prevent.
+    rename = {}   # dropped temp -> temp holding its value
+    drop = set()  # indexes into ir
+    fresh = count()
+    for block in build_cfg(ir):
+        numbers = {}      # name -> value number
+        constants = set() # value numbers of constants
+        scalars = set()   # value numbers that are no list: constants and arithmetic
+        exprs = {}        # (bop, number, number) / (type, value) -> (number, temp or None)
+        loads = {}        # (arr number, index number) -> (number, temp or None)
+
+        def number(name):
+            name = rename.get(name, name)
+            n = numbers.get(name)
+            if n is None:
+                n = numbers[name] = next(fresh)
+            return n
+
+        for i in range(block.start, block.end):
+            ins = ir[i]
+            op = ins[0]
+            keep = False
+            if op == 'const' or op == 'const_str':
+                key = (type(ins[2]), ins[2])
+                table = exprs
+                keep = True
+            elif op == 'binop' or op == 'int_binop':
+                _, d, bop, a, b = ins
+                na, nb = number(a), number(b)
+                if op == 'binop' and bop in LIST_BOPS and not (na in scalars and nb in scalars):
+                    numbers.pop(d, None)  # maybe a new list, like const_list
+                    number(d)
+                    continue
+                if op == 'int_binop' and bop in COMMUTATIVE and nb < na:
+                    na, nb = nb, na
+                key = (bop, na, nb)
+                table = exprs if op == 'int_binop' else loads
+                keep = bop == 'plus' and (na in constants or nb in constants)
+            elif op == 'index_get' or op == 'list_get':
+                key = (number(ins[2]), number(ins[3]))
+                table = loads
+            else:
+                if op == 'assign':
+                    numbers[ins[1]] = number(ins[2])
+                    continue
+                if op == 'index_set' or op == 'list_set':
+                    loads.clear()
+                d = instr_def(ins)
+                if d is not None:
+                    numbers.pop(d, None)  # for_next: a new, unknown value
+                continue
+            d = ins[1]
+            hit = table.get(key)
+            if hit is None:
+                numbers.pop(d, None)
+                n = number(d)
+                table[key] = (n, d if is_temp(d) else None)
+                if table is exprs and len(key) == 2:
+                    constants.add(n)
+                if op != 'index_get' and op != 'list_get':
+                    scalars.add(n)
+            else:
+                numbers[d] = hit[0]
+                if hit[1] is not None and is_temp(d) and not keep:
+                    rename[d] = hit[1]
+                    drop.add(i)
+    if not drop:
+        return ir
+    return [_rename_uses(ins, rename) for i, ins in enumerate(ir) if i not in drop]
+
+
+def propagate_copies(ir):
+    # X t, ... ; assign v, t   =>   X v, ...
+    # when t is a temp written once and read only by that assign
+    defs, uses = _ref_counts(ir)
+    out = []
+    for ins in ir:
+        if ins[0] == 'assign' and out:
+            _, name, src = ins
+            prev = out[-1]
+            if (is_temp(src) and instr_def(prev) == src
+                    and defs[src] == 1 and uses[src] == 1):
+                out[-1] = (prev[0], name) + prev[2:]
+                continue
+        out.append(ins)
+    return out
+
+
+def eliminate_dead_temps(ir):
+    # drop instructions that can't raise (irgen.cannot_raise) whose temp is
+    # never read; removing one takes its reads off the counts, which can
+    # make its operands dead too
+    uses = _use_counts(ir)
+    dead = [i for i, ins in enumerate(ir)
+            if cannot_raise(ins) and ins[1] not in uses and is_temp(ins[1])]
+    if not dead:
+        return ir
+    writer = {ins[1]: i for i, ins in enumerate(ir) if cannot_raise(ins)}  # temp -> its writer
+    drop = set()
+    while dead:
+        i = dead.pop()
+        drop.add(i)
+        for u in instr_uses(ir[i]):
+            uses[u] -= 1
+            if uses[u] == 0 and u in writer and is_temp(u):
+                dead.append(writer[u])
+    return [ins for i, ins in enumerate(ir) if i not in drop]
+
+
+# comparisons a branch can be fused with, and the same with the operands swapped
+CMP_BOPS = ('eq', 'ne', 'lt', 'gt', 'le', 'ge')
+MIRRORED = {'eq': 'eq', 'ne': 'ne', 'lt': 'gt', 'gt': 'lt', 'le': 'ge', 'ge': 'le'}
+
+def _fuse_pair(prev, ins, single):
+    # the superinstruction replacing prev followed by ins, or None
+    op = ins[0]
+    pop = prev[0]
+    if pop == 'const':
+        tk, k = prev[1], prev[2]
+        if not single(tk):
+            return None
+        if (op == 'binop' or op == 'int_binop') and ins[4] == tk and ins[3] != tk:
+            return ('binop_const', ins[1], ins[2], ins[3], k)
+        if op == 'cmp_goto' or op == 'int_cmp_goto':
+            if ins[3] == tk and ins[2] != tk:
+                return ('cmp_const_goto', ins[1], ins[2], k, ins[4])
+            if ins[2] == tk and ins[3] != tk:
+                # k < a  =>  a > k
+                return ('cmp_const_goto', MIRRORED[ins[1]], ins[3], k, ins[4])
+    elif pop == 'binop' or pop == 'int_binop':
+        if op == 'if_false_goto' and prev[2] in CMP_BOPS and ins[1] == prev[1] and single(prev[1]):
+            return ('cmp_goto', prev[2], prev[3], prev[4], ins[2])
+    elif pop == 'binop_const':
+        t = prev[1]
+        if not single(t):
+            return None
+        if op == 'if_false_goto' and prev[2] in CMP_BOPS and ins[1] == t:
+            return ('cmp_const_goto', prev[2], prev[3], prev[4], ins[2])
+        if op == 'assign' and ins[2] == t:
+            # x = x + k and friends
+            return ('binop_const', ins[1]) + prev[2:]
+        if prev[2] == 'plus':
+            if (op == 'index_get' or op == 'list_get') and ins[3] == t and ins[2] != t:
+                return ('index_get_offset', ins[1], ins[2], prev[3], prev[4])
+            if op == 'list_set' and ins[2] == t and ins[1] != t and ins[3] != t:
+                return ('list_set_offset', ins[1], prev[3], prev[4], ins[3])
+    return None
+
+
+def fuse_instructions(ir):
+    # Peephole fusion of the instruction pairs that dominate execution
+    # (python -m bench.pairs counts them): a pair linked by a temp that
+    # nothing else reads becomes one superinstruction, so the VM dispatches
+    # once instead of twice. Pairs are fused as they are appended, so a
+    # fused instruction can fuse again with the next one (const + binop +
+    # if_false_goto becomes one cmp_const_goto). Runs last: the other
+    # passes don't know the fused forms.
+    defs, uses = _ref_counts(ir)
+
+    def single(t):
+        return is_temp(t) and defs[t] == 1 and uses.get(t) == 1
+
+    out = []
+    for ins in ir:
+        if out:
+            fused = _fuse_pair(out[-1], ins, single)
+            if fused is not None:
+                out[-1] = fused
+                continue
+        out.append(ins)
+    return out
+
+
+def _size(ir):
+    return sum(1 for ins in ir if ins[0] != 'line')
+
+
+class PassManager:
+    def __init__(self, passes):
+        self.passes = passes
+
+    def run(self, ir):
+        report = []   # (pass name, instructions removed; line markers don't count)
+        for p in self.passes:
+            before = _size(ir)
+            ir = p(ir)
+            report.append((p.__name__, before - _size(ir)))
+        return ir, report
+
+
+# passes enabled at each -O level
+LEVELS = {
+    0: [],
+    1: [fold_constants, number_values, eliminate_dead_temps, fuse_instructions],
+    2: [fold_constants, number_values, propagate_copies, eliminate_dead_temps, fuse_instructions],
+    3: [fold_constants, propagate_constants_globally, eliminate_dead_code_globally, optimize_loops,
+        number_values, propagate_copies, eliminate_dead_temps, fuse_instructions],
+}
+
+# from this level up, vm.link() also recycles temps (regalloc.allocate_temps)
+RECYCLE_TEMPS_LEVEL = 2
+
+def optimize(ir, level=1):
+    return PassManager(LEVELS[level]).run(ir)
+
+
+if __name__ == '__main__':
+    from parser import parse_code
+    from irgen import IRGen
+    ir = IRGen().gen(parse_code('बदलवा x = 2 + 3 * 4\nलिहा x\n'))
+    opt, report = optimize(ir, 2)
+    for ins in opt:
+        print(ins)
+    for name, removed in report:
+        print(f'{name}: {removed} removed')
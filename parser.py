@@ -1,302 +1,420 @@
-from lexer import tokenize
+from lexer import *
 
 class ASTNode:
-    pass
+    # Nodes are slotted (no per-instance __dict__). child_fields names the
+    # attributes that hold child nodes or lists of them, in source order;
+    # iter_child_nodes()/walk() use it for generic traversal. Statement
+    # nodes also record the source line they start on (lineno); expression
+    # nodes carry the type SemanticAnalyzer proved for them (type: 'int',
+    # 'str', 'list', or None when not proven), and list literals the type
+    # proven for every list element in the program (element_type).
+    __slots__ = ()
+    child_fields = ()
 
 class Program(ASTNode):
+    __slots__ = ('statements',)
+    child_fields = ('statements',)
     def __init__(self, statements):
         self.statements = statements
     def __repr__(self):
         return f'Program({self.statements})'
 
 class Print(ASTNode):
-    def __init__(self, expr):
+    __slots__ = ('expr', 'lineno')
+    child_fields = ('expr',)
+    def __init__(self, expr, lineno=0):
         self.expr = expr
+        self.lineno = lineno
     def __repr__(self):
         return f'Print({self.expr})'
 
 class Assign(ASTNode):
-    def __init__(self, target, expr):
+    __slots__ = ('target', 'expr', 'lineno')
+    child_fields = ('target', 'expr')
+    def __init__(self, target, expr, lineno=0):
         # target may be a Var(name) or Index(array_expr, index_expr)
         self.target = target
         self.expr = expr
+        self.lineno = lineno
     def __repr__(self):
         return f'Assign({self.target}, {self.expr})'
 
 class Let(ASTNode):
-    def __init__(self, name, expr):
+    __slots__ = ('name', 'expr', 'lineno')
+    child_fields = ('expr',)
+    def __init__(self, name, expr, lineno=0):
         self.name = name
         self.expr = expr
+        self.lineno = lineno
     def __repr__(self):
         return f'Let({self.name}, {self.expr})'
 
 class If(ASTNode):
-    def __init__(self, cond, then_block, else_block=None):
+    __slots__ = ('cond', 'then_block', 'else_block', 'lineno')
+    child_fields = ('cond', 'then_block', 'else_block')
+    def __init__(self, cond, then_block, else_block=None, lineno=0):
         self.cond = cond
         self.then_block = then_block
         self.else_block = else_block
+        self.lineno = lineno
     def __repr__(self):
         return f'If({self.cond}, then={self.then_block}, else={self.else_block})'
 
 class While(ASTNode):
-    def __init__(self, cond, body):
+    __slots__ = ('cond', 'body', 'lineno')
+    child_fields = ('cond', 'body')
+    def __init__(self, cond, body, lineno=0):
         self.cond = cond
         self.body = body
+        self.lineno = lineno
     def __repr__(self):
         return f'While({self.cond}, body={self.body})'
 
 class ForLoop(ASTNode):
-    def __init__(self, var, start, end, body):
+    __slots__ = ('var', 'start', 'end', 'body', 'lineno')
+    child_fields = ('start', 'end', 'body')
+    def __init__(self, var, start, end, body, lineno=0):
         self.var = var
         self.start = start
         self.end = end
         self.body = body
+        self.lineno = lineno
     def __repr__(self):
         return f"ForLoop({self.var}, {self.start}, {self.end}, {self.body})"
 
 class BinOp(ASTNode):
+    __slots__ = ('left', 'op', 'right', 'type')
+    child_fields = ('left', 'right')
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        self.type = None
     def __repr__(self):
         return f'BinOp({self.left}, {self.op}, {self.right})'
 
 class Num(ASTNode):
+    __slots__ = ('value', 'type')
     def __init__(self, value):
         self.value = value
+        self.type = None
     def __repr__(self):
         return f'Num({self.value})'
 
 class Str(ASTNode):
+    __slots__ = ('value', 'type')
     def __init__(self, value):
         self.value = value
+        self.type = None
     def __repr__(self):
         return f'Str({self.value!r})'
 
 class Var(ASTNode):
+    __slots__ = ('name', 'type')
     def __init__(self, name):
         self.name = name
+        self.type = None
     def __repr__(self):
         return f'Var({self.name})'
 
 class ArrayLiteral(ASTNode):
+    __slots__ = ('elements', 'type', 'element_type')
+    child_fields = ('elements',)
     def __init__(self, elements):
         self.elements = elements
+        self.type = None
+        self.element_type = None
     def __repr__(self):
         return f'Array({self.elements})'
 
 class Index(ASTNode):
+    __slots__ = ('array', 'index', 'type')
+    child_fields = ('array', 'index')
     def __init__(self, array_expr, index_expr):
         self.array = array_expr
         self.index = index_expr
+        self.type = None
     def __repr__(self):
         return f'Index({self.array}, {self.index})'
 
 
+def iter_child_nodes(node):
+    # direct children of node, in source order
+    for name in node.child_fields:
+        child = getattr(node, name)
+        if isinstance(child, list):
+            for c in child:
+                if isinstance(c, ASTNode):
+                    yield c
+        elif isinstance(child, ASTNode):
+            yield child
+
+def walk(node):
+    # every node under (and including) node, pre-order, without recursion
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(iter_child_nodes(node))))
+
+def assigned_names(stmts):
+    # variable names written anywhere in a block (including nested blocks)
+    names = set()
+    for s in stmts:
+        for node in walk(s):
+            if isinstance(node, Let):
+                names.add(node.name)
+            elif isinstance(node, Assign) and isinstance(node.target, Var):
+                names.add(node.target.name)
+            elif isinstance(node, ForLoop):
+                names.add(node.var)
+    return names
+
+
+EOF = (T_EOF, '', 0, 0)
+
 class Parser:
     def __init__(self, tokens):
-        # Remove NEWLINEs for simpler parsing
-        self.tokens = [t for t in tokens if t[0] != 'NEWLINE']
-        self.pos = 0
+        # Tokens are pulled lazily (any iterable of lexer tuples works,
+        # including a streaming lexer, or a TokenColumns buffer) and the
+        # grammar works on integer token kinds; NEWLINEs are dropped for
+        # simpler parsing. One token of lookahead is kept in self.tok.
+        if isinstance(tokens, TokenColumns):
+            self.tokens = tokens.kind_tokens()
+        else:
+            self.tokens = ((KIND[t[0]], t[1], t[2], t[3]) for t in tokens if t[0] != 'NEWLINE')
+        self.tok = next(self.tokens, EOF)
 
     def peek(self):
-        return self.tokens[self.pos] if self.pos < len(self.tokens) else ('EOF', '', 0, 0)
+        return self.tok
 
     def next(self):
-        tok = self.peek()
-        self.pos += 1
+        tok = self.tok
+        if tok is not EOF:
+            self.tok = next(self.tokens, EOF)
         return tok
 
     def expect(self, kind):
         tok = self.peek()
         if tok[0] != kind:
-            raise SyntaxError(f'Expected {kind} but got {tok[0]} at {tok[2]}:{tok[3]}')
+            raise SyntaxError(f'Expected {TOKEN_KINDS[kind]} but got {TOKEN_KINDS[tok[0]]} at {tok[2]}:{tok[3]}')
         return self.next()
 
     def parse(self):
-        stmts = []
-        while self.peek()[0] != 'EOF':
-            stmts.append(self.statement())
-        return Program(stmts)
+        return Program(list(self.parse_statements()))
+
+    def parse_statements(self):
+        # yield each top-level statement as soon as it is complete
+        while self.peek()[0] != T_EOF:
+            yield self.statement()
 
     def statement(self):
         tok = self.peek()
+        line = tok[2]
 
-        if tok[0] == 'PRINT':
+        if tok[0] == T_PRINT:
             self.next()
             expr = self.expr()
-            return Print(expr)
+            return Print(expr, line)
 
-        elif tok[0] == 'ID':
+        elif tok[0] == T_ID:
             name = self.next()[1]
             # Check for array indexing
-            if self.peek()[0] == 'LBRACK':
+            if self.peek()[0] == T_LBRACK:
                 self.next()
                 idx = self.expr()
-                self.expect('RBRACK')
+                self.expect(T_RBRACK)
                 target = Index(Var(name), idx)
             else:
                 target = Var(name)
-            self.expect('ASSIGN')
+            self.expect(T_ASSIGN)
             expr = self.expr()
-            return Assign(target, expr)
+            return Assign(target, expr, line)
 
-        elif tok[0] == 'LET':
+        elif tok[0] == T_LET:
             self.next()
-            id_tok = self.expect('ID')
-            self.expect('ASSIGN')
+            id_tok = self.expect(T_ID)
+            self.expect(T_ASSIGN)
             expr = self.expr()
-            return Let(id_tok[1], expr)
+            return Let(id_tok[1], expr, line)
 
-        elif tok[0] == 'IF':
+        elif tok[0] == T_IF:
             self.next()
             cond = self.expr()
-            self.expect('THEN')
+            self.expect(T_THEN)
             then_block = []
-            while self.peek()[0] not in ('ELSE', 'END', 'EOF'):
+            while self.peek()[0] not in (T_ELSE, T_END, T_EOF):
                 then_block.append(self.statement())
 
             else_block = None
-            if self.peek()[0] == 'ELSE':
+            if self.peek()[0] == T_ELSE:
                 self.next()
                 else_block = []
-                while self.peek()[0] not in ('END', 'EOF'):
+                while self.peek()[0] not in (T_END, T_EOF):
                     else_block.append(self.statement())
 
-            if self.peek()[0] == 'END':
+            if self.peek()[0] == T_END:
                 self.next()
-            return If(cond, then_block, else_block)
+            return If(cond, then_block, else_block, line)
 
-        elif tok[0] == 'WHILE':
+        elif tok[0] == T_WHILE:
             self.next()
             cond = self.expr()
-            self.expect('THEN')
+            self.expect(T_THEN)
             body = []
-            while self.peek()[0] not in ('END', 'EOF'):
+            while self.peek()[0] not in (T_END, T_EOF):
                 body.append(self.statement())
-            if self.peek()[0] == 'END':
+            if self.peek()[0] == T_END:
                 self.next()
-            return While(cond, body)
+            return While(cond, body, line)
 
-        elif tok[0] == 'FOR':
+        elif tok[0] == T_FOR:
             # साठी i = start ते end तर
             self.next()
-            var_name = self.expect('ID')[1]
-            self.expect('ASSIGN')
+            var_name = self.expect(T_ID)[1]
+            self.expect(T_ASSIGN)
             start_expr = self.expr()
-            self.expect('TO')
+            self.expect(T_TO)
             end_expr = self.expr()
-            self.expect('THEN')
+            self.expect(T_THEN)
 
             body = []
-            while self.peek()[0] not in ('END', 'EOF'):
+            while self.peek()[0] not in (T_END, T_EOF):
                 body.append(self.statement())
-            if self.peek()[0] == 'END':
+            if self.peek()[0] == T_END:
                 self.next()
-            return ForLoop(var_name, start_expr, end_expr, body)
+            return ForLoop(var_name, start_expr, end_expr, body, line)
 
         else:
-            raise SyntaxError(f'Unknown statement starting with {tok[0]} at {tok[2]}')
+            raise SyntaxError(f'Unknown statement starting with {TOKEN_KINDS[tok[0]]} at {tok[2]}')
 
     # ---------- EXPRESSION PARSING ----------
+    #
+    # Table-driven precedence climbing with explicit operand/operator
+    # stacks, so nesting depth is bounded by memory rather than by Python's
+    # recursion limit. Precedence (loosest first), all left-associative:
+    #
+    #   किंवा  <  आणि  <  नाही (prefix)  <  comparisons  <  + -  <  * / %  <  ^
+    #
+    # नाही is only accepted where an आणि operand starts (start of an
+    # expression, or right after आणि / किंवा) and applies to the whole
+    # comparison that follows it: नाही x becomes BinOp(Num(0), EQ, x).
 
     def expr(self):
-        return self.parse_or()
+        vals = []       # operand stack
+        ops = []        # (prec, op name) for operators; (0, group kind, payload) for open groups
+        not_ok = True   # may a नाही start here?
+        tokens = self.tokens
+        tok = self.tok
+        while True:
+            # ---- expecting an operand ----
+            kind = tok[0]
+            if kind == T_NUMBER:
+                vals.append(Num(tok[1]))
+            elif kind == T_ID:
+                name = tok[1]
+                tok = next(tokens, EOF)
+                if tok[0] == T_LBRACK:
+                    ops.append((0, T_LBRACK, Var(name)))
+                    tok = next(tokens, EOF)
+                    not_ok = True
+                    continue
+                vals.append(Var(name))
+                kind = None
+            elif kind == T_STRING:
+                vals.append(Str(tok[1]))
+            elif kind == T_LPAREN:
+                ops.append((0, T_LPAREN, None))
+                tok = next(tokens, EOF)
+                not_ok = True
+                continue
+            elif kind == T_LBRACK:
+                tok = next(tokens, EOF)
+                if tok[0] == T_RBRACK:
+                    vals.append(ArrayLiteral([]))
+                else:
+                    ops.append((0, T_COMMA, []))
+                    not_ok = True
+                    continue
+            elif kind == T_NOT and not_ok:
+                ops.append((NOT_PREC, None))
+                tok = next(tokens, EOF)
+                not_ok = False
+                continue
+            else:
+                self.tok = tok
+                raise SyntaxError(f'Unexpected token in factor: {TOKEN_KINDS[kind]} at {tok[2]}:{tok[3]}')
+            if kind is not None:
+                tok = next(tokens, EOF)
+
+            # ---- expecting an operator (or the end of a group) ----
+            while True:
+                kind = tok[0]
+                prec = BINARY_PREC.get(kind)
+                if prec is not None:
+                    while ops and ops[-1][0] >= prec:
+                        _reduce(vals, ops.pop())
+                    ops.append((prec, TOKEN_KINDS[kind]))
+                    tok = next(tokens, EOF)
+                    not_ok = kind == T_AND or kind == T_OR
+                    break
+                # close the innermost open group, if this token ends it
+                while ops and ops[-1][0]:
+                    _reduce(vals, ops.pop())
+                if not ops:
+                    self.tok = tok
+                    return vals[-1]
+                _, group, payload = ops[-1]
+                if group == T_LPAREN and kind == T_RPAREN:
+                    ops.pop()
+                elif group == T_LBRACK and kind == T_RBRACK:
+                    ops.pop()
+                    vals.append(Index(payload, vals.pop()))
+                elif group == T_COMMA and kind == T_COMMA:
+                    payload.append(vals.pop())
+                    tok = next(tokens, EOF)
+                    not_ok = True
+                    break
+                elif group == T_COMMA and kind == T_RBRACK:
+                    ops.pop()
+                    payload.append(vals.pop())
+                    vals.append(ArrayLiteral(payload))
+                else:
+                    self.tok = tok
+                    closer = 'RPAREN' if group == T_LPAREN else 'RBRACK'
+                    raise SyntaxError(f'Expected {closer} but got {TOKEN_KINDS[kind]} at {tok[2]}:{tok[3]}')
+                tok = next(tokens, EOF)
+
+
+def _reduce(vals, op):
+    # apply a popped operator to the operand stack
+    right = vals.pop()
+    if op[1] is None:
+        vals.append(BinOp(Num(0), 'EQ', right))
+    else:
+        vals.append(BinOp(vals.pop(), op[1], right))
+
+BINARY_PREC = {
+    T_OR: 1,
+    T_AND: 2,
+    T_EQ: 4, T_NE: 4, T_LT: 4, T_GT: 4, T_LE: 4, T_GE: 4,
+    T_PLUS: 5, T_MINUS: 5,
+    T_MUL: 6, T_DIV: 6, T_MOD: 6,
+    T_POW: 7,
+}
+NOT_PREC = 3
 
-    def parse_or(self):
-        node = self.parse_and()
-        while self.peek()[0] == 'OR':
-            self.next()
-            right = self.parse_and()
-            node = BinOp(node, 'OR', right)
-        return node
+def parse_code(code):
+    return Parser(tokenize(code)).parse()
 
-    def parse_and(self):
-        node = self.parse_not()
-        while self.peek()[0] == 'AND':
-            self.next()
-            right = self.parse_not()
-            node = BinOp(node, 'AND', right)
-        return node
+def parse_columns(columns):
+    # parse a TokenColumns buffer from lexer.tokenize_columnar
+    return Parser(columns).parse()
 
-    def parse_not(self):
-        if self.peek()[0] == 'NOT':
-            self.next()
-            operand = self.parse_comparison()
-            return BinOp(Num(0), 'EQ', operand)
-        return self.parse_comparison()
-
-    def parse_comparison(self):
-        node = self.parse_addsub()
-        while self.peek()[0] in ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE'):
-            op = self.next()[0]
-            right = self.parse_addsub()
-            node = BinOp(node, op, right)
-        return node
-
-    def parse_addsub(self):
-        node = self.parse_muldivmod()
-        while self.peek()[0] in ('PLUS', 'MINUS'):
-            op = self.next()[0]
-            right = self.parse_muldivmod()
-            node = BinOp(node, op, right)
-        return node
-
-    def parse_muldivmod(self):
-        node = self.parse_power()
-        while self.peek()[0] in ('MUL', 'DIV', 'MOD'):
-            op = self.next()[0]
-            right = self.parse_power()
-            node = BinOp(node, op, right)
-        return node
-
-    def parse_power(self):
-        node = self.factor()
-        while self.peek()[0] == 'POW':
-            op = self.next()[0]
-            right = self.factor()
-            node = BinOp(node, op, right)
-        return node
-
-    def factor(self):
-        tok = self.peek()
-        if tok[0] == 'NUMBER':
-            self.next()
-            return Num(tok[1])
-        if tok[0] == 'STRING':
-            self.next()
-            return Str(tok[1])
-        if tok[0] == 'ID':
-            name = self.next()[1]
-            node = Var(name)
-            if self.peek()[0] == 'LBRACK':
-                self.next()
-                idx = self.expr()
-                self.expect('RBRACK')
-                node = Index(node, idx)
-            return node
-        if tok[0] == 'LPAREN':
-            self.next()
-            node = self.expr()
-            self.expect('RPAREN')
-            return node
-        if tok[0] == 'LBRACK':
-            self.next()
-            elems = []
-            if self.peek()[0] != 'RBRACK':
-                elems.append(self.expr())
-                while self.peek()[0] == 'COMMA':
-                    self.next()
-                    elems.append(self.expr())
-            self.expect('RBRACK')
-            return ArrayLiteral(elems)
-        raise SyntaxError(f'Unexpected token in factor: {tok[0]} at {tok[2]}:{tok[3]}')
-
-def parse_code(code):
-    toks = list(tokenize(code))
-    p = Parser(toks + [('EOF', '', 0, 0)])
-    return p.parse()
+def parse_file(path):
+    # streaming front end: top-level statements are yielded one at a time,
+    # so memory is bounded by the largest statement, not the file
+    return Parser(tokenize_file(path)).parse_statements()
 
 if __name__ == '__main__':
     s = 'बदलवा a = [1,2,3]\nलिहा a[1]\n'
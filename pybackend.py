@@ -0,0 +1,165 @@
+from parser import *
+
+# Python backend: translates the AST into Python source with structured
+# loops (no labels/gotos), compiles it once and lets CPython's own bytecode
+# loop run the program. Variables become locals of one generated function.
+
+ARITH = {'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '//', 'MOD': '%', 'POW': '**'}
+COMPARE = {'EQ': '==', 'NE': '!=', 'LT': '<', 'GT': '>', 'LE': '<=', 'GE': '>='}
+
+ENTRY = '__marathi_main__'
+
+
+def _and(a, b):
+    # both operands are already evaluated, like the IR does
+    return 1 if a and b else 0
+
+def _or(a, b):
+    return 1 if a or b else 0
+
+
+class PyGen:
+    def __init__(self):
+        self.lines = []
+        self.names = {}    # Marathi name -> Python local
+        self.temp_id = 0
+
+    def local(self, name):
+        py = self.names.get(name)
+        if py is None:
+            py = self.names[name] = f'v{len(self.names)}'
+        return py
+
+    def new_temp(self):
+        name = f'_t{self.temp_id}'
+        self.temp_id += 1
+        return name
+
+    def emit(self, depth, line):
+        self.lines.append('    ' * depth + line)
+
+    def gen(self, node):
+        body = []
+        self.lines, outer = body, self.lines
+        self.block(node.statements, 1)
+        self.lines = outer
+        self.emit(0, f'def {ENTRY}(write):')
+        for name, py in self.names.items():
+            self.emit(1, f'# {py} = {name}')
+        self.lines.extend(body)
+        pairs = ', '.join(f'{name!r}: {py!r}' for name, py in self.names.items())
+        # report whichever variables ended up bound, like the VM's memory dump
+        self.emit(1, 'env = locals()')
+        self.emit(1, f'return {{name: env[py] for name, py in {{{pairs}}}.items() if py in env}}')
+        return '\n'.join(self.lines) + '\n'
+
+    def block(self, stmts, depth):
+        if not stmts:
+            self.emit(depth, 'pass')
+        for s in stmts:
+            method = 'gen_' + s.__class__.__name__
+            if hasattr(self, method):
+                getattr(self, method)(s, depth)
+            else:
+                raise NotImplementedError(f'No Python gen for {s.__class__.__name__}')
+
+    def gen_Print(self, node, depth):
+        self.emit(depth, f'write({self.expr(node.expr)})')
+
+    def gen_Let(self, node, depth):
+        value = self.expr(node.expr)
+        self.emit(depth, f'{self.local(node.name)} = {value}')
+
+    def gen_Assign(self, node, depth):
+        value = self.expr(node.expr)
+        if isinstance(node.target, Var):
+            self.emit(depth, f'{self.local(node.target.name)} = {value}')
+        elif isinstance(node.target, Index):
+            arr = self.expr(node.target.array)
+            idx = self.expr(node.target.index)
+            self.emit(depth, f'{arr}[{idx}] = {value}')
+        else:
+            raise NotImplementedError('Unknown assign target')
+
+    def gen_If(self, node, depth):
+        self.emit(depth, f'if {self.cond(node.cond)}:')
+        self.block(node.then_block, depth + 1)
+        if node.else_block:
+            self.emit(depth, 'else:')
+            self.block(node.else_block, depth + 1)
+
+    def gen_While(self, node, depth):
+        self.emit(depth, f'while {self.cond(node.cond)}:')
+        self.block(node.body, depth + 1)
+
+    def gen_ForLoop(self, node, depth):
+        # साठी i = start ते end तर ... संपले
+        # same order as the IR: start, then end (evaluated once), then the
+        # counter is set
+        var = self.local(node.var)
+        first = self.new_temp()
+        end = self.new_temp()
+        self.emit(depth, f'{first} = {self.expr(node.start)}')
+        self.emit(depth, f'{end} = {self.expr(node.end)}')
+        if node.var in assigned_names(node.body):
+            self.emit(depth, f'{var} = {first}')
+            self.emit(depth, f'while {var} < {end}:')
+            self.block(node.body, depth + 1)
+            self.emit(depth + 1, f'{var} = {var} + 1')
+        else:
+            # nothing in the body touches the counter, so range() can drive
+            # it; afterwards the counter holds the value that failed the
+            # i < end test, as in the IR
+            self.emit(depth, f'for {var} in range({first}, {end}):')
+            self.block(node.body, depth + 1)
+            self.emit(depth, f'{var} = {end} if {end} > {first} else {first}')
+
+    def cond(self, expr):
+        # in a condition only truthiness matters, so skip the 1/0 conversion
+        if isinstance(expr, BinOp) and expr.op in COMPARE:
+            return f'{self.expr(expr.left)} {COMPARE[expr.op]} {self.expr(expr.right)}'
+        return self.expr(expr)
+
+    def expr(self, node):
+        if isinstance(node, Num):
+            return repr(node.value)
+        if isinstance(node, Str):
+            return repr(node.value)
+        if isinstance(node, Var):
+            return self.local(node.name)
+        if isinstance(node, ArrayLiteral):
+            return '[' + ', '.join(self.expr(e) for e in node.elements) + ']'
+        if isinstance(node, Index):
+            return f'{self.expr(node.array)}[{self.expr(node.index)}]'
+        if isinstance(node, BinOp):
+            l = self.expr(node.left)
+            r = self.expr(node.right)
+            if node.op in ARITH:
+                return f'({l} {ARITH[node.op]} {r})'
+            if node.op in COMPARE:
+                return f'(1 if {l} {COMPARE[node.op]} {r} else 0)'
+            if node.op == 'AND':
+                return f'_and({l}, {r})'
+            if node.op == 'OR':
+                return f'_or({l}, {r})'
+            raise NotImplementedError('Unknown binop ' + node.op)
+        raise NotImplementedError(f'No Python gen for {node.__class__.__name__}')
+
+
+def to_python(ast):
+    return PyGen().gen(ast)
+
+
+def compile_program(ast, filename='<marathi>'):
+    return compile(to_python(ast), filename, 'exec')
+
+
+def execute_python(code, write=print):
+    namespace = {'_and': _and, '_or': _or}
+    exec(code, namespace)
+    return namespace[ENTRY](write)
+
+
+if __name__ == '__main__':
+    s = 'बदलवा a = [1,2,3]\nसाठी i = 0 ते 3 तर\n    लिहा a[i] * 2\nसंपले\n'
+    print(to_python(parse_code(s)))
@@ -0,0 +1,114 @@
+import heapq
+from operator import itemgetter
+
+from irgen import DEF_POS, USE_POS, LIST_BUILDS
+from cfg import build_cfg, def_use, liveness
+
+# Temp recycling. IRGen hands out a fresh temp for every sub-expression, so
+# a linked program's register file (and the memory dump) grows with the
+# size of the source. allocate_temps() computes temp liveness over the CFG
+# and renames the temps so that ones whose live ranges don't overlap share
+# a name, and therefore a VM slot: t0 ... t(k-1) for k slots.
+#
+# This must run after the optimizer passes, which rely on every temp being
+# written exactly once.
+
+
+class TempAllocation:
+    def __init__(self, temps, slots, max_live):
+        self.temps = temps        # distinct temps before allocation
+        self.slots = slots        # temp names (slots) after
+        self.max_live = max_live  # most temps live at any one point
+
+    def __repr__(self):
+        return f'{self.temps} temps in {self.slots} slots (max {self.max_live} live)'
+
+
+def live_intervals(ir, refs=None):
+    # -> ({temp: (first ip, last ip)}, temps defined at their first ip, max live)
+    # An interval is the hull of every point where the temp is defined,
+    # read or live, so two disjoint intervals never hold values at once.
+    if refs is None:
+        refs = def_use(ir)
+    blocks = liveness(build_cfg(ir), refs)
+    first = {}
+    last = {}
+    defined_first = set()
+    for i, (d, uses) in enumerate(refs):
+        for u in uses:
+            if u not in first:
+                first[u] = i
+            last[u] = i
+        if d is not None:
+            if d not in first:
+                first[d] = i
+                defined_first.add(d)
+            last[d] = i
+
+    max_live = 0
+    for b in blocks:
+        if b.start == b.end:
+            continue
+        for t in b.live_in:
+            if b.start < first[t]:
+                first[t] = b.start
+                defined_first.discard(t)
+        for t in b.live_out:
+            if b.end - 1 > last[t]:
+                last[t] = b.end - 1
+        live = set(b.live_out)
+        for d, uses in reversed(refs[b.start:b.end]):
+            if d is not None:
+                # the value needs a slot at this point even if nobody reads it
+                if d in live:
+                    live.discard(d)
+                elif len(live) + 1 > max_live:
+                    max_live = len(live) + 1
+            if uses:
+                live.update(uses)
+                if len(live) > max_live:
+                    max_live = len(live)
+    return {t: (first[t], last[t]) for t in first}, defined_first, max_live
+
+
+def allocate_temps(ir):
+    # -> (renamed ir, TempAllocation)
+    refs = def_use(ir)
+    intervals, defined_first, max_live = live_intervals(ir, refs)
+    active = []   # heap of (last ip, slot)
+    free = []     # heap of released slots
+    mapping = {}
+    slots = 0
+    for t, (start, end) in sorted(intervals.items(), key=itemgetter(1)):
+        # every instruction reads its operands before writing its result,
+        # so a temp written at `start` may take a slot whose last read is there
+        while active and (active[0][0] < start or (active[0][0] == start and t in defined_first)):
+            heapq.heappush(free, heapq.heappop(active)[1])
+        if free:
+            slot = heapq.heappop(free)
+        else:
+            slot = slots
+            slots += 1
+        mapping[t] = f't{slot}'
+        heapq.heappush(active, (end, slot))
+
+    get = mapping.get
+    out = []
+    for ins, (d, uses) in zip(ir, refs):
+        if d is not None or uses:
+            # only the name operands: constants (even folded into binop_const
+            # or cmp_const_goto) may be strings that look like temps
+            op = ins[0]
+            positions = USE_POS.get(op, ())
+            pos = DEF_POS.get(op)
+            if pos is not None and pos not in positions:
+                positions += (pos,)
+            ins = list(ins)
+            for pos in positions:
+                if op in LIST_BUILDS and pos == 2:
+                    ins[pos] = [get(x, x) for x in ins[pos]]
+                else:
+                    ins[pos] = get(ins[pos], ins[pos])
+            ins = tuple(ins)
+        out.append(ins)
+    return out, TempAllocation(len(intervals), slots, max_live)
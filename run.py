@@ -1,183 +1,344 @@
 from lexer import tokenize
-from parser import parse_code
+from parser import Parser, parse_file
 from semantic import SemanticAnalyzer
 from irgen import IRGen
+from vm import link, execute
+from optimizer import optimize, RECYCLE_TEMPS_LEVEL
+from pybackend import to_python, execute_python
+from cache import CACHE_DIR_NAME, CompileCache, default_cache_dir
+from lineprof import execute_profiled
+from jit import execute_jit
+import argparse
+import os
 import sys
 
-def load_sample(path='sample.mr'):
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return ''
+# the bundled example, so `python run.py` works from any directory
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample.mr')
+
+# diagnostics that --dump can switch on; nothing but the program's own
+# output is printed by default
+DUMP_STAGES = ('source', 'tokens', 'ast', 'ir', 'python', 'mem', 'jit')
+
+# exit codes
+EXIT_OK = 0
+EXIT_COMPILE_ERROR = 1   # syntax or semantic errors
+EXIT_USAGE = 2           # bad arguments or missing file (argparse's code)
+
+
+class OutputWriter:
+    # buffered sink for लिहा: collects lines and writes them in blocks
+    # instead of one unbuffered print() per value
+    def __init__(self, stream, block_size=1 << 16):
+        self.stream = stream
+        self.block_size = block_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        line = f'{value}\n'
+        self.parts.append(line)
+        self.size += len(line)
+        if self.size >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts.clear()
+            self.size = 0
+        self.stream.flush()
+
+
+def read_source(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def compile_file(path):
+    # streaming pipeline: each top-level statement is analyzed and turned
+    # into IR as soon as the parser finishes it, then dropped. Its types
+    # are therefore annotated from that statement alone: variables it
+    # doesn't assign, and list elements, stay untyped (generic ops), and
+    # lists are never int arrays. compile_whole_file types the program as
+    # a whole, at the cost of holding its whole AST.
+    sem = SemanticAnalyzer()
+    gen = IRGen()
+    for stmt in parse_file(path):
+        sem.analyze(stmt)
+        if not sem.errors:
+            sem.annotate_types(stmt)
+            gen.gen(stmt)
+    return gen.code, sem.errors
+
+def compile_whole_file(path):
+    # -> (ir, errors), with every variable typed over the whole program
+    ast = Parser(tokenize(read_source(path))).parse()
+    sem = SemanticAnalyzer()
+    sem.analyze(ast)
+    if sem.errors:
+        return None, sem.errors
+    sem.annotate_types(ast)
+    return IRGen().gen(ast), []
+
+def compile_cached(path, opt, cache):
+    # a hit skips the whole front end; returns (program, errors, hit)
+    key = cache.key_for_file(path, opt)
+    program = cache.load(key)
+    if program is not None:
+        return program, [], True
+    # the entry is reused for every later run, so it gets the full typing
+    ir, errors = compile_whole_file(path)
+    if errors:
+        return None, errors, False
+    ir, _ = optimize(ir, opt)
+    program = link(ir, recycle_temps=opt >= RECYCLE_TEMPS_LEVEL)
+    cache.store(key, program)
+    return program, [], False
 
-def print_tokens(code):
+def print_semantic_errors(errors, file=sys.stderr):
+    print('--- SEMANTIC ERRORS ---', file=file)
+    for e in errors:
+        print(' -', e, file=file)
+
+def print_source(code):
+    print('--- SOURCE ---')
+    print(code)
+
+def print_tokens(tokens):
     print('--- TOKENS ---')
-    for t in tokenize(code):
+    for t in tokens:
         print(t)
 
+def print_ast(ast):
+    print('--- AST ---')
+    print(ast)
+
+def print_opt_report(level, report, temps=None):
+    print(f'--- OPTIMIZER (-O{level}) ---')
+    for name, removed in report:
+        print(f'{name}: {removed} instructions removed')
+    if temps is not None:
+        print(f'allocate_temps: {temps}')
+
 def print_ir(ir):
     print('--- IR ---')
     for instr in ir:
         print(instr)
 
-def interpret_ir(ir):
-    print('--- IR EXECUTION OUTPUT ---')
-    mem = {}   # variables and temps stored here
-    labels = {}
-    # first pass: collect labels -> index
-    for i, ins in enumerate(ir):
-        if ins[0] == 'label':
-            labels[ins[1]] = i
-    ip = 0
-    while ip < len(ir):
-        ins = ir[ip]
-        op = ins[0]
-        if op == 'const':
-            _, temp, val = ins
-            mem[temp] = val
-        elif op == 'const_str':
-            _, temp, val = ins
-            mem[temp] = val
-        elif op == 'const_list':
-            _, temp, elem_temps = ins
-            # resolve element values (either temp names or literals - we always store temps)
-            lst = []
-            for et in elem_temps:
-                val = mem.get(et, et)
-                if isinstance(val, str) and val in mem:
-                    val = mem[val]
-                lst.append(val)
-            mem[temp] = lst
-        elif op == 'binop':
-            _, t, bop, a, b = ins
-            # resolve operands (temp names or variable names or literal numbers)
-            av = mem.get(a, a)
-            bv = mem.get(b, b)
-            # if still a name and in mem, resolve
-            if isinstance(av, str) and av in mem:
-                av = mem[av]
-            if isinstance(bv, str) and bv in mem:
-                bv = mem[bv]
-            # arithmetic / comparisons
-            if bop == 'plus':
-                mem[t] = av + bv
-            elif bop == 'minus':
-                mem[t] = av - bv
-            elif bop == 'mul':
-                mem[t] = av * bv
-            elif bop == 'div':
-                # integer division
-                mem[t] = av // bv
-            elif bop == 'eq':
-                mem[t] = 1 if av == bv else 0
-            elif bop == 'ne':
-                mem[t] = 1 if av != bv else 0
-            elif bop == 'lt':
-                mem[t] = 1 if av < bv else 0
-            elif bop == 'gt':
-                mem[t] = 1 if av > bv else 0
-            elif bop == 'le':
-                mem[t] = 1 if av <= bv else 0
-            elif bop == 'ge':
-                mem[t] = 1 if av >= bv else 0
-            elif bop == 'mod':
-                mem[t] = av % bv
-            elif bop == 'pow':
-                mem[t] = av ** bv
-            elif bop == 'and':
-                mem[t] = 1 if av and bv else 0
-            elif bop == 'or':
-                mem[t] = 1 if av or bv else 0
-            else:
-                raise RuntimeError('Unknown binop ' + bop)
-        elif op == 'assign':
-            _, name, src = ins
-            # src may be temp or literal; resolvex
-            val = mem.get(src, src)
-            if isinstance(val, str) and val in mem:
-                val = mem[val]
-            mem[name] = val
-        elif op == 'index_get':
-            _, t, arr, idx = ins
-            arrv = mem.get(arr, arr)
-            if isinstance(arrv, str) and arrv in mem:
-                arrv = mem[arrv]
-            idxv = mem.get(idx, idx)
-            if isinstance(idxv, str) and idxv in mem:
-                idxv = mem[idxv]
-            # fetch element
-            mem[t] = arrv[idxv]
-        elif op == 'index_set':
-            _, arr, idx, src = ins
-            arrv = mem.get(arr, arr)
-            if isinstance(arrv, str) and arrv in mem:
-                arrv = mem[arrv]
-            idxv = mem.get(idx, idx)
-            if isinstance(idxv, str) and idxv in mem:
-                idxv = mem[idxv]
-            val = mem.get(src, src)
-            if isinstance(val, str) and val in mem:
-                val = mem[val]
-            # write into list in-place; ensure arr variable points to actual list
-            if isinstance(arrv, list):
-                arrv[idxv] = val
-                # if arr was a variable name, ensure mem stores updated list (already stored)
-            else:
-                raise RuntimeError('Indexing into non-list')
-        elif op == 'print':
-            _, src = ins
-            val = mem.get(src, src)
-            if isinstance(val, str) and val in mem:
-                val = mem[val]
-            print(val)
-        elif op == 'if_false_goto':
-            _, cond, label = ins
-            condv = mem.get(cond, cond)
-            if isinstance(condv, str) and condv in mem:
-                condv = mem[condv]
-            if not condv:
-                ip = labels[label]
-                continue
-        elif op == 'goto':
-            _, label = ins
-            ip = labels[label]
-            continue
-        # label does nothing at runtime
-        ip += 1
+def print_python(source):
+    print('--- PYTHON ---')
+    print(source)
+
+def print_memory(mem):
     print('--- MEMORY ---')
     print(mem)
 
-def main():
-    code = load_sample()
-    if not code:
-        print('No sample.mr found!')
-        sys.exit(1)
+def interpret_ir(ir, write=print):
+    # accepts raw IR or an already linked (or bytecode-mapped) program;
+    # returns the name -> value memory
+    program = link(ir) if isinstance(ir, list) else ir
+    regs = execute(program, write)
+    return program.memory(regs)
 
-    print('--- SOURCE ---')
-    print(code)
-    print()
+def jit_ir(ir, write=print):
+    # like interpret_ir, but hot loops run as compiled traces;
+    # returns (memory, [jit.Trace])
+    program = link(ir) if isinstance(ir, list) else ir
+    regs, traces = execute_jit(program, write)
+    return program.memory(regs), traces
 
-    # tokens (optional)
-    print_tokens(code)
+def print_traces(traces):
+    print('--- JIT ---')
+    if not traces:
+        print('(no loop got hot)')
+    for trace in traces:
+        print(f'# loop at ip {trace.header}: {len(trace.path)} instructions, '
+              f'{trace.entries} entries, {trace.guard_failures} failed entry guards')
+        print(trace.source)
 
-    ast = parse_code(code)
-    print('\n--- AST ---')
-    print(ast)
+def profile_ir(ir, write=print):
+    # like interpret_ir, but through the profiling run loop;
+    # returns (memory, LineProfile)
+    program = link(ir) if isinstance(ir, list) else ir
+    regs, profile = execute_profiled(program, write)
+    return program.memory(regs), profile
 
-    sem = SemanticAnalyzer()
-    sem.analyze(ast)
-    if sem.errors:
-        print('\n--- SEMANTIC ERRORS ---')
-        for e in sem.errors:
-            print(' -', e)
-        return
+def report_profile(profile, args):
+    try:
+        source_lines = read_source(args.path).splitlines()
+    except OSError:
+        source_lines = None
+    print(profile.format_table(source_lines))
+    if args.profile_json:
+        profile.save_json(args.profile_json)
+    if args.profile_folded:
+        profile.save_folded(args.profile_folded, os.path.basename(args.path))
 
-    print('\nNo semantic errors.')
-    gen = IRGen()
-    ir = gen.gen(ast)
-    print_ir(ir)
-    interpret_ir(ir)
+def interpret_python(source, write=print):
+    return execute_python(compile(source, '<marathi>', 'exec'), write)
+
+
+def parse_dump_stages(text):
+    # 'all' is expanded by main(), once the mode is known
+    stages = {s.strip() for s in text.split(',') if s.strip()}
+    if stages == {'all'}:
+        return stages
+    unknown = sorted(stages.difference(DUMP_STAGES))
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f'unknown stage {", ".join(unknown)} (choose from {", ".join(DUMP_STAGES)}, or all)')
+    return stages
+
+
+def compile_and_run(args, dumps, out):
+    path = args.path
+    write = out.write
+
+    def run_program(run):
+        if dumps:
+            print('--- OUTPUT ---')
+        try:
+            mem = run()
+        finally:
+            out.flush()
+        if 'mem' in dumps:
+            print_memory(mem)
+        return EXIT_OK
+
+    def run_vm(ir):
+        if args.jit:
+            compiled = []
+            def run():
+                mem, traces = jit_ir(ir, write)
+                compiled.extend(traces)
+                return mem
+            status = run_program(run)
+            if 'jit' in dumps:
+                print_traces(compiled)
+            return status
+        if not args.profile:
+            return run_program(lambda: interpret_ir(ir, write))
+        profiled = []
+        def run():
+            mem, profile = profile_ir(ir, write)
+            profiled.append(profile)
+            return mem
+        status = run_program(run)
+        report_profile(profiled[0], args)
+        return status
+
+    if args.cache:
+        cache = CompileCache(args.cache_dir or default_cache_dir(path))
+        program, errors, hit = compile_cached(path, args.opt, cache)
+        if errors:
+            print_semantic_errors(errors)
+            return EXIT_COMPILE_ERROR
+        return run_vm(program)
+
+    if args.stream:
+        ir, errors = compile_file(path)
+        if errors:
+            print_semantic_errors(errors)
+            return EXIT_COMPILE_ERROR
+    else:
+        code = read_source(path)
+        if 'source' in dumps:
+            print_source(code)
+
+        # tokenize once; the dump and the parser share the list
+        tokens = list(tokenize(code))
+        if 'tokens' in dumps:
+            print_tokens(tokens)
+
+        ast = Parser(tokens).parse()
+        if 'ast' in dumps:
+            print_ast(ast)
+
+        sem = SemanticAnalyzer()
+        sem.analyze(ast)
+        if sem.errors:
+            print_semantic_errors(sem.errors)
+            return EXIT_COMPILE_ERROR
+
+        if args.backend == 'python':
+            source = to_python(ast)
+            if 'python' in dumps:
+                print_python(source)
+            return run_program(lambda: interpret_python(source, write))
+
+        sem.annotate_types(ast)
+        ir = IRGen().gen(ast)
+
+    ir, report = optimize(ir, args.opt)
+    program = link(ir, recycle_temps=args.opt >= RECYCLE_TEMPS_LEVEL)
+    if 'ir' in dumps:
+        print_opt_report(args.opt, report, program.temps)
+        print_ir(ir)
+    return run_vm(program)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Run a Marathi program.')
+    ap.add_argument('path', nargs='?', default=DEFAULT_SOURCE,
+                    help='source file to run (default: the bundled sample.mr)')
+    ap.add_argument('--dump', metavar='STAGES', type=parse_dump_stages, default=set(),
+                    help=f'comma-separated diagnostics to print before running: {",".join(DUMP_STAGES)} or all (default: none)')
+    ap.add_argument('--backend', choices=('vm', 'python'), default='vm',
+                    help='vm: interpret the IR (default); python: compile the program to a Python code object and exec it')
+    ap.add_argument('-O', dest='opt', type=int, choices=(0, 1, 2, 3), default=1,
+                    help='IR optimization level: 0 none, 1 constant folding + dead temps (default), 2 also copy propagation and temp recycling, 3 also SSA-based global constant propagation and dead-code removal')
+    ap.add_argument('--stream', action='store_true',
+                    help='compile statement by statement without holding the source, tokens or AST in memory (vm backend only)')
+    ap.add_argument('--cache', action='store_true',
+                    help=f'reuse the linked program from an on-disk cache ({CACHE_DIR_NAME} next to the source) when neither the source nor the compiler changed (vm backend only)')
+    ap.add_argument('--cache-dir', metavar='DIR',
+                    help='cache directory to use instead of the default (implies --cache)')
+    ap.add_argument('--profile', action='store_true',
+                    help='count and time the executed instructions per source line and per loop, and print the hottest (vm backend only)')
+    ap.add_argument('--profile-json', metavar='FILE',
+                    help='also write the profile to FILE as JSON (implies --profile)')
+    ap.add_argument('--profile-folded', metavar='FILE',
+                    help='also write the profile to FILE as folded stacks for flame graph tools, in microseconds (implies --profile)')
+    ap.add_argument('--jit', action='store_true',
+                    help='compile hot loops to Python functions while running (vm backend only)')
+    args = ap.parse_args(argv)
+    dumps = args.dump
+    if args.cache_dir:
+        args.cache = True
+    if args.profile_json or args.profile_folded:
+        args.profile = True
+    if (args.stream or args.cache or args.profile or args.jit) and args.backend != 'vm':
+        ap.error('--stream, --cache, --profile and --jit need the vm backend')
+    if args.jit and args.profile:
+        ap.error('--jit and --profile cannot be combined')
+    if dumps == {'all'}:
+        if args.cache:
+            dumps = {'mem', 'jit'}
+        elif args.stream:
+            dumps = {'ir', 'mem', 'jit'}
+        else:
+            dumps = set(DUMP_STAGES) - {'ir' if args.backend == 'python' else 'python'}
+        if not args.jit:
+            dumps.discard('jit')
+    if args.stream and dumps & {'source', 'tokens', 'ast'}:
+        ap.error('--stream can only dump ir, mem and jit')
+    if args.cache and dumps - {'mem', 'jit'}:
+        ap.error('--cache can only dump mem and jit')
+    if 'jit' in dumps and not args.jit:
+        ap.error('--dump jit needs --jit')
+    if 'python' in dumps and args.backend != 'python':
+        ap.error('--dump python needs --backend python')
+    if 'ir' in dumps and args.backend == 'python':
+        ap.error('the python backend has no IR to dump')
+    if not os.path.isfile(args.path):
+        ap.error(f'no such file: {args.path}')
+
+    out = OutputWriter(sys.stdout)
+    try:
+        return compile_and_run(args, dumps, out)
+    except SyntaxError as e:
+        out.flush()
+        print(f'{args.path}: {e}', file=sys.stderr)
+        return EXIT_COMPILE_ERROR
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -1,31 +1,68 @@
+from collections import deque
+
 from parser import *
 
+# annotate_types() lattice: None is "no value seen yet", ANY "more than one type"
+ANY = 'any'
+# key for the element type all lists share in annotate_types()
+ELEMENTS = '[]'
+# operators whose result is 1 or 0 whatever the operands
+TRUTH_OPS = ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE', 'AND', 'OR')
+# operand types of [x] * n, a list of n copies of x's elements
+LIST_REPEAT = (('list', 'int'), ('int', 'list'))
+
+def join_type(a, b):
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    return ANY
+
 class SemanticAnalyzer:
+    # Statements are visited with an explicit work stack, so deeply nested
+    # जर/जोपर्यंत blocks can't overflow Python's stack. Each analyze_X
+    # handler checks its own node and returns the child statements still
+    # to visit; the handlers are looked up in a per-class table built once.
+    _dispatch_tables = {}
+
     def __init__(self):
         self.symbols = {}  # name -> type ('int' or 'str' or 'list')
         self.errors = []
+        self.dispatch = self.dispatch_table()
+
+    @classmethod
+    def dispatch_table(cls):
+        table = SemanticAnalyzer._dispatch_tables.get(cls)
+        if table is None:
+            table = {}
+            for node_cls in ASTNode.__subclasses__():
+                method = getattr(cls, 'analyze_' + node_cls.__name__, None)
+                if method is not None:
+                    table[node_cls] = method
+            SemanticAnalyzer._dispatch_tables[cls] = table
+        return table
 
     def analyze(self, node):
-        method = 'analyze_' + node.__class__.__name__
-        if hasattr(self, method):
-            return getattr(self, method)(node)
-        else:
-            # generic traversal
-            for child in getattr(node, '__dict__', {}).values():
-                if isinstance(child, list):
-                    for c in child:
-                        if isinstance(c, ASTNode):
-                            self.analyze(c)
-                elif isinstance(child, ASTNode):
-                    self.analyze(child)
+        dispatch = self.dispatch
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            handler = dispatch.get(node.__class__)
+            if handler is not None:
+                children = handler(self, node)
+            else:
+                # generic traversal
+                children = list(iter_child_nodes(node))
+            if children:
+                # reversed, so children are visited in source order
+                stack.extend(reversed(children))
 
     def analyze_Program(self, node):
-        for s in node.statements:
-            self.analyze(s)
+        return node.statements
 
     def analyze_Let(self, node):
         t = self.evaluate_type(node.expr)
-        
+
         self.symbols[node.name] = t or 'int'
 
     def analyze_Print(self, node):
@@ -57,79 +94,267 @@ class SemanticAnalyzer:
         cond_t = self.evaluate_type(node.cond)
         if cond_t != 'int':
             self.errors.append('Condition in IF must be numeric (int)')
-        for s in node.then_block:
-            self.analyze(s)
         if node.else_block:
-            for s in node.else_block:
-                self.analyze(s)
+            return node.then_block + node.else_block
+        return node.then_block
 
     def analyze_While(self, node):
         cond_t = self.evaluate_type(node.cond)
         if cond_t != 'int':
             self.errors.append('Condition in WHILE must be numeric (0=false, non-zero=true)')
-        for s in node.body:
-            self.analyze(s)
-    
-        def analyze_ForLoop(self, node):
-            # ensure loop variable exists
-            if node.var not in self.symbols:
-                self.symbols[node.var] = 'int'
-            start_t = self.evaluate_type(node.start)
-            end_t = self.evaluate_type(node.end)
-            if start_t != 'int' or end_t != 'int':
-                self.errors.append('For-loop range must be integers')
-            for s in node.body:
-                self.analyze(s)
+        return node.body
 
+    def analyze_ForLoop(self, node):
+        # ensure loop variable exists
+        if node.var not in self.symbols:
+            self.symbols[node.var] = 'int'
+        start_t = self.evaluate_type(node.start)
+        end_t = self.evaluate_type(node.end)
+        if start_t != 'int' or end_t != 'int':
+            self.errors.append('For-loop range must be integers')
+        return node.body
 
     def evaluate_type(self, expr):
-        if isinstance(expr, Num):
-            return 'int'
-        if isinstance(expr, Str):
-            return 'str'
-        if isinstance(expr, Var):
-            if expr.name not in self.symbols:
-                self.errors.append(f'Use of undeclared variable {expr.name}')
-                return None
-            return self.symbols[expr.name]
-        if isinstance(expr, ArrayLiteral):
-            # ensure all elements have type and are same (we'll allow ints/strs, prefer int->list)
-            elem_types = []
-            for e in expr.elements:
-                et = self.evaluate_type(e)
-                elem_types.append(et)
-            # if any None, return None
-            if any(t is None for t in elem_types):
-                return None
-            # simple policy: if all int -> list of int, else list
-            if all(t == 'int' for t in elem_types):
-                return 'list'
+        # post-order walk with explicit stacks: an operator node is pushed
+        # as (node,) to combine its operands' types once they are on the
+        # types stack. Leaves are typed on the spot, in the same
+        # left-to-right order (and so with the same error order) as a
+        # recursive walk.
+        symbols = self.symbols
+        types = []
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            cls = node.__class__
+            if cls is Num:
+                types.append('int')
+            elif cls is Var:
+                t = symbols.get(node.name)
+                if t is None:
+                    self.errors.append(f'Use of undeclared variable {node.name}')
+                types.append(t)
+            elif cls is BinOp:
+                left = node.left
+                right = node.right
+                if left.__class__ is Num and right.__class__ is Num:
+                    types.append('int')
+                else:
+                    stack.append((node,))
+                    stack.append(right)
+                    stack.append(left)
+            elif cls is tuple:
+                node = node[0]
+                cls = node.__class__
+                if cls is BinOp:
+                    rt = types.pop()
+                    if rt != 'int' or types[-1] != 'int':
+                        # int op int is int for every operator
+                        types[-1] = self.binop_type(node.op, types[-1], rt)
+                elif cls is Index:
+                    idx_t = types.pop()
+                    types[-1] = self.index_type(types[-1], idx_t)
+                else:
+                    # ArrayLiteral: if any element type is unknown, so is the list
+                    n = len(node.elements)
+                    elem_types = types[len(types) - n:]
+                    del types[len(types) - n:]
+                    types.append(None if None in elem_types else 'list')
+            elif cls is Index:
+                stack.append((node,))
+                stack.append(node.index)
+                stack.append(node.array)
+            elif cls is Str:
+                types.append('str')
+            elif cls is ArrayLiteral:
+                stack.append((node,))
+                stack.extend(reversed(node.elements))
             else:
-                return 'list'
-        if isinstance(expr, Index):
-            arr_t = self.evaluate_type(expr.array)
-            idx_t = self.evaluate_type(expr.index)
-            if arr_t != 'list':
-                self.errors.append('Indexing non-list value')
-                return None
-            if idx_t != 'int':
-                self.errors.append('List index must be integer')
-                return None
-            # element type unknown => return int or str? we assume int for arithmetic
-            # return 'int' to allow arithmetic on elements that are ints
+                types.append(None)
+        return types[0]
+
+    def annotate_types(self, root):
+        # Sets .type on every expression node to a type that holds on every
+        # execution, for IRGen to specialize on; call it after analyze()
+        # found no errors. evaluate_type() follows source order, so inside a
+        # loop a variable may still hold the type of a later assignment;
+        # here a variable's type is instead the join over all its
+        # assignments, and every list shares one element type (lists alias,
+        # and index stores can write anything into them). The joins are
+        # iterated until nothing changes.
+        sites = []   # (post-order nodes of expr, variable it is assigned to / ELEMENTS / None)
+        readers = {}  # variable / ELEMENTS -> indices of the sites that read it
+        makes_lists = []  # ArrayLiterals, and MUL BinOps that may be [x] * n
+        types = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            cls = node.__class__
+            if cls is Program:
+                stack.extend(reversed(node.statements))
+            elif cls is Let:
+                self.add_site(sites, readers, makes_lists, node.expr, node.name)
+            elif cls is Assign:
+                if node.target.__class__ is Var:
+                    self.add_site(sites, readers, makes_lists, node.expr, node.target.name)
+                else:
+                    self.add_site(sites, readers, makes_lists, node.target, None)
+                    self.add_site(sites, readers, makes_lists, node.expr, ELEMENTS)
+            elif cls is Print:
+                self.add_site(sites, readers, makes_lists, node.expr, None)
+            elif cls is If:
+                self.add_site(sites, readers, makes_lists, node.cond, None)
+                stack.extend(reversed(node.else_block or []))
+                stack.extend(reversed(node.then_block))
+            elif cls is While:
+                self.add_site(sites, readers, makes_lists, node.cond, None)
+                stack.extend(reversed(node.body))
+            elif cls is ForLoop:
+                types[node.var] = 'int'  # for_next stores var + 1
+                self.add_site(sites, readers, makes_lists, node.start, node.var)
+                self.add_site(sites, readers, makes_lists, node.end, None)
+                stack.extend(reversed(node.body))
+
+        # every site is typed once in source order; after that only the
+        # sites that read a type that changed are typed again
+        queue = deque(range(len(sites)))
+        queued = [True] * len(sites)
+        while queue:
+            i = queue.popleft()
+            queued[i] = False
+            nodes, target = sites[i]
+            elements = types.get(ELEMENTS)
+            t = self.expr_type(nodes, types)
+            changed = []
+            if types.get(ELEMENTS) != elements:
+                changed.append(ELEMENTS)
+            if target is not None:
+                old = types.get(target)
+                new = join_type(old, t)
+                if new != old:
+                    types[target] = new
+                    changed.append(target)
+            for name in changed:
+                for j in readers.get(name, ()):
+                    if not queued[j]:
+                        queued[j] = True
+                        queue.append(j)
+
+        # Lists may be stored as int arrays (vm.IntArrays) only if every list
+        # element of the whole program is an int (None: no element is ever
+        # stored); a lone statement, as run.compile_file analyzes them,
+        # doesn't see what the others store into its lists. An array takes 8
+        # bytes per element instead of a pointer and an int object, but
+        # CPython indexes lists faster, so only programs that allocate with
+        # [x] * n, whose lists grow with the data rather than the source, use them.
+        if root.__class__ is Program and types.get(ELEMENTS) in (None, 'int'):
+            if any(node.type == 'list' for node in makes_lists if node.__class__ is BinOp):
+                for node in makes_lists:
+                    if node.__class__ is ArrayLiteral:
+                        node.element_type = 'int'
+
+    def add_site(self, sites, readers, makes_lists, expr, target):
+        # annotate_types() helper: flattens expr into post-order once, so
+        # typing it again is a loop over a list rather than a tree walk
+        nodes = []
+        index = len(sites)
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            cls = node.__class__
+            if cls is BinOp:
+                stack.append(node.left)
+                stack.append(node.right)
+                if node.op == 'MUL':
+                    makes_lists.append(node)
+            elif cls is Index:
+                stack.append(node.array)
+                stack.append(node.index)
+                readers.setdefault(ELEMENTS, set()).add(index)
+            elif cls is ArrayLiteral:
+                stack.extend(node.elements)
+                makes_lists.append(node)
+            elif cls is Var:
+                readers.setdefault(node.name, set()).add(index)
+        # children were pushed right to left, so this is reverse post-order
+        nodes.reverse()
+        sites.append((nodes, target))
+
+    def expr_type(self, nodes, types):
+        # annotate_types() helper: types a flattened expression bottom-up
+        # with the current variable types and records each node's type on
+        # it (ANY as None)
+        out = []
+        for node in nodes:
+            cls = node.__class__
+            if cls is BinOp:
+                rt = out.pop()
+                lt = out.pop()
+                if node.op in TRUTH_OPS:
+                    t = 'int'
+                elif lt == 'int' and rt == 'int' and (node.op != 'POW' or node.right.__class__ is Num):
+                    # int ^ int is a float for negative exponents, and
+                    # literals can't be negative
+                    t = 'int'
+                elif node.op == 'MUL' and (lt, rt) in LIST_REPEAT:
+                    t = 'list'
+                elif lt is None or rt is None:
+                    t = None
+                else:
+                    t = ANY
+            elif cls is Index:
+                it = out.pop()
+                at = out.pop()
+                if at == 'list' and it == 'int':
+                    t = types.get(ELEMENTS)
+                elif at is None or it is None:
+                    t = None
+                else:
+                    t = ANY
+            elif cls is ArrayLiteral:
+                n = len(node.elements)
+                elements = types.get(ELEMENTS)
+                for et in out[len(out) - n:]:
+                    elements = join_type(elements, et)
+                del out[len(out) - n:]
+                if elements is not None:
+                    types[ELEMENTS] = elements
+                t = 'list'
+            elif cls is Num:
+                t = 'int'
+            elif cls is Var:
+                t = types.get(node.name)
+            elif cls is Str:
+                t = 'str'
+            else:
+                t = ANY
+            node.type = t if t != ANY else None
+            out.append(t)
+        return out[-1]
+
+    def index_type(self, arr_t, idx_t):
+        if arr_t != 'list':
+            self.errors.append('Indexing non-list value')
+            return None
+        if idx_t != 'int':
+            self.errors.append('List index must be integer')
+            return None
+        # element type unknown => return int or str? we assume int for arithmetic
+        # return 'int' to allow arithmetic on elements that are ints
+        return 'int'
+
+    def binop_type(self, op, lt, rt):
+        if lt is None or rt is None:
+            return None
+        if op in ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE'):
+            return 'int'
+        if lt == 'int' and rt == 'int':
             return 'int'
-        if isinstance(expr, BinOp):
-            lt = self.evaluate_type(expr.left)
-            rt = self.evaluate_type(expr.right)
-            if lt is None or rt is None:
-                return None
-            if expr.op in ('EQ', 'NE', 'LT', 'GT', 'LE', 'GE'):
-                return 'int'
-            if lt == 'int' and rt == 'int':
-                return 'int'
-            if lt == 'str' or rt == 'str':
-                self.errors.append('Type error: arithmetic on strings')
-                return None
+        if op == 'MUL' and (lt, rt) in LIST_REPEAT:
+            return 'list'
+        if lt == 'str' or rt == 'str':
+            self.errors.append('Type error: arithmetic on strings')
+            return None
         return None
 
 if __name__ == '__main__':
@@ -0,0 +1,1210 @@
+from collections import Counter
+
+from irgen import DEF_POS, USE_POS, PURE_OPS, LIST_BUILDS, cannot_raise, is_temp
+from cfg import JUMP_TARGET, build_cfg, def_use, liveness
+from vm import ARITH_OPS, TRUTH_OPS
+
+# SSA middle end for IRGen output.
+#
+# build_ssa() keeps the reachable blocks of cfg.build_cfg and renames every
+# name, variable or temp, so that each version is written by exactly one
+# instruction (x -> x.1, x.2, ...; a read with no reaching write gets x.0).
+# Where versions meet, a block starts with phi nodes; they are placed on
+# the iterated dominance frontier of the writes, and only where the name is
+# live. The SSA also carries the dominator tree and the loop nest.
+#
+# The passes here never give two versions of one name overlapping
+# lifetimes (they fold, delete and rewrite instructions in place, move
+# only temps that have a single version, and do no copy propagation), so
+# the SSA stays conventional and to_ir() lowers it by dropping the phis and
+# the version suffixes, without inserting copies.
+# for_next both reads and writes its variable: in SSA form the version it
+# reads is appended as a fifth operand, and dropped again by to_ir().
+
+
+def fold_binop(bop, a, b):
+    # evaluate with the VM's own operator tables; None means "leave it to runtime"
+    if bop == 'pow' and isinstance(b, int) and b > 64:
+        return None  # don't bake huge numbers into the constant pool
+    try:
+        if bop in ARITH_OPS:
+            return ARITH_OPS[bop](a, b)
+        return 1 if TRUTH_OPS[bop](a, b) else 0
+    except Exception:
+        # division by zero, str - int, ... must still fail at runtime
+        return None
+
+
+class Phi:
+    __slots__ = ('name', 'dst', 'args')
+
+    def __init__(self, name, n_preds):
+        self.name = name              # IR name
+        self.dst = None               # version written
+        self.args = [None] * n_preds  # version flowing in from block.preds[i]
+
+    def __repr__(self):
+        return f'{self.dst} = phi({", ".join(map(str, self.args))})'
+
+
+class SSABlock:
+    __slots__ = ('index', 'labels', 'phis', 'code', 'succs', 'preds', 'live_in',
+                 'idom', 'children', 'frontier', 'loop')
+
+    def __init__(self, index):
+        self.index = index
+        self.labels = []    # the block's label instructions
+        self.phis = []
+        self.code = []      # everything else, ending with the jump if there is one
+        self.succs = []
+        self.preds = []
+        self.live_in = set()
+        self.idom = None    # immediate dominator (None for the entry)
+        self.children = []  # blocks it immediately dominates
+        self.frontier = []  # dominance frontier
+        self.loop = None    # innermost Loop containing it
+
+    def jump(self):
+        # the instruction ending the block, if it is a jump
+        if self.code and self.code[-1][0] in JUMP_TARGET:
+            return self.code[-1]
+        return None
+
+    def __repr__(self):
+        return f'SSABlock({self.index}, succs={[b.index for b in self.succs]})'
+
+
+class Loop:
+    __slots__ = ('header', 'blocks', 'latches', 'parent', 'children', 'depth')
+
+    def __init__(self, header):
+        self.header = header
+        self.blocks = {header}  # the natural loop of every back edge into header
+        self.latches = []       # sources of those back edges
+        self.parent = None
+        self.children = []
+        self.depth = 1
+
+    def __repr__(self):
+        return f'Loop(header={self.header.index}, {len(self.blocks)} blocks, depth {self.depth})'
+
+
+def ssa_uses(ins):
+    # positions of the names ins reads
+    if ins[0] == 'for_next':
+        return (4, 2)
+    return USE_POS.get(ins[0], ())
+
+
+def ssa_reads(ins):
+    # the names ins reads, in SSA form
+    names = []
+    for pos in ssa_uses(ins):
+        if ins[0] in LIST_BUILDS:
+            names.extend(ins[pos])
+        else:
+            names.append(ins[pos])
+    return names
+
+
+def rename_uses(ins, rename, positions=None):
+    # ins with every name it reads looked up in rename (a function);
+    # positions defaults to the SSA form's
+    op = ins[0]
+    if positions is None:
+        positions = ssa_uses(ins)
+    if not positions:
+        return ins
+    ins = list(ins)
+    for pos in positions:
+        if op in LIST_BUILDS:
+            ins[pos] = tuple(rename(u) for u in ins[pos])
+        else:
+            ins[pos] = rename(ins[pos])
+    return tuple(ins)
+
+
+class SSA:
+    def __init__(self, blocks, label_block, origin):
+        self.blocks = blocks            # in IR order; blocks[0] is the entry
+        self.label_block = label_block  # label -> SSABlock
+        self.origin = origin            # version -> IR name
+        self.order = []                 # reverse postorder
+        self.loops = []                 # innermost first
+
+    def fallthrough(self, block):
+        i = block.index + 1
+        return self.blocks[i] if i < len(self.blocks) else None
+
+    def remove_edge(self, a, b):
+        j = b.preds.index(a)
+        del b.preds[j]
+        for phi in b.phis:
+            del phi.args[j]
+        a.succs.remove(b)
+
+    def update_edges(self):
+        # after jumps were folded or removed: drop the edges they can no
+        # longer take, then the blocks nothing reaches any more, and redo
+        # the dominators and loops
+        for b in self.blocks:
+            jump = b.jump()
+            succs = []
+            if jump is not None:
+                succs.append(self.label_block[jump[JUMP_TARGET[jump[0]]]])
+            if jump is None or jump[0] != 'goto':
+                nxt = self.fallthrough(b)
+                if nxt is not None:
+                    succs.append(nxt)
+            for s in list(b.succs):
+                if s not in succs:
+                    self.remove_edge(b, s)
+        reached = {self.blocks[0]} if self.blocks else set()
+        work = list(reached)
+        while work:
+            for s in work.pop().succs:
+                if s not in reached:
+                    reached.add(s)
+                    work.append(s)
+        if len(reached) < len(self.blocks):
+            for b in self.blocks:
+                if b not in reached:
+                    for s in list(b.succs):
+                        self.remove_edge(b, s)
+            self.blocks = [b for b in self.blocks if b in reached]
+            for i, b in enumerate(self.blocks):
+                b.index = i
+            self.label_block = {label: b for label, b in self.label_block.items() if b in reached}
+        self.analyze()
+
+    def analyze(self):
+        compute_dominators(self)
+        find_loops(self)
+
+    def new_version(self, name):
+        k = 1
+        while f'{name}.{k}' in self.origin:
+            k += 1
+        version = f'{name}.{k}'
+        self.origin[version] = name
+        return version
+
+    def dominates(self, a, b):
+        while b is not None:
+            if b is a:
+                return True
+            b = b.idom
+        return False
+
+    def defs(self):
+        # version -> SSABlock writing it
+        where = {}
+        for b in self.blocks:
+            for phi in b.phis:
+                where[phi.dst] = b
+            for ins in b.code:
+                pos = DEF_POS.get(ins[0])
+                if pos is not None:
+                    where[ins[pos]] = b
+        return where
+
+    def to_ir(self):
+        origin = self.origin
+
+        def name(version):
+            return origin.get(version, version)
+
+        out = []
+        for b in self.blocks:
+            out.extend(b.labels)
+            for ins in b.code:
+                ins = rename_uses(ins, name)
+                pos = DEF_POS.get(ins[0])
+                if pos is not None:
+                    ins = ins[:pos] + (name(ins[pos]),) + ins[pos + 1:]
+                if ins[0] == 'for_next':
+                    ins = ins[:4]
+                out.append(ins)
+        return out
+
+    def format(self):
+        lines = []
+        for b in self.blocks:
+            head = f'block {b.index}'
+            if b.labels:
+                head += ' (' + ', '.join(ins[1] for ins in b.labels) + ')'
+            head += f' preds={[p.index for p in b.preds]} idom={b.idom.index if b.idom else None}'
+            if b.loop is not None:
+                head += f' loop={b.loop.header.index} depth={b.loop.depth}'
+            lines.append(head)
+            lines += [f'    {phi!r}' for phi in b.phis]
+            lines += [f'    {ins}' for ins in b.code if ins[0] != 'line']
+        return '\n'.join(lines)
+
+
+def build_ssa(ir):
+    cfg_blocks = build_cfg(ir)
+    if not cfg_blocks:
+        return SSA([], {}, {})
+    liveness(cfg_blocks, def_use(ir, track=lambda name: True))
+
+    reachable = {0}
+    work = [cfg_blocks[0]]
+    while work:
+        for s in work.pop().succs:
+            if s.index not in reachable:
+                reachable.add(s.index)
+                work.append(s)
+
+    blocks = []
+    by_cfg = {}
+    label_block = {}
+    for cb in cfg_blocks:
+        if cb.index not in reachable:
+            continue
+        b = SSABlock(len(blocks))
+        for ins in ir[cb.start:cb.end]:
+            if ins[0] == 'label':
+                b.labels.append(ins)
+                label_block[ins[1]] = b
+            else:
+                b.code.append(ins)
+        b.live_in = cb.live_in
+        by_cfg[cb.index] = b
+        blocks.append(b)
+    for cb in cfg_blocks:
+        if cb.index in reachable:
+            b = by_cfg[cb.index]
+            b.succs = [by_cfg[s.index] for s in cb.succs]
+            b.preds = [by_cfg[p.index] for p in cb.preds if p.index in reachable]
+
+    ssa = SSA(blocks, label_block, {})
+    compute_dominators(ssa)
+    _place_phis(ssa)
+    _rename(ssa)
+    find_loops(ssa)
+    return ssa
+
+
+def compute_dominators(ssa):
+    # Cooper, Harvey and Kennedy's iterative algorithm over reverse postorder
+    blocks = ssa.blocks
+    for b in blocks:
+        b.idom = None
+        b.children = []
+        b.frontier = []
+    if not blocks:
+        ssa.order = []
+        return
+    entry = blocks[0]
+    order = []
+    seen = {entry}
+    stack = [(entry, iter(entry.succs))]
+    while stack:
+        b, succs = stack[-1]
+        for s in succs:
+            if s not in seen:
+                seen.add(s)
+                stack.append((s, iter(s.succs)))
+                break
+        else:
+            order.append(b)
+            stack.pop()
+    order.reverse()
+    ssa.order = order
+    rpo = {b: i for i, b in enumerate(order)}
+
+    idom = {entry: entry}
+    changed = True
+    while changed:
+        changed = False
+        for b in order[1:]:
+            new = None
+            for p in b.preds:
+                if p not in idom:
+                    continue
+                if new is None:
+                    new = p
+                    continue
+                a = p
+                while a is not new:
+                    while rpo[a] > rpo[new]:
+                        a = idom[a]
+                    while rpo[new] > rpo[a]:
+                        new = idom[new]
+            if idom.get(b) is not new:
+                idom[b] = new
+                changed = True
+    for b in order[1:]:
+        b.idom = idom[b]
+        b.idom.children.append(b)
+    for b in order:
+        b.children.sort(key=lambda c: c.index)
+        if len(b.preds) < 2:
+            continue
+        for p in b.preds:
+            runner = p
+            while runner is not b.idom and runner is not None:
+                if b not in runner.frontier:
+                    runner.frontier.append(b)
+                runner = runner.idom
+
+
+def _place_phis(ssa):
+    sites = {}  # name -> blocks writing it
+    for b in ssa.blocks:
+        for ins in b.code:
+            pos = DEF_POS.get(ins[0])
+            if pos is not None:
+                written = sites.setdefault(ins[pos], [])
+                if not written or written[-1] is not b:
+                    written.append(b)
+    for name, written in sites.items():
+        # the iterated dominance frontier of the writes; a phi only where
+        # the name is live
+        in_frontier = set()
+        work = list(written)
+        while work:
+            for y in work.pop().frontier:
+                if y in in_frontier:
+                    continue
+                in_frontier.add(y)
+                if name in y.live_in:
+                    y.phis.append(Phi(name, len(y.preds)))
+                work.append(y)
+
+
+def _rename(ssa):
+    origin = ssa.origin
+    counter = {}
+    stacks = {}
+
+    def new_version(name):
+        k = counter.get(name, 0) + 1
+        counter[name] = k
+        version = f'{name}.{k}'
+        origin[version] = name
+        stacks.setdefault(name, []).append(version)
+        return version
+
+    def current(name):
+        stack = stacks.get(name)
+        if stack:
+            return stack[-1]
+        version = name + '.0'
+        origin[version] = name
+        return version
+
+    # walk the dominator tree; a ('done', block, names) entry pops the
+    # versions the block pushed once its subtree is finished
+    work = [ssa.blocks[0]] if ssa.blocks else []
+    while work:
+        b = work.pop()
+        if b.__class__ is tuple:
+            for name in b[1]:
+                stacks[name].pop()
+            continue
+        pushed = []
+        for phi in b.phis:
+            phi.dst = new_version(phi.name)
+            pushed.append(phi.name)
+        code = []
+        for ins in b.code:
+            op = ins[0]
+            read = ins[1] if op == 'for_next' else None
+            ins = rename_uses(ins, current, USE_POS.get(op, ()))
+            pos = DEF_POS.get(op)
+            if pos is not None:
+                name = read if read is not None else ins[pos]
+                version = new_version(name)
+                pushed.append(name)
+                if op == 'for_next':
+                    ins = (op, version, ins[2], ins[3], ins[1])
+                else:
+                    ins = ins[:pos] + (version,) + ins[pos + 1:]
+            code.append(ins)
+        b.code = code
+        for s in b.succs:
+            j = s.preds.index(b)
+            for phi in s.phis:
+                phi.args[j] = current(phi.name)
+        work.append(('done', pushed))
+        work.extend(reversed(b.children))
+
+
+def find_loops(ssa):
+    # natural loops: an edge b -> h is a back edge when h dominates b
+    loops = {}
+    for b in ssa.order:
+        for h in b.succs:
+            if ssa.dominates(h, b):
+                loop = loops.get(h)
+                if loop is None:
+                    loop = loops[h] = Loop(h)
+                loop.latches.append(b)
+                work = [b]
+                while work:
+                    x = work.pop()
+                    if x not in loop.blocks:
+                        loop.blocks.add(x)
+                        work.extend(x.preds)
+    ordered = sorted(loops.values(), key=lambda loop: len(loop.blocks))
+    for b in ssa.blocks:
+        b.loop = None
+    for i, loop in enumerate(ordered):
+        for outer in ordered[i + 1:]:
+            if loop.header in outer.blocks:
+                loop.parent = outer
+                outer.children.append(loop)
+                break
+        for b in loop.blocks:
+            if b.loop is None:
+                b.loop = loop
+    for loop in reversed(ordered):
+        loop.depth = loop.parent.depth + 1 if loop.parent is not None else 1
+    ssa.loops = ordered
+
+
+# Sparse conditional constant propagation (Wegman and Zadeck): a value is
+# UNDEF until something reaches it, a constant, or VARYING; only blocks
+# reached over edges whose branch can go that way are evaluated, so a
+# constant that decides a जर / जोपर्यंत condition removes the other side,
+# and values merged at a phi stay constant when only one side is live.
+
+UNDEF = object()
+VARYING = object()
+
+
+def _meet(a, b):
+    if a is UNDEF:
+        return b
+    if b is UNDEF or a is b:
+        return a
+    if a is VARYING or b is VARYING:
+        return VARYING
+    return a if type(a) is type(b) and a == b else VARYING
+
+
+def _binop_value(bop, a, b):
+    if a is VARYING or b is VARYING:
+        return VARYING
+    if a is UNDEF or b is UNDEF:
+        return UNDEF
+    val = fold_binop(bop, a, b)
+    return VARYING if val is None else val
+
+
+def _branch(ins, value):
+    # -> (may fall through, may jump) for the jump ending a block
+    op = ins[0]
+    if op == 'goto':
+        return False, True
+    if op == 'if_false_goto':
+        cond = value(ins[1])
+    elif op == 'int_cmp_goto' or op == 'cmp_goto':
+        cond = _binop_value(ins[1], value(ins[2]), value(ins[3]))
+    elif op == 'cmp_const_goto':
+        cond = _binop_value(ins[1], value(ins[2]), ins[3])
+    elif op == 'for_range':
+        cond = _binop_value('lt', value(ins[1]), value(ins[2]))
+    else:
+        return True, True  # for_next
+    if cond is UNDEF:
+        return False, False
+    if cond is VARYING:
+        return True, True
+    return bool(cond), not cond
+
+
+def propagate_constants(ssa):
+    # -> number of instructions folded or removed
+    values = {}
+    defined = set(ssa.defs())
+
+    def value(name):
+        if name not in defined:
+            return VARYING  # x.0: read before any write, None at runtime
+        return values.get(name, UNDEF)
+
+    def evaluate(ins):
+        op = ins[0]
+        if op == 'const' or op == 'const_str':
+            return ins[2]
+        if op == 'binop' or op == 'int_binop':
+            return _binop_value(ins[2], value(ins[3]), value(ins[4]))
+        if op == 'binop_const':
+            return _binop_value(ins[2], value(ins[3]), ins[4])
+        if op == 'assign':
+            return value(ins[2])
+        return VARYING
+
+    live_edges = set()   # (pred, succ) that can be taken
+    reached = set()
+    if ssa.blocks:
+        reached.add(ssa.blocks[0])
+    changed = True
+    while changed:
+        changed = False
+        for b in ssa.order:
+            if b not in reached:
+                continue
+            for phi in b.phis:
+                val = UNDEF
+                for p, arg in zip(b.preds, phi.args):
+                    if (p, b) in live_edges:
+                        val = _meet(val, value(arg))
+                old = values.get(phi.dst, UNDEF)
+                new = _meet(old, val)
+                if new is not old:
+                    values[phi.dst] = new
+                    changed = True
+            for ins in b.code:
+                pos = DEF_POS.get(ins[0])
+                if pos is None:
+                    continue
+                d = ins[pos]
+                old = values.get(d, UNDEF)
+                new = _meet(old, evaluate(ins))
+                if new is not old:
+                    values[d] = new
+                    changed = True
+            targets = []
+            jump = b.jump()
+            falls, jumps = _branch(jump, value) if jump is not None else (True, False)
+            if jumps:
+                targets.append(ssa.label_block[jump[JUMP_TARGET[jump[0]]]])
+            if falls and ssa.fallthrough(b) is not None:
+                targets.append(ssa.fallthrough(b))
+            for s in targets:
+                if (b, s) not in live_edges:
+                    live_edges.add((b, s))
+                    reached.add(s)
+                    changed = True
+
+    # rewrite with what was proven; a value still UNDEF here is only ever
+    # read from unreached code, and is treated as VARYING
+    def proven(name):
+        val = values.get(name, VARYING) if name in defined else VARYING
+        return VARYING if val is UNDEF else val
+
+    changes = 0
+    for b in ssa.blocks:
+        if b not in reached:
+            changes += sum(1 for ins in b.code if ins[0] != 'line')
+            continue
+        code = []
+        for ins in b.code:
+            op = ins[0]
+            pos = DEF_POS.get(op)
+            if pos is not None and op != 'const' and op != 'const_str':
+                val = proven(ins[pos])
+                if val is not VARYING:
+                    ins = ('const_str' if isinstance(val, str) else 'const', ins[pos], val)
+                    changes += 1
+                else:
+                    ins = _fold_operand(ins, proven)
+            elif op in JUMP_TARGET and op != 'goto':
+                falls, jumps = _branch(ins, proven)
+                if not jumps:
+                    changes += 1
+                    continue
+                if not falls:
+                    ins = ('goto', ins[JUMP_TARGET[op]])
+                    changes += 1
+                else:
+                    ins = _fold_operand(ins, proven)
+            code.append(ins)
+        b.code = code
+    ssa.update_edges()
+    return changes
+
+
+def _constant(value):
+    return value is not UNDEF and value is not VARYING
+
+
+def _fold_operand(ins, value):
+    # a binop or compare-and-branch reading a variable proven constant
+    # takes the constant as an operand instead (binop_const /
+    # cmp_const_goto), which is also what fuse_instructions makes of a
+    # temp holding a literal
+    op = ins[0]
+    if op == 'binop' or op == 'int_binop':
+        _, t, bop, a, b = ins
+        if _constant(value(a)):
+            if op == 'int_binop' and bop in ('plus', 'mul', 'eq', 'ne'):
+                return ('binop_const', t, bop, b, value(a))
+        elif _constant(value(b)):
+            return ('binop_const', t, bop, a, value(b))
+    elif op == 'int_cmp_goto' or op == 'cmp_goto':
+        _, bop, a, b, label = ins
+        if not _constant(value(a)) and _constant(value(b)):
+            return ('cmp_const_goto', bop, a, value(b), label)
+    return ins
+
+
+def eliminate_dead_code(ssa):
+    # Drops instructions that can't raise (irgen.cannot_raise) writing
+    # temps that nothing live reads, and gotos to the next block.
+    # Everything else is a root: output, stores, jumps, what may raise, and
+    # any write to a variable (its final value is visible in --dump mem).
+    # -> number of instructions removed
+    origin = ssa.origin
+    producers = {}
+    for b in ssa.blocks:
+        for phi in b.phis:
+            producers[phi.dst] = phi.args
+        for ins in b.code:
+            pos = DEF_POS.get(ins[0])
+            if pos is not None:
+                producers[ins[pos]] = ins
+
+    def removable(ins):
+        return cannot_raise(ins) and is_temp(origin.get(ins[1], ins[1]))
+
+    live = set()
+    work = []
+    for b in ssa.blocks:
+        for ins in b.code:
+            if ins[0] != 'line' and not removable(ins):
+                work.append(ins)
+    while work:
+        item = work.pop()
+        reads = item if item.__class__ is list else ssa_reads(item)  # phi args, or an instruction
+        for name in reads:
+            if name not in live:
+                live.add(name)
+                producer = producers.get(name)
+                if producer is not None:
+                    work.append(producer)
+
+    removed = 0
+    for b in ssa.blocks:
+        b.phis = [phi for phi in b.phis if phi.dst in live]
+        code = []
+        for ins in b.code:
+            if removable(ins) and ins[1] not in live:
+                removed += 1
+                continue
+            code.append(ins)
+        jump = code[-1] if code and code[-1][0] == 'goto' else None
+        if jump is not None and ssa.label_block.get(jump[1]) is ssa.fallthrough(b):
+            code.pop()
+            removed += 1
+        b.code = code
+    return removed
+
+
+# Loop optimization. Ranges bounds the int versions; hoist_invariants moves
+# what every iteration recomputes into the loop's preheader, and
+# eliminate_list_checks lets proven lists skip index_set's isinstance test.
+
+def _clip(r, s):
+    # intersection of two ranges
+    lo = s[0] if r[0] is None else r[0] if s[0] is None else max(r[0], s[0])
+    hi = s[1] if r[1] is None else r[1] if s[1] is None else min(r[1], s[1])
+    return lo, hi
+
+
+def _shift(r, k):
+    return (None if r[0] is None else r[0] + k, None if r[1] is None else r[1] + k)
+
+
+def _arith(bop, a, b):
+    # range of `a bop b` for int ranges a and b; None if it may not be an int
+    if a is None or b is None:
+        return None
+    if bop == 'plus':
+        return (None if a[0] is None or b[0] is None else a[0] + b[0],
+                None if a[1] is None or b[1] is None else a[1] + b[1])
+    if bop == 'minus':
+        return (None if a[0] is None or b[1] is None else a[0] - b[1],
+                None if a[1] is None or b[0] is None else a[1] - b[0])
+    if bop == 'mul':
+        if None in a or None in b:
+            return None, None
+        products = [x * y for x in a for y in b]
+        return min(products), max(products)
+    if bop == 'mod':
+        if b[0] is not None and b[0] >= 1 and b[1] is not None:
+            return 0, b[1] - 1
+        if b[1] is not None and b[1] <= -1 and b[0] is not None:
+            return b[0] + 1, 0
+        return None, None
+    if bop == 'div':
+        if b[0] == b[1] and b[0] is not None and b[0] > 0:
+            return (None if a[0] is None else a[0] // b[0], None if a[1] is None else a[1] // b[0])
+        return None, None
+    if bop == 'pow':
+        return None  # a float for a negative exponent
+    return 0, 1  # comparisons, and / or
+
+
+# what holding `a bop b` says about a, given b's range
+_BOUND = {'lt': lambda r: (None, None if r[1] is None else r[1] - 1),
+          'le': lambda r: (None, r[1]),
+          'gt': lambda r: (None if r[0] is None else r[0] + 1, None),
+          'ge': lambda r: (r[0], None),
+          'eq': lambda r: r}
+NEGATED = {'lt': 'ge', 'le': 'gt', 'gt': 'le', 'ge': 'lt', 'eq': 'ne', 'ne': 'eq'}
+MIRRORED = {'eq': 'eq', 'ne': 'ne', 'lt': 'gt', 'gt': 'lt', 'le': 'ge', 'ge': 'le'}
+
+
+class Ranges:
+    # Integer bounds of SSA versions, (lo, hi) with None for an open end; a
+    # version without one may not be an int. They come from constants,
+    # arithmetic, loop variables that only count up (or down) from a known
+    # start, and branches: a block that can only be reached through the
+    # side of `j < t` where the test held knows j <= hi(t) - 1. for_next
+    # only jumps back below its end, which bounds a साठी variable the same
+    # way. Also records the length of every list built by const_list or
+    # const_array (lists never change length).
+    def __init__(self, ssa):
+        self.ssa = ssa
+        self.ranges = {}
+        self.lengths = {}
+        self.tests = {}   # version -> [(block, range)]: holds in blocks it dominates
+        self.producers = {}
+        for b in ssa.blocks:
+            for ins in b.code:
+                pos = DEF_POS.get(ins[0])
+                if pos is not None:
+                    self.producers[ins[pos]] = ins
+        headers = {loop.header: loop for loop in ssa.loops}
+        for b in ssa.order:
+            for phi in b.phis:
+                self.define_phi(phi, b, headers.get(b))
+            for ins in b.code:
+                self.define(ins, b)
+            self.add_tests(b)
+
+    def get(self, name, where):
+        # range of name as seen in block where
+        r = self.ranges.get(name)
+        if r is None:
+            return None
+        for block, bound in self.tests.get(name, ()):
+            if self.ssa.dominates(block, where):
+                r = _clip(r, bound)
+        return r
+
+    def operand(self, ins, pos, where):
+        r = self.get(ins[pos], where)
+        if r is None and ins[0] in ('int_binop', 'int_cmp_goto'):
+            return None, None  # proven an int by the semantic analyzer
+        return r
+
+    def interval(self, ins, where):
+        op = ins[0]
+        if op == 'const':
+            return (ins[2], ins[2]) if type(ins[2]) is int else None
+        if op == 'binop' or op == 'int_binop':
+            return _arith(ins[2], self.operand(ins, 3, where), self.operand(ins, 4, where))
+        if op == 'binop_const':
+            k = ins[4]
+            return _arith(ins[2], self.get(ins[3], where), (k, k) if type(k) is int else None)
+        if op == 'assign':
+            return self.get(ins[2], where)
+        if op == 'for_next':
+            r = self.get(ins[4], where)
+            return None if r is None else _shift(r, 1)
+        return None
+
+    def define(self, ins, where):
+        op = ins[0]
+        pos = DEF_POS.get(op)
+        if pos is None:
+            return
+        d = ins[pos]
+        r = self.interval(ins, where)
+        if r is not None:
+            self.ranges[d] = r
+        else:
+            self.ranges.pop(d, None)
+        if op in LIST_BUILDS:
+            self.lengths[d] = len(ins[2])
+        elif op == 'assign' and ins[2] in self.lengths:
+            self.lengths[d] = self.lengths[ins[2]]
+
+    def define_phi(self, phi, b, loop):
+        if loop is None:
+            ranges = [self.get(arg, p) for p, arg in zip(b.preds, phi.args)]
+            if ranges and None not in ranges:
+                self.ranges[phi.dst] = (None if any(r[0] is None for r in ranges) else min(r[0] for r in ranges),
+                                        None if any(r[1] is None for r in ranges) else max(r[1] for r in ranges))
+            lengths = {self.lengths.get(arg) for arg in phi.args}
+            if len(lengths) == 1 and None not in lengths:
+                self.lengths[phi.dst] = lengths.pop()
+            return
+        # a loop variable: starts in the entry range, then moves by steps
+        entry = []
+        steps = []
+        back = []  # bounds on what the back edges carry
+        for p, arg in zip(b.preds, phi.args):
+            if p not in loop.blocks:
+                entry.append(self.get(arg, p))
+                continue
+            step, ins = self.step(phi.dst, arg)
+            if step is None:
+                return
+            steps.append(step)
+            if ins is not None and ins[0] == 'for_next':
+                end = self.get(ins[2], p)
+                back.append(None if end is None or end[1] is None else end[1] - 1)
+            elif step != 0:
+                back.append(None)
+        if not entry or None in entry:
+            return
+        lo = None if any(r[0] is None for r in entry) else min(r[0] for r in entry)
+        hi = None if any(r[1] is None for r in entry) else max(r[1] for r in entry)
+        if all(s >= 0 for s in steps):
+            hi = None if hi is None or None in back else max([hi] + back)
+            self.ranges[phi.dst] = (lo, hi)
+        elif all(s <= 0 for s in steps):
+            self.ranges[phi.dst] = (None, hi)
+        else:
+            self.ranges[phi.dst] = (None, None)
+
+    def step(self, var, name):
+        # -> (k, instruction) when name is var + k for a constant k, else (None, None)
+        if name == var:
+            return 0, None
+        ins = self.producers.get(name)
+        while ins is not None and ins[0] == 'assign':
+            if ins[2] == var:
+                return 0, ins
+            ins = self.producers.get(ins[2])
+        if ins is None:
+            return None, None
+        op = ins[0]
+        if op == 'for_next' and ins[4] == var:
+            return 1, ins
+        if op == 'binop_const' and ins[3] == var and type(ins[4]) is int:
+            if ins[2] == 'plus':
+                return ins[4], ins
+            if ins[2] == 'minus':
+                return -ins[4], ins
+        if op == 'binop' or op == 'int_binop':
+            _, _, bop, a, c = ins
+            if bop == 'plus' and c == var:
+                a, c = c, a
+            k = self.producers.get(c)
+            if a == var and k is not None and k[0] == 'const' and type(k[2]) is int:
+                if bop == 'plus':
+                    return k[2], ins
+                if bop == 'minus':
+                    return -k[2], ins
+        return None, None
+
+    def add_tests(self, b):
+        jump = b.jump()
+        if jump is None:
+            return
+        op = jump[0]
+        if op == 'if_false_goto':
+            test = self.producers.get(jump[1])
+            if test is None or test[0] not in ('binop', 'int_binop', 'binop_const'):
+                return
+            bop, a = test[2], test[3]
+            other = test[4]
+            typed = test[0] == 'int_binop'
+            const = test[0] == 'binop_const'
+        elif op in ('int_cmp_goto', 'cmp_goto', 'cmp_const_goto'):
+            bop, a, other = jump[1], jump[2], jump[3]
+            typed = op == 'int_cmp_goto'
+            const = op == 'cmp_const_goto'
+        elif op == 'for_range':
+            bop, a, other = 'lt', jump[1], jump[2]
+            typed = const = False
+        else:
+            return
+        if bop not in NEGATED:
+            return
+        ra = self.get(a, b)
+        if const:
+            rb = (other, other) if type(other) is int else None
+        else:
+            rb = self.get(other, b)
+        if typed:
+            ra = ra or (None, None)
+            rb = rb or (None, None)
+        if ra is None or rb is None:
+            return
+        target = self.ssa.label_block[jump[JUMP_TARGET[op]]]
+        nxt = self.ssa.fallthrough(b)
+        if nxt is target:
+            return
+        # the test holds on the fallthrough side and fails at the target
+        for block, held in ((nxt, bop), (target, NEGATED[bop])):
+            if block is None or block.preds != [b] or held not in _BOUND:
+                continue
+            self.tests.setdefault(a, []).append((block, _BOUND[held](rb)))
+            if not const:
+                self.tests.setdefault(other, []).append((block, _BOUND[MIRRORED[held]](ra)))
+
+    def can_fail(self, ins, where):
+        # may ins raise when run in block where?
+        op = ins[0]
+        if op in ('const', 'const_str', 'const_list', 'const_array', 'assign'):
+            return False
+        if op == 'binop' or op == 'int_binop' or op == 'binop_const':
+            bop = ins[2]
+            if bop in ('eq', 'ne', 'and', 'or'):
+                return False
+            a = self.operand(ins, 3, where)
+            if op == 'binop_const':
+                b = (ins[4], ins[4]) if type(ins[4]) is int else None
+            else:
+                b = self.operand(ins, 4, where)
+            if a is None or b is None or bop == 'pow':
+                return True
+            if bop == 'div' or bop == 'mod':
+                return not ((b[0] is not None and b[0] >= 1) or (b[1] is not None and b[1] <= -1))
+            return False
+        if op == 'index_get' or op == 'list_get':
+            return not self.in_bounds(ins[2], ins[3], where)
+        return True
+
+    def in_bounds(self, arr, idx, where):
+        n = self.lengths.get(arr)
+        r = self.get(idx, where)
+        return (n is not None and r is not None and r[0] is not None and r[1] is not None
+                and -n <= r[0] and r[1] < n)
+
+
+def _preheader(ssa, loop):
+    # The block that runs just before the loop is entered, and only then:
+    # the one block entering the header if it leads nowhere else, or a new
+    # empty block placed right before the header, which takes over the
+    # labels that entering jumps use. None if a label is shared with a
+    # back edge.
+    header = loop.header
+    entries = [p for p in header.preds if p not in loop.blocks]
+    if len(entries) == 1 and entries[0].succs == [header]:
+        jump = entries[0].jump()
+        if jump is None or jump[0] == 'goto':
+            return entries[0]
+    prev = ssa.blocks[header.index - 1] if header.index > 0 else None
+    moved = set()
+    kept = set()
+    for p in header.preds:
+        jump = p.jump()
+        label = jump[JUMP_TARGET[jump[0]]] if jump is not None else None
+        if p is prev and (jump is None or jump[0] != 'goto') and p in loop.blocks:
+            return None
+        if label is not None and ssa.label_block.get(label) is header:
+            (kept if p in loop.blocks else moved).add(label)
+    if moved & kept:
+        return None
+
+    pre = SSABlock(header.index)
+    pre.labels = [ins for ins in header.labels if ins[1] in moved]
+    header.labels = [ins for ins in header.labels if ins[1] not in moved]
+    for ins in pre.labels:
+        ssa.label_block[ins[1]] = pre
+    pre.live_in = header.live_in
+    outside = [j for j, p in enumerate(header.preds) if p not in loop.blocks]
+    for phi in header.phis:
+        args = [phi.args[j] for j in outside]
+        if not args:
+            arg = phi.name + '.0'  # the header was the entry block
+            ssa.origin[arg] = phi.name
+        elif len(set(args)) == 1:
+            arg = args[0]
+        else:
+            merged = Phi(phi.name, len(args))
+            merged.dst = ssa.new_version(phi.name)
+            merged.args = args
+            pre.phis.append(merged)
+            arg = merged.dst
+        phi.args = [arg] + [a for j, a in enumerate(phi.args) if j not in outside]
+    for p in entries:
+        p.succs[p.succs.index(header)] = pre
+    pre.preds = entries
+    pre.succs = [header]
+    header.preds = [pre] + [p for p in header.preds if p in loop.blocks]
+    ssa.blocks.insert(header.index, pre)
+    for i, b in enumerate(ssa.blocks):
+        b.index = i
+    return pre
+
+
+def make_preheaders(ssa):
+    # -> {header: preheader} for the loops that can have one
+    preheaders = {}
+    for header in [loop.header for loop in ssa.loops]:
+        loop = next(loop for loop in ssa.loops if loop.header is header)
+        pre = _preheader(ssa, loop)
+        if pre is not None:
+            preheaders[header] = pre
+            ssa.analyze()
+    return preheaders
+
+
+def hoist_invariants(ssa, preheaders, ranges):
+    # Loop-invariant code motion, innermost loops first, so that what
+    # leaves an inner loop can leave the enclosing ones too. An int binop
+    # (int_binop, or a binop_const on a proven int) moves to the preheader
+    # when it writes a temp that has no other version and everything it
+    # reads is written outside the loop or by something already moved.
+    # Nothing else does: a generic binop or a list read may read list
+    # contents the loop changes, and a list build makes a new list on
+    # every run. What may raise (div, mod) moves only from the start of the
+    # header, before anything that may raise or writes a variable: the
+    # header runs whenever the preheader does, so it fails at the same
+    # point. A const moves with its users, and otherwise stays next to the
+    # instruction fuse_instructions will fold it into.
+    # -> number of instructions moved
+    origin = ssa.origin
+    versions = Counter(origin.values())
+    start_line = {}
+    line = None
+    for b in ssa.blocks:
+        start_line[b] = line
+        for ins in b.code:
+            if ins[0] == 'line':
+                line = ins[1]
+
+    moved = 0
+    for loop in list(ssa.loops):
+        header = loop.header
+        pre = preheaders.get(header)
+        if pre is None:
+            continue
+        blocks = [b for b in ssa.order if b in loop.blocks]
+        inside = set()
+        for b in blocks:
+            inside.update(phi.dst for phi in b.phis)
+            for ins in b.code:
+                pos = DEF_POS.get(ins[0])
+                if pos is not None:
+                    inside.add(ins[pos])
+
+        invariant = set()
+        hoisted = set()  # the instructions to move, by identity
+        consts = {}
+        for b in blocks:
+            barrier = b is not header
+            for ins in b.code:
+                op = ins[0]
+                if op == 'line':
+                    continue
+                name = origin.get(ins[1], ins[1]) if op in PURE_OPS else None
+                movable = (name is not None and op not in LIST_BUILDS and is_temp(name)
+                           and versions[name] == 1)
+                if movable and (op == 'const' or op == 'const_str'):
+                    invariant.add(ins[1])
+                    consts[ins[1]] = ins
+                    continue
+                int_op = op == 'int_binop' or (op == 'binop_const' and type(ins[4]) is int
+                                               and ranges.get(ins[3], pre) is not None)
+                if (movable and int_op
+                        and all(u not in inside or u in invariant for u in ssa_reads(ins))
+                        and (not barrier or not ranges.can_fail(ins, pre))):
+                    invariant.add(ins[1])
+                    hoisted.add(id(ins))
+                    ranges.define(ins, pre)  # its range where it now runs
+                    continue
+                if ranges.can_fail(ins, b) or not (name is not None and is_temp(name)):
+                    barrier = True  # an error from here on would come later than this
+        if not hoisted:
+            continue
+        for b in blocks:
+            for ins in b.code:
+                if id(ins) in hoisted:
+                    for u in ssa_reads(ins):
+                        if u in consts:
+                            hoisted.add(id(consts[u]))
+
+        # append in the original order, each with its source line
+        tail = pre.code[-1:] if pre.jump() is not None else []
+        code = pre.code[:len(pre.code) - len(tail)]
+        line = start_line.get(pre)
+        for ins in code:
+            if ins[0] == 'line':
+                line = ins[1]
+        current = line
+        for b in blocks:
+            keep = []
+            at = start_line.get(b)
+            for ins in b.code:
+                if ins[0] == 'line':
+                    at = ins[1]
+                elif id(ins) in hoisted:
+                    if at is not None and at != current:
+                        code.append(('line', at))
+                        current = at
+                    code.append(ins)
+                    moved += 1
+                    continue
+                keep.append(ins)
+            b.code = keep
+        if current != line and line is not None:
+            code.append(('line', line))
+        pre.code = code + tail
+    return moved
+
+
+def eliminate_list_checks(ssa, ranges):
+    # index_get / index_set on a version proven to be a list become
+    # list_get / list_set, whose VM handlers skip the isinstance check.
+    # Only that type check goes: the bounds check is CPython's own, in every
+    # list subscript, and there is no unchecked access to emit instead.
+    # Ranges.in_bounds only tells can_fail (and so hoisting) that a list
+    # read won't raise. -> number of instructions changed
+    changed = 0
+    for b in ssa.blocks:
+        code = []
+        for ins in b.code:
+            op = ins[0]
+            if op == 'index_set' and ins[1] in ranges.lengths:
+                ins = ('list_set',) + ins[1:]
+                changed += 1
+            elif op == 'index_get' and ins[2] in ranges.lengths:
+                ins = ('list_get',) + ins[1:]
+                changed += 1
+            code.append(ins)
+        b.code = code
+    return changed
+
+
+# IR -> IR passes for the optimizer's pass manager
+
+def propagate_constants_globally(ir):
+    ssa = build_ssa(ir)
+    propagate_constants(ssa)
+    return ssa.to_ir()
+
+
+def eliminate_dead_code_globally(ir):
+    ssa = build_ssa(ir)
+    eliminate_dead_code(ssa)
+    return ssa.to_ir()
+
+
+def optimize_loops(ir):
+    ssa = build_ssa(ir)
+    if ssa.loops:
+        preheaders = make_preheaders(ssa)
+        ranges = Ranges(ssa)
+        hoist_invariants(ssa, preheaders, ranges)
+    else:
+        ranges = Ranges(ssa)
+    eliminate_list_checks(ssa, ranges)
+    return ssa.to_ir()
+
+
+if __name__ == '__main__':
+    from parser import parse_code
+    from irgen import IRGen
+    ssa = build_ssa(IRGen().gen(parse_code(
+        'बदलवा n = 5\nबदलवा s = 0\nबदलवा i = 0\nजोपर्यंत i < n तर\n'
+        '    जर n > 3 तर\n        s = s + i\n    नाहीतर\n        s = s - i\n    संपले\n'
+        '    i = i + 1\nसंपले\nलिहा s\n')))
+    print(ssa.format())
+    print(ssa.loops)
+    propagate_constants(ssa)
+    eliminate_dead_code(ssa)
+    print(ssa.format())
+    for ins in ssa.to_ir():
+        print(ins)
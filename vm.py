@@ -0,0 +1,720 @@
+# Register VM for IRGen output.
+#
+# link() first recycles dead temps (regalloc.allocate_temps) if asked to,
+# then gives every variable and temp a fixed integer slot, moves literals
+# into a constant pool and resolves labels to absolute instruction offsets
+# (dropping the label instructions, and turning 'line' markers into a
+# per-instruction line table), so execute() runs on a preallocated
+# list of registers instead of resolving names through a dict. The linked
+# Program is reusable: run it as many times as you like. Before running,
+# decode() binds every instruction to a handler closure, so the run loop is
+# just "call handler, get next ip".
+
+import gc
+import operator
+import time
+from array import array
+from functools import partial
+
+from regalloc import allocate_temps
+
+# opcodes
+LOAD_CONST = 0     # (op, dst, const_index)
+BUILD_LIST = 1     # (op, dst, (src, ...))
+BINOP = 2          # (op, dst, bop, a, b)
+MOVE = 3           # (op, dst, src)
+INDEX_GET = 4      # (op, dst, arr, idx)
+INDEX_SET = 5      # (op, arr, idx, src)
+PRINT = 6          # (op, src)
+JUMP_IF_FALSE = 7  # (op, cond, target)
+JUMP = 8           # (op, target)
+FOR_RANGE = 9      # (op, var, end, exit_target)
+FOR_NEXT = 10      # (op, var, end, body_target)
+# typed instructions and superinstructions (see irgen.py); a list_get
+# links to INDEX_GET, whose handler is already the unchecked list path.
+# CMP_JUMP runs both int_cmp_goto and the fused cmp_goto: its inlined
+# comparisons behave like TRUTH_OPS for any operand types.
+INT_BINOP = 11         # (op, dst, bop, a, b)
+CMP_JUMP = 12          # (op, bop, a, b, target): jump unless a bop b
+LIST_SET = 13          # (op, arr, idx, src)
+BINOP_CONST = 14       # (op, dst, bop, a, const_index)
+CMP_CONST_JUMP = 15    # (op, bop, a, const_index, target)
+INDEX_GET_OFFSET = 16  # (op, dst, arr, idx, const_index): dst = arr[idx + k]
+LIST_SET_OFFSET = 17   # (op, arr, idx, const_index, src): arr[idx + k] = src
+BUILD_ARRAY = 18       # (op, dst, (src, ...)): BUILD_LIST into an int array (see IntArrays)
+
+OPNAMES = ['LOAD_CONST', 'BUILD_LIST', 'BINOP', 'MOVE', 'INDEX_GET',
+           'INDEX_SET', 'PRINT', 'JUMP_IF_FALSE', 'JUMP', 'FOR_RANGE',
+           'FOR_NEXT', 'INT_BINOP', 'CMP_JUMP', 'LIST_SET', 'BINOP_CONST',
+           'CMP_CONST_JUMP', 'INDEX_GET_OFFSET', 'LIST_SET_OFFSET', 'BUILD_ARRAY']
+
+
+class Program:
+    def __init__(self, code, consts, names, lines=None, temps=None):
+        self.code = code      # list of instructions (tuples of ints)
+        self.consts = consts  # constant pool
+        self.names = names    # slot -> variable or temp name
+        self.lines = lines if lines is not None else [0] * len(code)  # ip -> source line (0: unknown)
+        self.temps = temps    # regalloc.TempAllocation, when linked from IR
+
+    @property
+    def n_slots(self):
+        return len(self.names)
+
+    def instructions(self):
+        return iter(self.code)
+
+    def memory(self, regs):
+        # rebuild a name -> value view of the registers (for dumps)
+        return {name: as_list(regs[i]) for i, name in enumerate(self.names) if regs[i] is not None}
+
+    def __repr__(self):
+        return f'Program({len(self.code)} instructions, {len(self.names)} slots, {len(self.consts)} consts)'
+
+
+def link(ir, recycle_temps=False):
+    # recycling needs liveness over the whole program, which costs several
+    # times the rest of link(); optimizer.RECYCLE_TEMPS_LEVEL says when
+    temps = None
+    if recycle_temps:
+        ir, temps = allocate_temps(ir)
+    slots = {}
+    names = []
+    consts = []
+    const_index = {}
+    labels = {}
+
+    def slot(name):
+        s = slots.get(name)
+        if s is None:
+            s = slots[name] = len(names)
+            names.append(name)
+        return s
+
+    def const(value):
+        # keep 1 and '1' (and True, if it ever shows up) apart
+        key = (type(value), value)
+        k = const_index.get(key)
+        if k is None:
+            k = const_index[key] = len(consts)
+            consts.append(value)
+        return k
+
+    # first pass: a label resolves to the offset of the next real instruction
+    ip = 0
+    for ins in ir:
+        if ins[0] == 'label':
+            labels[ins[1]] = ip
+        elif ins[0] != 'line':
+            ip += 1
+
+    code = []
+    lines = []
+    lineno = 0
+    for ins in ir:
+        op = ins[0]
+        if op == 'const' or op == 'const_str':
+            _, temp, val = ins
+            code.append((LOAD_CONST, slot(temp), const(val)))
+        elif op == 'const_list' or op == 'const_array':
+            _, temp, elem_temps = ins
+            code.append((BUILD_LIST if op == 'const_list' else BUILD_ARRAY,
+                         slot(temp), tuple(slot(et) for et in elem_temps)))
+        elif op == 'binop':
+            _, t, bop, a, b = ins
+            code.append((BINOP, slot(t), bop, slot(a), slot(b)))
+        elif op == 'int_binop':
+            _, t, bop, a, b = ins
+            code.append((INT_BINOP, slot(t), bop, slot(a), slot(b)))
+        elif op == 'assign':
+            _, name, src = ins
+            code.append((MOVE, slot(name), slot(src)))
+        elif op == 'index_get' or op == 'list_get':
+            _, t, arr, idx = ins
+            code.append((INDEX_GET, slot(t), slot(arr), slot(idx)))
+        elif op == 'index_set':
+            _, arr, idx, src = ins
+            code.append((INDEX_SET, slot(arr), slot(idx), slot(src)))
+        elif op == 'list_set':
+            _, arr, idx, src = ins
+            code.append((LIST_SET, slot(arr), slot(idx), slot(src)))
+        elif op == 'print':
+            code.append((PRINT, slot(ins[1])))
+        elif op == 'if_false_goto':
+            _, cond, label = ins
+            code.append((JUMP_IF_FALSE, slot(cond), labels[label]))
+        elif op == 'int_cmp_goto' or op == 'cmp_goto':
+            _, bop, a, b, label = ins
+            code.append((CMP_JUMP, bop, slot(a), slot(b), labels[label]))
+        elif op == 'cmp_const_goto':
+            _, bop, a, k, label = ins
+            code.append((CMP_CONST_JUMP, bop, slot(a), const(k), labels[label]))
+        elif op == 'binop_const':
+            _, t, bop, a, k = ins
+            code.append((BINOP_CONST, slot(t), bop, slot(a), const(k)))
+        elif op == 'index_get_offset':
+            _, t, arr, idx, k = ins
+            code.append((INDEX_GET_OFFSET, slot(t), slot(arr), slot(idx), const(k)))
+        elif op == 'list_set_offset':
+            _, arr, idx, k, src = ins
+            code.append((LIST_SET_OFFSET, slot(arr), slot(idx), const(k), slot(src)))
+        elif op == 'goto':
+            code.append((JUMP, labels[ins[1]]))
+        elif op == 'label':
+            continue
+        elif op == 'line':
+            lineno = ins[1]
+            continue
+        elif op == 'for_range':
+            _, var, end, label = ins
+            code.append((FOR_RANGE, slot(var), slot(end), labels[label]))
+        elif op == 'for_next':
+            _, var, end, label = ins
+            code.append((FOR_NEXT, slot(var), slot(end), labels[label]))
+        else:
+            raise NotImplementedError(f'Cannot link IR instruction {ins!r}')
+        lines.append(lineno)
+    return Program(code, consts, names, lines, temps)
+
+
+# binops that produce a value directly
+ARITH_OPS = {
+    'plus': operator.add,
+    'minus': operator.sub,
+    'mul': operator.mul,
+    'div': operator.floordiv,  # integer division
+    'mod': operator.mod,
+    'pow': operator.pow,
+}
+
+# binops that produce 1/0
+TRUTH_OPS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'gt': operator.gt,
+    'le': operator.le,
+    'ge': operator.ge,
+    'and': lambda a, b: a and b,
+    'or': lambda a, b: a or b,
+}
+
+
+# Each decoder turns one instruction into a handler closure with its
+# operands (and operator) already bound. A handler runs the instruction
+# and returns the next ip. Operands are read by position, so zero-padded
+# bytecode records (see bytecode.py) can be passed in as they are.
+
+def _decode_load_const(ins, nxt, regs, consts, write):
+    t = ins[1]
+    val = consts[ins[2]]
+    def load_const():
+        regs[t] = val
+        return nxt
+    return load_const
+
+def _decode_build_list(ins, nxt, regs, consts, write):
+    _, t, elems = ins
+    def build_list():
+        regs[t] = [regs[s] for s in elems]
+        return nxt
+    return build_list
+
+def _decode_binop(ins, nxt, regs, consts, write):
+    _, t, bop, a, b = ins
+    fn = ARITH_OPS.get(bop)
+    if fn is not None:
+        def binop():
+            regs[t] = fn(regs[a], regs[b])
+            return nxt
+        return binop
+    fn = TRUTH_OPS.get(bop)
+    if fn is None:
+        raise RuntimeError('Unknown binop ' + bop)
+    def compare():
+        regs[t] = 1 if fn(regs[a], regs[b]) else 0
+        return nxt
+    return compare
+
+def _decode_move(ins, nxt, regs, consts, write):
+    t, src = ins[1], ins[2]
+    def move():
+        regs[t] = regs[src]
+        return nxt
+    return move
+
+def _decode_index_get(ins, nxt, regs, consts, write):
+    t, arr, idx = ins[1], ins[2], ins[3]
+    def index_get():
+        regs[t] = regs[arr][regs[idx]]
+        return nxt
+    return index_get
+
+def _decode_index_set(ins, nxt, regs, consts, write):
+    arr, idx, src = ins[1], ins[2], ins[3]
+    def index_set():
+        arrv = regs[arr]
+        # write into list in-place
+        if isinstance(arrv, list):
+            arrv[regs[idx]] = regs[src]
+        else:
+            raise RuntimeError('Indexing into non-list')
+        return nxt
+    return index_set
+
+def _decode_print(ins, nxt, regs, consts, write):
+    src = ins[1]
+    def print_():
+        write(regs[src])
+        return nxt
+    return print_
+
+def _decode_jump_if_false(ins, nxt, regs, consts, write):
+    cond, target = ins[1], ins[2]
+    def jump_if_false():
+        return nxt if regs[cond] else target
+    return jump_if_false
+
+def _decode_jump(ins, nxt, regs, consts, write):
+    target = ins[1]
+    def jump():
+        return target
+    return jump
+
+def _decode_for_range(ins, nxt, regs, consts, write):
+    var, end, target = ins[1], ins[2], ins[3]
+    def for_range():
+        return nxt if regs[var] < regs[end] else target
+    return for_range
+
+def _decode_for_next(ins, nxt, regs, consts, write):
+    var, end, target = ins[1], ins[2], ins[3]
+    def for_next():
+        i = regs[var] + 1
+        regs[var] = i
+        return target if i < regs[end] else nxt
+    return for_next
+
+# Typed handlers: the operator is inlined instead of called through
+# ARITH_OPS / TRUTH_OPS. Operators without an entry use the generic handler.
+
+def _int_plus(t, a, b, regs, nxt):
+    def int_plus():
+        regs[t] = regs[a] + regs[b]
+        return nxt
+    return int_plus
+
+def _int_minus(t, a, b, regs, nxt):
+    def int_minus():
+        regs[t] = regs[a] - regs[b]
+        return nxt
+    return int_minus
+
+def _int_mul(t, a, b, regs, nxt):
+    def int_mul():
+        regs[t] = regs[a] * regs[b]
+        return nxt
+    return int_mul
+
+def _int_mod(t, a, b, regs, nxt):
+    def int_mod():
+        regs[t] = regs[a] % regs[b]
+        return nxt
+    return int_mod
+
+def _int_lt(t, a, b, regs, nxt):
+    def int_lt():
+        regs[t] = 1 if regs[a] < regs[b] else 0
+        return nxt
+    return int_lt
+
+def _int_gt(t, a, b, regs, nxt):
+    def int_gt():
+        regs[t] = 1 if regs[a] > regs[b] else 0
+        return nxt
+    return int_gt
+
+def _int_le(t, a, b, regs, nxt):
+    def int_le():
+        regs[t] = 1 if regs[a] <= regs[b] else 0
+        return nxt
+    return int_le
+
+def _int_ge(t, a, b, regs, nxt):
+    def int_ge():
+        regs[t] = 1 if regs[a] >= regs[b] else 0
+        return nxt
+    return int_ge
+
+def _int_eq(t, a, b, regs, nxt):
+    def int_eq():
+        regs[t] = 1 if regs[a] == regs[b] else 0
+        return nxt
+    return int_eq
+
+def _int_ne(t, a, b, regs, nxt):
+    def int_ne():
+        regs[t] = 1 if regs[a] != regs[b] else 0
+        return nxt
+    return int_ne
+
+INT_BINOPS = {'plus': _int_plus, 'minus': _int_minus, 'mul': _int_mul, 'mod': _int_mod,
+              'lt': _int_lt, 'gt': _int_gt, 'le': _int_le, 'ge': _int_ge,
+              'eq': _int_eq, 'ne': _int_ne}
+
+def _decode_int_binop(ins, nxt, regs, consts, write):
+    make = INT_BINOPS.get(ins[2])
+    if make is None:
+        return _decode_binop(ins, nxt, regs, consts, write)
+    return make(ins[1], ins[3], ins[4], regs, nxt)
+
+def _cmp_lt(a, b, regs, nxt, target):
+    def cmp_lt():
+        return nxt if regs[a] < regs[b] else target
+    return cmp_lt
+
+def _cmp_gt(a, b, regs, nxt, target):
+    def cmp_gt():
+        return nxt if regs[a] > regs[b] else target
+    return cmp_gt
+
+def _cmp_le(a, b, regs, nxt, target):
+    def cmp_le():
+        return nxt if regs[a] <= regs[b] else target
+    return cmp_le
+
+def _cmp_ge(a, b, regs, nxt, target):
+    def cmp_ge():
+        return nxt if regs[a] >= regs[b] else target
+    return cmp_ge
+
+def _cmp_eq(a, b, regs, nxt, target):
+    def cmp_eq():
+        return nxt if regs[a] == regs[b] else target
+    return cmp_eq
+
+def _cmp_ne(a, b, regs, nxt, target):
+    def cmp_ne():
+        return nxt if regs[a] != regs[b] else target
+    return cmp_ne
+
+CMPS = {'lt': _cmp_lt, 'gt': _cmp_gt, 'le': _cmp_le, 'ge': _cmp_ge,
+        'eq': _cmp_eq, 'ne': _cmp_ne}
+
+def _decode_cmp_jump(ins, nxt, regs, consts, write):
+    make = CMPS.get(ins[1])
+    if make is None:
+        raise RuntimeError('Unknown comparison ' + ins[1])
+    return make(ins[2], ins[3], regs, nxt, ins[4])
+
+# Superinstructions with a constant operand k, bound into the closure
+
+def _const_plus(t, a, k, regs, nxt):
+    def plus_const():
+        regs[t] = regs[a] + k
+        return nxt
+    return plus_const
+
+def _const_minus(t, a, k, regs, nxt):
+    def minus_const():
+        regs[t] = regs[a] - k
+        return nxt
+    return minus_const
+
+def _const_mul(t, a, k, regs, nxt):
+    def mul_const():
+        regs[t] = regs[a] * k
+        return nxt
+    return mul_const
+
+def _const_mod(t, a, k, regs, nxt):
+    def mod_const():
+        regs[t] = regs[a] % k
+        return nxt
+    return mod_const
+
+BINOP_CONSTS = {'plus': _const_plus, 'minus': _const_minus, 'mul': _const_mul, 'mod': _const_mod}
+
+def _decode_binop_const(ins, nxt, regs, consts, write):
+    t, bop, a, k = ins[1], ins[2], ins[3], consts[ins[4]]
+    make = BINOP_CONSTS.get(bop)
+    if make is not None:
+        return make(t, a, k, regs, nxt)
+    fn = ARITH_OPS.get(bop)
+    if fn is not None:
+        def binop_const():
+            regs[t] = fn(regs[a], k)
+            return nxt
+        return binop_const
+    fn = TRUTH_OPS.get(bop)
+    if fn is None:
+        raise RuntimeError('Unknown binop ' + bop)
+    def compare_const():
+        regs[t] = 1 if fn(regs[a], k) else 0
+        return nxt
+    return compare_const
+
+def _cmp_const_lt(a, k, regs, nxt, target):
+    def cmp_const_lt():
+        return nxt if regs[a] < k else target
+    return cmp_const_lt
+
+def _cmp_const_gt(a, k, regs, nxt, target):
+    def cmp_const_gt():
+        return nxt if regs[a] > k else target
+    return cmp_const_gt
+
+def _cmp_const_le(a, k, regs, nxt, target):
+    def cmp_const_le():
+        return nxt if regs[a] <= k else target
+    return cmp_const_le
+
+def _cmp_const_ge(a, k, regs, nxt, target):
+    def cmp_const_ge():
+        return nxt if regs[a] >= k else target
+    return cmp_const_ge
+
+def _cmp_const_eq(a, k, regs, nxt, target):
+    def cmp_const_eq():
+        return nxt if regs[a] == k else target
+    return cmp_const_eq
+
+def _cmp_const_ne(a, k, regs, nxt, target):
+    def cmp_const_ne():
+        return nxt if regs[a] != k else target
+    return cmp_const_ne
+
+CMP_CONSTS = {'lt': _cmp_const_lt, 'gt': _cmp_const_gt, 'le': _cmp_const_le, 'ge': _cmp_const_ge,
+              'eq': _cmp_const_eq, 'ne': _cmp_const_ne}
+
+def _decode_cmp_const_jump(ins, nxt, regs, consts, write):
+    make = CMP_CONSTS.get(ins[1])
+    if make is None:
+        raise RuntimeError('Unknown comparison ' + ins[1])
+    return make(ins[2], consts[ins[3]], regs, nxt, ins[4])
+
+def _decode_index_get_offset(ins, nxt, regs, consts, write):
+    t, arr, idx, k = ins[1], ins[2], ins[3], consts[ins[4]]
+    def index_get_offset():
+        regs[t] = regs[arr][regs[idx] + k]
+        return nxt
+    return index_get_offset
+
+def _decode_list_set_offset(ins, nxt, regs, consts, write):
+    arr, idx, k, src = ins[1], ins[2], consts[ins[3]], ins[4]
+    def list_set_offset():
+        regs[arr][regs[idx] + k] = regs[src]
+        return nxt
+    return list_set_offset
+
+def _decode_list_set(ins, nxt, regs, consts, write):
+    arr, idx, src = ins[1], ins[2], ins[3]
+    def list_set():
+        regs[arr][regs[idx]] = regs[src]
+        return nxt
+    return list_set
+
+# indexed by opcode
+DECODERS = [
+    _decode_load_const,
+    _decode_build_list,
+    _decode_binop,
+    _decode_move,
+    _decode_index_get,
+    _decode_index_set,
+    _decode_print,
+    _decode_jump_if_false,
+    _decode_jump,
+    _decode_for_range,
+    _decode_for_next,
+    _decode_int_binop,
+    _decode_cmp_jump,
+    _decode_list_set,
+    _decode_binop_const,
+    _decode_cmp_const_jump,
+    _decode_index_get_offset,
+    _decode_list_set_offset,
+    _decode_build_list,  # BUILD_ARRAY, untyped; decode() uses ARRAY_DECODERS'
+]
+
+
+def as_list(value):
+    # an int array as the list it stands for, anything else as it is
+    return value.tolist() if value.__class__ is array else value
+
+
+class IntArrays:
+    # Typed list storage for one run of a program with BUILD_ARRAY
+    # instructions, which IRGen emits when the semantic analyzer has proved
+    # every list element in the program an int (see annotate_types for
+    # which programs qualify). Those lists are built as
+    # array('q'): 8 bytes per element in one block, instead of a pointer per
+    # element to an int object of its own. An array indexes, compares,
+    # concatenates and repeats ([0] * n) like a list, and prints as one.
+    # Ints are unbounded and array('q') is not, though: the first value
+    # that doesn't fit in 64 bits demotes the run, turning every array in
+    # the registers into a list (registers sharing an array share the list)
+    # and making BUILD_ARRAY build lists from then on, so a list and an
+    # array never meet.
+    def __init__(self, regs):
+        self.regs = regs
+        self.typed = True
+
+    def build(self, values):
+        if self.typed:
+            try:
+                return array('q', values)
+            except OverflowError:
+                self.demote()
+        return values
+
+    def demote(self):
+        regs = self.regs
+        lists = {}  # id(array) -> its list
+        for i, v in enumerate(regs):
+            if v.__class__ is array:
+                lst = lists.get(id(v))
+                if lst is None:
+                    lst = lists[id(v)] = v.tolist()
+                regs[i] = lst
+        self.typed = False
+
+    def decoders(self):
+        # DECODERS, with ARRAY_DECODERS' bound to this run
+        decoders = list(DECODERS)
+        for op, decoder in ARRAY_DECODERS.items():
+            decoders[op] = partial(decoder, arrays=self)
+        return decoders
+
+
+# Decoders for a program with int arrays. A store that overflows an array
+# demotes the run and is redone on the list (array('q') checks the index
+# before the value, so the index is good).
+
+def _decode_build_array(ins, nxt, regs, consts, write, arrays):
+    _, t, elems = ins
+    build = arrays.build
+    def build_array():
+        regs[t] = build([regs[s] for s in elems])
+        return nxt
+    return build_array
+
+def _decode_array_index_set(ins, nxt, regs, consts, write, arrays):
+    arr, idx, src = ins[1], ins[2], ins[3]
+    def index_set():
+        arrv = regs[arr]
+        if arrv.__class__ is array or isinstance(arrv, list):
+            try:
+                arrv[regs[idx]] = regs[src]
+            except OverflowError:
+                arrays.demote()
+                regs[arr][regs[idx]] = regs[src]
+        else:
+            raise RuntimeError('Indexing into non-list')
+        return nxt
+    return index_set
+
+def _decode_array_list_set(ins, nxt, regs, consts, write, arrays):
+    arr, idx, src = ins[1], ins[2], ins[3]
+    def list_set():
+        try:
+            regs[arr][regs[idx]] = regs[src]
+        except OverflowError:
+            arrays.demote()
+            regs[arr][regs[idx]] = regs[src]
+        return nxt
+    return list_set
+
+def _decode_array_list_set_offset(ins, nxt, regs, consts, write, arrays):
+    arr, idx, k, src = ins[1], ins[2], consts[ins[3]], ins[4]
+    def list_set_offset():
+        try:
+            regs[arr][regs[idx] + k] = regs[src]
+        except OverflowError:
+            arrays.demote()
+            regs[arr][regs[idx] + k] = regs[src]
+        return nxt
+    return list_set_offset
+
+def _decode_array_print(ins, nxt, regs, consts, write, arrays):
+    src = ins[1]
+    def print_():
+        v = regs[src]
+        write(v.tolist() if v.__class__ is array else v)
+        return nxt
+    return print_
+
+ARRAY_DECODERS = {
+    BUILD_ARRAY: _decode_build_array,
+    INDEX_SET: _decode_array_index_set,
+    LIST_SET: _decode_array_list_set,
+    LIST_SET_OFFSET: _decode_array_list_set_offset,
+    PRINT: _decode_array_print,
+}
+
+
+def builds_arrays(code):
+    return any(ins[0] == BUILD_ARRAY for ins in code)
+
+
+def decode(program, write=print):
+    regs = [None] * program.n_slots
+    consts = program.consts
+    code = list(program.instructions())
+    decoders = IntArrays(regs).decoders() if builds_arrays(code) else DECODERS
+    # Each handler is a closure with its own cells, so a long program makes
+    # a lot of container objects at once and the cyclic collector would
+    # rescan the growing list again and again (383k instructions: 3.9s
+    # instead of 0.5s). None of them is garbage, so it is paused meanwhile.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        handlers = [decoders[ins[0]](ins, ip + 1, regs, consts, write)
+                    for ip, ins in enumerate(code)]
+    finally:
+        if enabled:
+            gc.enable()
+    return handlers, regs
+
+
+def execute(program, write=print):
+    handlers, regs = decode(program, write)
+    n = len(handlers)
+    ip = 0
+    while ip < n:
+        ip = handlers[ip]()
+    return regs
+
+
+class ExecutionLimitExceeded(RuntimeError):
+    pass
+
+
+# instructions run between two limit checks in execute_limited()
+LIMIT_SLICE = 4096
+
+def execute_limited(program, write=print, max_steps=None, timeout=None):
+    # execute() with an instruction budget and/or a wall-clock timeout (in
+    # seconds). The limits are only checked between slices of instructions,
+    # in a loop of their own, so execute() itself pays nothing for them.
+    # Returns (regs, instructions executed).
+    handlers, regs = decode(program, write)
+    n = len(handlers)
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    steps = 0
+    ip = 0
+    while ip < n:
+        budget = LIMIT_SLICE
+        if max_steps is not None:
+            budget = min(budget, max_steps - steps)
+            if budget <= 0:
+                raise ExecutionLimitExceeded(f'instruction limit of {max_steps} exceeded')
+        done = 0
+        for done in range(1, budget + 1):
+            ip = handlers[ip]()
+            if ip >= n:
+                break
+        steps += done
+        if deadline is not None and time.perf_counter() > deadline:
+            raise ExecutionLimitExceeded(f'time limit of {timeout}s exceeded')
+    return regs, steps